@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    Local stand-in for the eBay web services, used by the benchmarks :
+    the three APIS endpoints answer canned GetItem, getJobs, getRecurringJobs,
+    createRecurringJob, deleteRecurringJob and multipart downloadFile responses
+    whose size is set by the server options.
+
+        server = FakeEbayServer(item_details=100, jobs=20, report_records=10000).start()
+        ews = server.client()
+        ...
+        server.stop()
+"""
+
+import BaseHTTPServer
+import SocketServer
+import httplib
+import re
+import socket
+import ssl
+import threading
+import zipfile
+from cStringIO import StringIO
+
+BOUNDARY = '--MIMEBoundaryurn_uuid_0123456789ABCDEF'
+TRADING_NS = 'urn:ebay:apis:eBLBaseComponents'
+LMS_NS = 'http://www.ebay.com/marketplace/services'
+ITEM_ID = re.compile(r'<ItemID>[^<]*</ItemID>')
+PAGINATION = re.compile(r'<entriesPerPage>(\d+)</entriesPerPage>\s*<pageNumber>(\d+)</pageNumber>')
+RANGE = re.compile(r'^bytes=(\d+)-$')
+
+
+def get_item_response(details):
+    """
+    :param int details: number of ItemSpecifics and shipping options
+    :rtype: str
+    """
+    specifics = ''.join('<NameValueList><Name>Name %d</Name><Value>Value %d</Value>'
+                        '</NameValueList>' % (i, i) for i in range(details))
+    shipping = ''.join('<ShippingServiceOptions><ShippingService>Service%d</ShippingService>'
+                       '<ShippingServiceCost currencyID="EUR">%d.50</ShippingServiceCost>'
+                       '<ShippingServicePriority>%d</ShippingServicePriority>'
+                       '<ExpeditedService>false</ExpeditedService></ShippingServiceOptions>'
+                       % (i, i, i) for i in range(details))
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<GetItemResponse xmlns="%s"><Timestamp>2012-07-24T10:00:00.000Z</Timestamp>'
+            '<Ack>Success</Ack><Version>781</Version><Build>E781_CORE_BUNDLED</Build>'
+            '<Item><ItemID>260874940015</ItemID><Title>Benchmark item &amp; co</Title>'
+            '<Quantity>12</Quantity><SKU>SKU-0001</SKU>'
+            '<SellingStatus><CurrentPrice currencyID="EUR">19.9</CurrentPrice>'
+            '<QuantitySold>3</QuantitySold><ListingStatus>Active</ListingStatus></SellingStatus>'
+            '<ItemSpecifics>%s</ItemSpecifics><ShippingDetails>%s</ShippingDetails>'
+            '</Item></GetItemResponse>' % (TRADING_NS, specifics, shipping))
+
+
+def get_jobs_response(jobs, page_number=None, entries_per_page=None):
+    """
+    :param int jobs: number of jobProfile
+    :param int page_number: page to answer, all the jobs when not given
+    :param int entries_per_page: jobs per page
+    :rtype: str
+    """
+    first, last, pagination = 0, jobs, ''
+    if page_number:
+        first = (page_number - 1) * entries_per_page
+        last = min(jobs, first + entries_per_page)
+        pagination = ('<paginationOutput><pageNumber>%d</pageNumber>'
+                      '<entriesPerPage>%d</entriesPerPage><totalPages>%d</totalPages>'
+                      '<totalEntries>%d</totalEntries></paginationOutput>'
+                      % (page_number, entries_per_page,
+                         (jobs + entries_per_page - 1) // entries_per_page, jobs))
+    profiles = ''.join('<jobProfile><jobId>50000%05d</jobId><jobType>SoldReport</jobType>'
+                       '<jobStatus>Completed</jobStatus>'
+                       '<creationTime>2012-07-20T10:00:00.000Z</creationTime>'
+                       '<completionTime>2012-07-20T10:05:00.000Z</completionTime>'
+                       '<percentComplete>100.0</percentComplete>'
+                       '<fileReferenceId>60000%05d</fileReferenceId>'
+                       '<inputFileReferenceId>0</inputFileReferenceId></jobProfile>'
+                       % (i, i) for i in range(first, last))
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<getJobsResponse xmlns="%s"><ack>Success</ack><version>1.1.0</version>'
+            '<timestamp>2012-07-24T10:00:00.000Z</timestamp>%s%s</getJobsResponse>'
+            % (LMS_NS, profiles, pagination))
+
+
+def get_recurring_jobs_response(jobs):
+    """
+    :param int jobs: number of recurringJobDetail
+    :rtype: str
+    """
+    details = ''.join('<recurringJobDetail><recurringJobId>70000%05d</recurringJobId>'
+                      '<creationTime>2012-07-20T10:00:00.000Z</creationTime>'
+                      '<frequencyInMinutes>60</frequencyInMinutes><downloadJobType>SoldReport'
+                      '</downloadJobType><jobStatus>Active</jobStatus></recurringJobDetail>'
+                      % i for i in range(jobs))
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<getRecurringJobsResponse xmlns="%s"><ack>Success</ack><version>1.1.0</version>'
+            '<timestamp>2012-07-24T10:00:00.000Z</timestamp>%s</getRecurringJobsResponse>'
+            % (LMS_NS, details))
+
+
+def simple_response(action, content=''):
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<%sResponse xmlns="%s"><ack>Success</ack><version>1.1.0</version>'
+            '<timestamp>2012-07-24T10:00:00.000Z</timestamp>%s</%sResponse>'
+            % (action, LMS_NS, content, action))
+
+
+def report(records):
+    """
+    :param int records: number of SKUDetails in the ActiveInventoryReport
+    :rtype: str
+    """
+    out = StringIO()
+    out.write('<?xml version="1.0" encoding="UTF-8"?>\n<BulkDataExchangeResponses xmlns="%s">'
+              '<ActiveInventoryReport><Timestamp>2012-07-24T10:00:00.000Z</Timestamp>'
+              '<Ack>Success</Ack><Version>781</Version>' % TRADING_NS)
+    for i in range(records):
+        out.write('<SKUDetails><SKU>SKU-%07d</SKU><Price currencyID="EUR">%d.99</Price>'
+                  '<Quantity>%d</Quantity><ItemID>26%010d</ItemID></SKUDetails>\n'
+                  % (i, i % 500, i % 50, i))
+    out.write('</ActiveInventoryReport></BulkDataExchangeResponses>')
+    return out.getvalue()
+
+
+def download_response(records, members=1):
+    """
+    :param int records: number of records of the zipped report
+    :param int members: number of reports in the zip file
+    :rtype: str
+    :return: multipart downloadFile response, as sent by the File Transfer service
+    """
+    archive = StringIO()
+    zip_file = zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED)
+    content = report(records)
+    for i in range(members):
+        zip_file.writestr(members > 1 and '5047690844_report_%d.xml' % (i + 1)
+                                                    or '5047690844_report.xml', content)
+    zip_file.close()
+    xml = simple_response('downloadFile')
+    return '\r\n'.join([
+        BOUNDARY,
+        'Content-Type: application/xop+xml; charset=utf-8; type="text/xml"',
+        'Content-Transfer-Encoding: binary',
+        'Content-ID: <0.urn:uuid:0123456789ABCDEF>',
+        '',
+        xml,
+        BOUNDARY,
+        'Content-Type: application/zip',
+        'Content-Transfer-Encoding: binary',
+        'Content-ID: <urn:uuid:FEDCBA9876543210>',
+        '',
+        archive.getvalue(),
+        BOUNDARY + '--',
+        '',
+        ])
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # status line and headers in a single send
+    wbufsize = -1
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        # large bodies are written in several segments : no Nagle/delayed ack stall
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        request = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        action = self.headers.get('X-EBAY-API-CALL-NAME') or \
+                                        self.headers.get('X-EBAY-SOA-OPERATION-NAME')
+        body = self.server.owner.response(action, request)
+        if body is None:
+            self.send_error(404, 'Unknown call %s' % action)
+            return
+        status, total, first = 200, len(body), 0
+        match = RANGE.match(self.headers.get('Range', ''))
+        if action == 'downloadFile' and match and int(match.group(1)) < total:
+            status, first = 206, int(match.group(1))
+            body = body[first:]
+        self.send_response(status)
+        self.send_header('Content-Type', action == 'downloadFile' and
+                'multipart/related; boundary="%s"' % BOUNDARY[2:] or 'text/xml;charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if status == 206:
+            self.send_header('Content-Range', 'bytes %d-%d/%d' % (first, total - 1, total))
+        self.end_headers()
+        drop_after = self.server.owner.drop_after
+        if action == 'downloadFile' and drop_after and len(body) > drop_after:
+            # flaky link : the connection is cut in the middle of the body
+            self.wfile.write(body[:drop_after])
+            self.close_connection = 1
+            return
+        self.wfile.write(body)
+
+
+class _Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 256
+
+
+class FakeEbayServer(object):
+    """ Threaded http(s) server answering like the api, web and file eBay hosts """
+
+    def __init__(self, item_details=10, jobs=10, report_records=1000, certfile=None,
+                                        keyfile=None, drop_after=None, report_members=1):
+        """
+        :param int item_details: size of GetItem responses, see get_item_response()
+        :param int jobs: number of jobs in getJobs and getRecurringJobs responses
+        :param int report_records: number of records of the downloaded report
+        :param str certfile: certificate file, serve https when given
+        :param str keyfile: private key of the certificate
+        :param int drop_after: bytes of a downloadFile body sent before the connection
+            is cut, None to send it whole. Range requests are served
+        :param int report_members: number of reports in the downloaded zip file
+        """
+        self.item_details = item_details
+        self.jobs = jobs
+        self.report_records = report_records
+        self.drop_after = drop_after
+        self.report_members = report_members
+        self.certfile = certfile
+        self.keyfile = keyfile
+        self.responses = {}
+        # 'address:port' once started
+        self.host = None
+        self._server = None
+
+    def response(self, action, request=''):
+        """
+        :rtype: str
+        :return: canned response of the action, GetItem answers the requested ItemID
+            and getJobs the requested page
+        """
+        body = self.responses.get(action)
+        if action == 'getJobs':
+            match = PAGINATION.search(request)
+            if match:
+                body = get_jobs_response(self.jobs, int(match.group(2)), int(match.group(1)))
+        elif action == 'GetItem':
+            match = ITEM_ID.search(request)
+            if match:
+                body = body.replace('<ItemID>260874940015</ItemID>', match.group(0), 1)
+        return body
+
+    def start(self):
+        self.responses = {
+            'GetItem': get_item_response(self.item_details),
+            'getJobs': get_jobs_response(self.jobs),
+            'getRecurringJobs': get_recurring_jobs_response(self.jobs),
+            'createRecurringJob': simple_response('createRecurringJob',
+                                            '<recurringJobId>5000133101</recurringJobId>'),
+            'deleteRecurringJob': simple_response('deleteRecurringJob'),
+            'downloadFile': download_response(self.report_records, self.report_members),
+            }
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.owner = self
+        if self.certfile:
+            self._server.socket = ssl.wrap_socket(self._server.socket, certfile=self.certfile,
+                                                    keyfile=self.keyfile, server_side=True)
+        self.host = '127.0.0.1:%s' % self._server.server_address[1]
+        thread = threading.Thread(target=self._server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def point(self, ews):
+        """
+        Sends the calls of an EbayWebService or AsyncEbayWebService to this server
+        :rtype: EbayWebService
+        """
+        connection = ews.connection
+        connection.pool.hosts = dict((api, self.host) for api in connection.pool.hosts)
+        if hasattr(connection, 'secure'):
+            connection.secure = bool(self.certfile)
+            if self.certfile:
+                connection.ssl_context = ssl._create_unverified_context()
+        elif self.certfile:
+            context = ssl._create_unverified_context()
+            connection.pool.connection_class = \
+                        lambda host: httplib.HTTPSConnection(host, context=context)
+        else:
+            connection.pool.connection_class = httplib.HTTPConnection
+        return ews
+
+    def client(self, **kwargs):
+        """
+        :param dict kwargs: EbayWebService options
+        :rtype: EbayWebService
+        """
+        from ebaypyt import EbayWebService
+        return self.point(EbayWebService('dev', 'app', 'cert', 'TOKEN', **kwargs))
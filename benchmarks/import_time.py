@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    Startup cost of ebaypyt entry points : each one is run several times in a
+    fresh python process, which measures the time and the modules loaded from
+    the first import to the end of the entry point, interpreter startup left out.
+    The call entry points are what a short-lived cron worker does : import,
+    create the client and make a single call to the local fake server.
+
+        python benchmarks/import_time.py
+        python benchmarks/import_time.py --entry-points job_get,recurring_job_get --runs 20
+"""
+
+import json
+import optparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_server import FakeEbayServer
+
+CLIENT = '''
+from ebaypyt import EbayWebService
+ews = EbayWebService('dev', 'app', 'cert', 'TOKEN')
+import httplib
+ews.connection.pool.hosts = dict((api, HOST) for api in ews.connection.pool.hosts)
+ews.connection.pool.connection_class = httplib.HTTPConnection
+'''
+DOWNLOAD_PARAMS = {'taskReferenceId': '5000000000', 'fileReferenceId': '6000000000'}
+# entry point name : code run in the measured process, HOST is the fake server
+ENTRY_POINTS = [
+    ('import', 'import ebaypyt'),
+    ('web_service', 'from ebaypyt import EbayWebService'),
+    ('async_web_service', 'from ebaypyt import AsyncEbayWebService'),
+    ('sync', 'from ebaypyt.sync import JobSync'),
+    ('pipeline', 'from ebaypyt.pipeline import JobPipeline'),
+    ('columnar', 'from ebaypyt.columnar import export_report'),
+    ('cli', 'from ebaypyt import cli'),
+    ('job_get', CLIENT + "ews.get('Job')"),
+    ('recurring_job_get', CLIENT + "ews.get('RecurringJob')"),
+    ('product_get', CLIENT + "ews.get('Product', {'ItemID': '260874940015'})"),
+    ('job_download', CLIENT + "ews.download('Job', %r, stream=True).close()" % DOWNLOAD_PARAMS),
+    ]
+# modules whose load is reported, when an entry point loads them
+HEAVY_MODULES = ('lxml.etree', 'lxml.objectify', 'zipfile', 'tempfile', 'uuid', 'ctypes',
+                 'multiprocessing', 'asyncore', 'csv', 'sqlite3', 'email.utils', 'httplib')
+
+WORKER = '''
+import json, sys, time
+sys.path.insert(0, %(root)r)
+HOST = %(host)r
+before = set(sys.modules)
+start = time.time()
+exec %(code)r
+elapsed = time.time() - start
+loaded = [name for name in set(sys.modules) - before if sys.modules[name] is not None]
+print json.dumps({'seconds': elapsed, 'modules': len(loaded),
+                  'heavy': sorted(name for name in %(heavy)r if name in loaded)})
+'''
+
+
+def measure(code, host, runs):
+    """
+    :param str code: entry point code
+    :param str host: fake server 'address:port'
+    :param int runs: number of fresh processes
+    :rtype: dict
+    :return: {'median': seconds, 'min': seconds, 'modules': .., 'heavy': [..]}
+    """
+    worker = WORKER % {'root': ROOT, 'host': host, 'code': code, 'heavy': HEAVY_MODULES}
+    results = []
+    for run in range(runs):
+        results.append(json.loads(subprocess.check_output([sys.executable, '-c', worker])))
+    durations = sorted(result['seconds'] for result in results)
+    return {'median': durations[len(durations) // 2], 'min': durations[0],
+            'modules': results[-1]['modules'], 'heavy': results[-1]['heavy']}
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('--entry-points', default=','.join(name for name, code in ENTRY_POINTS),
+                      help='comma separated entry points, default: %default')
+    parser.add_option('--runs', type='int', default=10,
+                      help='processes per entry point, default: %default')
+    parser.add_option('--json', help='also write the results to this file')
+    options, args = parser.parse_args()
+
+    codes = dict(ENTRY_POINTS)
+    server = FakeEbayServer(item_details=10, jobs=10, report_records=1000).start()
+    results = []
+    try:
+        print '%-20s %9s %9s %8s  %s' % ('entry point', 'median ms', 'min ms', 'modules',
+                                                                    'heavy modules loaded')
+        for name in options.entry_points.split(','):
+            if name not in codes:
+                parser.error('unknown entry point %s' % name)
+            result = measure(codes[name], server.host, options.runs)
+            result['entry_point'] = name
+            results.append(result)
+            print '%-20s %9.1f %9.1f %8d  %s' % (name, result['median'] * 1000,
+                    result['min'] * 1000, result['modules'], ' '.join(result['heavy']))
+            sys.stdout.flush()
+    finally:
+        server.stop()
+    if options.json:
+        with open(options.json, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    Offline benchmarks of ebaypyt against the local fake server of fake_server.py :
+    calls/sec, latency percentiles and peak memory of Product.get, Job.get,
+    RecurringJob.get and Job.download for several payload sizes.
+
+    Each scenario runs in its own python process, so that the peak RSS measured
+    is the one of the scenario only.
+
+        python benchmarks/run.py
+        python benchmarks/run.py --scenarios job_download,job_download_stream --records 1000000
+        python benchmarks/run.py --concurrency 8 --json results.json
+"""
+
+import json
+import optparse
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_server import FakeEbayServer
+
+DOWNLOAD_PARAMS = {'taskReferenceId': '5000000000', 'fileReferenceId': '6000000000',
+                   'jobType': 'ActiveInventoryReport'}
+# scenario name : (payload option, kind of call)
+SCENARIOS = [
+    ('product_get', 'details'),
+    ('job_get', 'jobs'),
+    ('recurring_job_get', 'jobs'),
+    ('job_download', 'records'),
+    ('job_download_stream', 'records'),
+    ('report_records', 'records'),
+    ('report_rows', 'records'),
+    ('report_rows_slots', 'records'),
+    ('report_csv', 'records'),
+    ('job_download_many', 'records'),
+    ('job_download_resumable', 'records'),
+    ]
+READ_SIZE = 64 * 1024
+# files saved by one job_download_many call
+DOWNLOAD_MANY_FILES = 8
+# seconds before resuming a download cut by --drop-after
+RESUME_BACKOFF = 0.001
+
+
+def product_get(ews):
+    return ews.get('Product', {'ItemID': '260874940015'})
+
+
+def job_get(ews):
+    return ews.get('Job', {'jobType': 'SoldReport', 'jobStatus': 'Completed'})
+
+
+def recurring_job_get(ews):
+    return ews.get('RecurringJob')
+
+
+def job_download(ews):
+    return len(ews.download('Job', DOWNLOAD_PARAMS))
+
+
+def job_download_stream(ews):
+    report = ews.download('Job', DOWNLOAD_PARAMS, stream=True)
+    size = 0
+    try:
+        data = report.read(READ_SIZE)
+        while data:
+            size += len(data)
+            data = report.read(READ_SIZE)
+    finally:
+        report.close()
+    return size
+
+
+def report_records(ews):
+    return sum(1 for record in ews.iter_report_records(DOWNLOAD_PARAMS))
+
+
+def report_rows(ews):
+    # every row kept, as the callers loading a report in memory
+    return len(list(ews.iter_report_records(DOWNLOAD_PARAMS)))
+
+
+def report_rows_slots(ews):
+    return len(list(ews.iter_report_records(DOWNLOAD_PARAMS, as_records=True)))
+
+
+def report_csv(ews):
+    output = tempfile.TemporaryFile()
+    try:
+        return ews.export_report(DOWNLOAD_PARAMS, 'csv', output)
+    finally:
+        output.close()
+
+
+def job_download_many(ews):
+    directory = tempfile.mkdtemp()
+    try:
+        params_list = [{'taskReferenceId': '5000000000', 'fileReferenceId': str(6000000000 + i)}
+                                                        for i in range(DOWNLOAD_MANY_FILES)]
+        return len(ews.download_many(params_list, directory, max_workers=4))
+    finally:
+        shutil.rmtree(directory)
+
+
+def job_download_resumable(ews):
+    directory = tempfile.mkdtemp()
+    try:
+        return ews.download_many([DOWNLOAD_PARAMS], directory, resumable=True)[0]['size']
+    finally:
+        shutil.rmtree(directory)
+
+
+def peak_rss():
+    """
+    :rtype: float
+    :return: peak resident memory of the process, in MB
+    """
+    # on linux ru_maxrss keeps the peak of the forking process across exec : use VmHWM
+    if os.path.exists('/proc/self/status'):
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on mac os
+    return peak / (sys.platform == 'darwin' and 1024. * 1024 or 1024.)
+
+
+def percentile(durations, percent):
+    """ :param list durations: sorted durations """
+    return durations[min(len(durations) - 1, int(len(durations) * percent / 100.))]
+
+
+def run_worker(options):
+    """ Runs one scenario against an already started server, prints the result as json """
+    from ebaypyt import EbayWebService
+    from ebaypyt.metrics import LatencyAggregator
+    from ebaypyt.retry import RetryPolicy
+    server = FakeEbayServer(certfile=options.certfile)
+    server.host = options.host
+    ews = server.point(EbayWebService('dev', 'app', 'cert', 'TOKEN',
+                                                        parse_pool=options.parse_pool))
+    if options.worker == 'job_download_resumable':
+        ews.connection.retry = RetryPolicy(backoff=RESUME_BACKOFF)
+    scenario = globals()[options.worker]
+    # warm up : imports, connection and parser setup are not measured
+    scenario(ews)
+    start_rss = peak_rss()
+    if options.concurrency > 1 and options.worker.endswith('_get'):
+        name = {'product_get': 'Product', 'job_get': 'Job',
+                'recurring_job_get': 'RecurringJob'}[options.worker]
+        params = {'Product': {'ItemID': '260874940015'},
+                  'Job': {'jobType': 'SoldReport', 'jobStatus': 'Completed'}}.get(name)
+        # calls overlap : their durations are given by the call timing records
+        latencies = LatencyAggregator()
+        ews.add_observer(latencies)
+        start = time.time()
+        # get() completes the params it is given : one dict per call
+        ews.get_many(name, [params and dict(params) for i in range(options.calls)],
+                                                        max_workers=options.concurrency)
+        elapsed = time.time() - start
+        total = latencies.summary().values()[0]['phases']['total']
+        p50, p95, p99 = total['p50'], total['p95'], total['p99']
+    else:
+        durations = []
+        start = time.time()
+        for i in range(options.calls):
+            call_start = time.time()
+            scenario(ews)
+            durations.append(time.time() - call_start)
+        elapsed = time.time() - start
+        durations.sort()
+        p50, p95, p99 = [percentile(durations, percent) for percent in (50, 95, 99)]
+    ews.close()
+    print json.dumps({
+        'calls': options.calls,
+        'calls_per_sec': options.calls / elapsed,
+        'p50': p50,
+        'p95': p95,
+        'p99': p99,
+        'start_rss': start_rss,
+        'peak_rss': peak_rss(),
+        })
+
+
+def run_scenario(options, name, kind, size):
+    server_options = {'item_details': 10, 'jobs': 10, 'report_records': 1000}
+    server_options[{'details': 'item_details', 'jobs': 'jobs',
+                    'records': 'report_records'}[kind]] = size
+    if name == 'job_download_resumable':
+        server_options['drop_after'] = options.drop_after
+    server = FakeEbayServer(certfile=options.certfile, keyfile=options.keyfile,
+                                                                    **server_options)
+    server.start()
+    try:
+        calls = kind == 'records' and options.download_calls or options.calls
+        command = [sys.executable, os.path.abspath(__file__), '--worker', name,
+                   '--host', server.host, '--calls', str(calls),
+                   '--concurrency', str(options.concurrency),
+                   '--parse-pool', str(options.parse_pool)]
+        if options.certfile:
+            command += ['--certfile', options.certfile]
+        output = subprocess.check_output(command)
+    finally:
+        server.stop()
+    result = json.loads(output)
+    result.update({'scenario': name, kind: size})
+    return result
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('--scenarios', default=','.join(name for name, kind in SCENARIOS),
+                      help='comma separated scenarios, default: %default')
+    parser.add_option('--calls', type='int', default=200,
+                      help='calls per get scenario, default: %default')
+    parser.add_option('--download-calls', type='int', default=10,
+                      help='calls per download scenario, default: %default')
+    parser.add_option('--details', default='10,200',
+                      help='GetItem sizes (item specifics), default: %default')
+    parser.add_option('--jobs', default='10,500',
+                      help='getJobs and getRecurringJobs sizes, default: %default')
+    parser.add_option('--records', default='1000,100000',
+                      help='downloaded report sizes (records), default: %default')
+    parser.add_option('--concurrency', type='int', default=1,
+                      help='concurrent calls of get scenarios through get_many()')
+    parser.add_option('--parse-pool', type='int', default=0,
+                      help='worker processes converting the get responses, default: %default')
+    parser.add_option('--drop-after', type='int',
+                      help='cut job_download_resumable connections after this many bytes')
+    parser.add_option('--certfile', help='serve https with this certificate')
+    parser.add_option('--keyfile', help='private key of the certificate')
+    parser.add_option('--json', help='also write the results to this file')
+    parser.add_option('--worker', help=optparse.SUPPRESS_HELP)
+    parser.add_option('--host', help=optparse.SUPPRESS_HELP)
+    options, args = parser.parse_args()
+
+    if options.worker:
+        run_worker(options)
+        return
+
+    kinds = dict(SCENARIOS)
+    results = []
+    print '%-24s %9s %7s %10s %9s %9s %9s %9s' % ('scenario', 'size', 'calls', 'calls/s',
+                                            'p50 ms', 'p95 ms', 'p99 ms', 'peak MB')
+    for name in options.scenarios.split(','):
+        if name not in kinds:
+            parser.error('unknown scenario %s' % name)
+        kind = kinds[name]
+        for size in getattr(options, kind).split(','):
+            result = run_scenario(options, name, kind, int(size))
+            results.append(result)
+            print '%-24s %9s %7d %10.1f %9.2f %9.2f %9.2f %9.1f' % (name, size,
+                    result['calls'], result['calls_per_sec'], result['p50'] * 1000,
+                    result['p95'] * 1000, result['p99'] * 1000, result['peak_rss'])
+            sys.stdout.flush()
+    if options.json:
+        with open(options.json, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    Concurrency stress test : a single EbayWebService, and a single Product
+    object, are shared by a pool of threads calling GetItem, getJobs and
+    downloadFile against the local fake server. Each result is checked
+    against its request, any mix-up between calls is reported.
+
+        python benchmarks/stress.py --threads 32 --calls 5000
+"""
+
+import hashlib
+import optparse
+import os
+import random
+import sys
+import time
+from multiprocessing.pool import ThreadPool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_server import FakeEbayServer
+from ebaypyt.ebaypyt import Product
+
+DOWNLOAD_PARAMS = {'taskReferenceId': '5000000000', 'fileReferenceId': '6000000000'}
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('--threads', type='int', default=16,
+                      help='threads sharing the client, default: %default')
+    parser.add_option('--calls', type='int', default=2000,
+                      help='total number of calls, default: %default')
+    parser.add_option('--jobs', type='int', default=20,
+                      help='jobs of getJobs responses, default: %default')
+    parser.add_option('--records', type='int', default=2000,
+                      help='records of the downloaded report, default: %default')
+    parser.add_option('--seed', type='int', default=0, help='random seed of the calls mix')
+    options, args = parser.parse_args()
+
+    server = FakeEbayServer(jobs=options.jobs, report_records=options.records).start()
+    ews = server.client(pool_size=options.threads)
+    product = Product(ews.connection)
+    report_md5 = hashlib.md5(ews.download('Job', DOWNLOAD_PARAMS)).hexdigest()
+    job_params = {'jobType': 'SoldReport'}
+
+    def item(index):
+        item_id = str(100000000000 + index)
+        result = product.get({'ItemID': item_id})
+        return str(result[0]['ItemID']) == item_id
+
+    def jobs(index):
+        # the same params dict is shared by all the calls
+        return len(ews.get('Job', job_params)) == options.jobs
+
+    def download(index):
+        return hashlib.md5(ews.download('Job', DOWNLOAD_PARAMS)).hexdigest() == report_md5
+
+    def download_stream(index):
+        report = ews.download('Job', DOWNLOAD_PARAMS, stream=True)
+        try:
+            return hashlib.md5(report.read()).hexdigest() == report_md5
+        finally:
+            report.close()
+
+    # mostly small calls, like a real synchronisation
+    calls = [item] * 12 + [jobs] * 4 + [download, download_stream]
+    mix = random.Random(options.seed)
+    tasks = [(mix.choice(calls), index) for index in range(options.calls)]
+
+    def run(task):
+        func, index = task
+        try:
+            return func.__name__, func(index), None
+        except Exception as error:
+            return func.__name__, False, '%s: %s' % (error.__class__.__name__, error)
+
+    workers = ThreadPool(options.threads)
+    start = time.time()
+    try:
+        results = workers.map(run, tasks, chunksize=1)
+    finally:
+        workers.close()
+        workers.join()
+    elapsed = time.time() - start
+    server.stop()
+
+    failures = 0
+    for name in sorted(set(func.__name__ for func in calls)):
+        done = [result for result in results if result[0] == name]
+        bad = [result for result in done if not result[1]]
+        failures += len(bad)
+        print '%-16s %6d calls %6d failures' % (name, len(done), len(bad))
+        for result in bad[:3]:
+            print '    %s' % (result[2] or 'wrong result')
+    print '%d calls on %d threads in %.2fs, pool %s' % (len(tasks), options.threads, elapsed,
+                                                                        ews.pool_stats())
+    sys.exit(failures and 1 or 0)
+
+
+if __name__ == '__main__':
+    main()
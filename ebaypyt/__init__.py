@@ -1,2 +1,8 @@
-from ebaypyt import EbayWebService
-from ebaypyt import objectify_to_dict
+# the modules are imported when these names are first used, see lazy module
+from lazy import lazy_package
+
+lazy_package(__name__, {
+    'EbayWebService': 'ebaypyt.ebaypyt',
+    'objectify_to_dict': 'ebaypyt.ebaypyt',
+    'AsyncEbayWebService': 'ebaypyt.asynchronous',
+    })
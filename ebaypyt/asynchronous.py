@@ -0,0 +1,655 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+###############################################################################
+#                                                                             #
+#   ebaypyt                                                                   #
+#                                                                             #
+#   Copyright (C) 2012 Akretion Sébastien BEAU <sebastien.beau@akretion.com>  #
+#                               David BEAL <david.beal@akretion.com>          #
+#                                                                             #
+#   This program is free software: you can redistribute it and/or modify      #
+#   it under the terms of the GNU Affero General Public License as            #
+#   published by the Free Software Foundation, either version 3 of the        #
+#   License, or (at your option) any later version.                           #
+#                                                                             #
+#   This program is distributed in the hope that it will be useful,           #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of            #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the             #
+#   GNU Affero General Public License for more details.                       #
+#                                                                             #
+#   You should have received a copy of the GNU Affero General Public License  #
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+"""
+    Asynchronous variant of Communication and EbayWebService.
+
+    Calls return an AsyncCall at once and many requests stay in flight in a
+    single thread : sockets are non blocking and multiplexed with asyncore.
+    Requests and responses are built and decoded by the Communication methods.
+
+        ews = AsyncEbayWebService(developer_key, application_key, certificate_key, auth_token)
+        calls = [ews.get('Product', {'ItemID': item_id}) for item_id in item_ids]
+        ews.wait(calls)
+        products = [call.result() for call in calls]
+"""
+
+import asyncore
+import errno
+import socket
+import ssl
+import sys
+import time
+from collections import deque
+
+from ebaypyt import APIS, Communication, EbayWebService
+from retry import IDEMPOTENT_ACTIONS, HttpStatusError, parse_retry_after
+from metrics import CallTimer
+
+# maximum number of requests sent at the same time, others are queued
+MAX_IN_FLIGHT = 100
+RECV_SIZE = 64 * 1024
+# seconds spent in select() before checking if the awaited calls are done
+LOOP_TIMEOUT = 0.5
+
+_WOULD_BLOCK = (errno.EWOULDBLOCK, errno.EAGAIN)
+
+
+class AsyncCall(object):
+    """
+    Pending web service call, similar to a future : its result is available
+    once AsyncCommunication.wait() has processed its response
+    """
+
+    def __init__(self):
+        self._done = False
+        self._result = None
+        self._error = None
+        self._callbacks = []
+
+    def done(self):
+        return self._done
+
+    def result(self):
+        """
+        :return: result of the call, as returned by the synchronous method
+        :raise: the error raised by the call, eg EbayError
+        """
+        if not self._done:
+            raise Exception("The call is not finished, wait() for it before reading its result")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def error(self):
+        """
+        :rtype: Exception
+        :return: error raised by the call or None
+        """
+        return self._error
+
+    def add_done_callback(self, callback):
+        """
+        :param function callback: called with the AsyncCall as only argument once done
+        """
+        if self._done:
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    def then(self, func):
+        """
+        :param function func: function to apply on the result of this call
+        :rtype: AsyncCall
+        :return: call whose result will be func(result of this call)
+        """
+        chained = AsyncCall()
+
+        def propagate(call):
+            if call._error is not None:
+                chained.set_error(call._error)
+                return
+            try:
+                result = func(call._result)
+            except Exception as error:
+                chained.set_error(error)
+            else:
+                chained.set_result(result)
+
+        self.add_done_callback(propagate)
+        return chained
+
+    def set_result(self, result):
+        self._result = result
+        self._finish()
+
+    def set_error(self, error):
+        self._error = error
+        self._finish()
+
+    def _finish(self):
+        self._done = True
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+
+class _HttpChannel(asyncore.dispatcher):
+    """ Non blocking keep-alive HTTP(S) connection to the host of one api """
+
+    def __init__(self, owner, api):
+        asyncore.dispatcher.__init__(self, map=owner.socket_map)
+        self.owner = owner
+        self.api = api
+        host = owner.pool.hosts[api]
+        self.host, port = host, owner.secure and 443 or 80
+        if ':' in host:
+            self.host, port = host.split(':')
+        self.request = None
+        self.requests_count = 0
+        self.released_at = None
+        self._handshaking = False
+        self._want_write = False
+        self._out = ''
+        self._reset_response()
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.connect((self.host, int(port)))
+
+    def _reset_response(self):
+        self._in = ''
+        self._status = None
+        self._reason = None
+        self._headers = None
+        self._body = []
+        self._remaining = None
+        self._chunked = False
+        self._will_close = False
+
+    def send_request(self, request):
+        """
+        :param dict request: request being processed, see AsyncCommunication._start()
+        """
+        self.request = request
+        self.requests_count += 1
+        self._out = request['payload']
+        self._reset_response()
+
+    def request_sent(self):
+        """
+        :rtype: boolean
+        :return: True once the whole request is written : the server may have received it
+        """
+        return not self._out
+
+    def writable(self):
+        if not self.connected:
+            return True
+        if self._handshaking:
+            return self._want_write
+        return bool(self._out)
+
+    def handle_connect(self):
+        if self.owner.secure:
+            sock = self.owner.ssl_context.wrap_socket(self.socket, server_hostname=self.host,
+                                                            do_handshake_on_connect=False)
+            self.del_channel()
+            self.set_socket(sock)
+            self._handshaking = True
+            self._handshake()
+
+    def _handshake(self):
+        try:
+            self.socket.do_handshake()
+        except ssl.SSLWantReadError:
+            self._want_write = False
+        except ssl.SSLWantWriteError:
+            self._want_write = True
+        else:
+            self._handshaking = False
+
+    def handle_write(self):
+        if self._handshaking:
+            self._handshake()
+            return
+        try:
+            sent = self.socket.send(self._out)
+        except (ssl.SSLWantReadError, ssl.SSLWantWriteError):
+            return
+        except socket.error as error:
+            if error.errno in _WOULD_BLOCK:
+                return
+            raise
+        self._out = self._out[sent:]
+
+    def handle_read(self):
+        if self._handshaking:
+            self._handshake()
+            return
+        # ssl sockets may hold decrypted data not signaled by select() : read until empty
+        while self.connected:
+            try:
+                data = self.socket.recv(RECV_SIZE)
+            except (ssl.SSLWantReadError, ssl.SSLWantWriteError):
+                break
+            except socket.error as error:
+                if error.errno in _WOULD_BLOCK:
+                    break
+                raise
+            if not data:
+                self._end_of_stream()
+                return
+            self._feed(data)
+
+    def _feed(self, data):
+        """ Incremental parsing of the http response """
+        if self.request is None:
+            # nothing is expected on an idle connection
+            return
+        self._in += data
+        if self._headers is None:
+            end = self._in.find('\r\n\r\n')
+            if end < 0:
+                return
+            lines = self._in[:end].split('\r\n')
+            self._in = self._in[end + 4:]
+            version, status, self._reason = (lines[0].split(' ', 2) + [''])[:3]
+            self._status = int(status)
+            self._headers = {}
+            for line in lines[1:]:
+                key, value = line.split(':', 1)
+                self._headers[key.strip().lower()] = value.strip()
+            connection = self._headers.get('connection', '').lower()
+            self._will_close = connection == 'close' or \
+                                        (version == 'HTTP/1.0' and connection != 'keep-alive')
+            self._chunked = 'chunked' in self._headers.get('transfer-encoding', '').lower()
+            if not self._chunked and 'content-length' in self._headers:
+                self._remaining = int(self._headers['content-length'])
+        if self._chunked:
+            self._feed_chunks()
+        elif self._remaining is not None:
+            self._body.append(self._in[:self._remaining])
+            self._remaining -= len(self._body[-1])
+            self._in = ''
+            if self._remaining <= 0:
+                self._response_done()
+        else:
+            # body ends with the connection
+            self._body.append(self._in)
+            self._in = ''
+
+    def _feed_chunks(self):
+        while True:
+            if self._remaining is None or self._remaining == 0:
+                if self._remaining == 0:
+                    # crlf after a chunk
+                    if len(self._in) < 2:
+                        return
+                    self._in = self._in[2:]
+                    self._remaining = None
+                end = self._in.find('\r\n')
+                if end < 0:
+                    return
+                size = int(self._in[:end].split(';')[0], 16)
+                if size == 0:
+                    # last chunk, trailers are ignored
+                    if self._in.find('\r\n\r\n', end) < 0:
+                        return
+                    self._in = ''
+                    self._response_done()
+                    return
+                self._in = self._in[end + 2:]
+                self._remaining = size
+            data = self._in[:self._remaining]
+            self._body.append(data)
+            self._remaining -= len(data)
+            self._in = self._in[len(data):]
+            if self._remaining:
+                return
+
+    def _response_done(self):
+        request = self.request
+        self.request = None
+        body = ''.join(self._body)
+        status, reason, headers = self._status, self._reason, self._headers
+        will_close = self._will_close
+        self._reset_response()
+        if will_close:
+            self.close()
+        self.owner._response_received(self, request, status, reason, headers, body)
+
+    def _end_of_stream(self):
+        request = self.request
+        self.request = None
+        if request is not None and self._headers is not None \
+                                    and not self._chunked and self._remaining is None:
+            # response without length, ended by the server
+            body = ''.join(self._body)
+            status, reason, headers = self._status, self._reason, self._headers
+            self.close()
+            self.owner._response_received(self, request, status, reason, headers, body)
+            return
+        received = self._headers is not None
+        self.close()
+        self.owner._channel_lost(self, request, socket.error(errno.ECONNRESET,
+                                    "Connection closed by %s" % self.host), received)
+
+    def handle_close(self):
+        self._end_of_stream()
+
+    def handle_error(self):
+        error = sys.exc_info()[1]
+        request = self.request
+        self.request = None
+        received = self._headers is not None
+        self.close()
+        self.owner._channel_lost(self, request, error, received)
+
+
+class AsyncCommunication(Communication):
+    """
+    Communication whose web_service_processing() returns an AsyncCall :
+    responses are processed by wait()
+    """
+
+    def __init__(self, developer_key, application_key, certificate_key, auth_token,
+                            site_id=None, compatibility=None, max_in_flight=None,
+                            ssl_context=None, secure=True, **kwargs):
+        """
+        :param int max_in_flight: maximum number of requests sent at the same time
+        :param ssl.SSLContext ssl_context: context used for https connections
+        :param boolean secure: use https, plain http is only meant for tests
+        :param dict kwargs: Communication options, except parse_pool
+        """
+        if kwargs.get('parse_pool'):
+            # responses are parsed by wait(), in the calling thread
+            raise Exception("Parsing in a process pool is not available with AsyncCommunication")
+        Communication.__init__(self, developer_key, application_key, certificate_key,
+                                            auth_token, site_id, compatibility, **kwargs)
+        self.max_in_flight = max_in_flight or MAX_IN_FLIGHT
+        self.ssl_context = ssl_context or ssl.create_default_context()
+        self.secure = secure
+        self.socket_map = {}
+        self._idle = {}
+        self._queue = deque()
+        self._in_flight = 0
+
+    def clone(self):
+        raise Exception("AsyncCommunication is not meant to be shared between threads")
+
+    def then(self, result, func):
+        """ see Communication.then() """
+        return result.then(func)
+
+    def web_service_processing(self, action, core_request, api, stream=False, as_etree=False,
+                                                                        sink=None, to_dict=None):
+        """
+        Queues the request, see Communication.web_service_processing()
+        :rtype: AsyncCall
+        :return: call whose result is the one of Communication.web_service_processing()
+        """
+        if stream or sink is not None:
+            raise Exception("Streaming downloads are not available with AsyncCommunication")
+        if to_dict is not None:
+            raise Exception("Parsing in a process pool is not available with AsyncCommunication")
+        timer = CallTimer(action, api)
+        payload = self._complete_request(action, core_request, api)
+        headers = self._generate_headers(action, APIS[api]['location'], api)
+        timer.record['request_bytes'] = len(payload)
+        timer.lap('build')
+        request = {
+            'api': api,
+            'action': action,
+            'as_etree': as_etree,
+            'call': AsyncCall(),
+            'timer': timer,
+            'cache_key': self.cache and self.cache.key(action, api, payload, self.auth_token),
+            'retried': False,
+            'attempt': 1,
+            'not_before': 0,
+            }
+        if request['cache_key']:
+            response = self.cache.get(request['cache_key'], action)
+            timer.lap('cache')
+            if response is not None:
+                timer.record['cache_hit'] = True
+                timer.record['response_bytes'] = len(response)
+                self._parse_into(request, response)
+                return request['call']
+        lines = ['POST /%s HTTP/1.1' % APIS[api]['location'], 'Host: %s' % self.pool.hosts[api],
+                 'Content-Length: %s' % len(payload)]
+        lines.extend('%s: %s' % (key, value) for key, value in headers.items())
+        request['payload'] = '\r\n'.join(lines) + '\r\n\r\n' + payload
+        self._queue.append(request)
+        self._start_queued()
+        return request['call']
+
+    def fetch_resumable(self, action, core_request, api, raw_file):
+        raise Exception("Resumable downloads are not available with AsyncCommunication")
+
+    def _start_queued(self):
+        waiting = deque()
+        now = time.time()
+        while self._queue and self._in_flight < self.max_in_flight:
+            request = self._queue.popleft()
+            # the event loop never sleeps : throttled and retried calls stay queued
+            if request['not_before'] > now or self.rate_limiter and \
+                    not self.rate_limiter.acquire(request['api'], request['action'], blocking=False):
+                waiting.append(request)
+                continue
+            self._start(request)
+        waiting.extend(self._queue)
+        self._queue = waiting
+
+    def _queue_delay(self):
+        """
+        :rtype: float
+        :return: seconds before a queued call may be started
+        """
+        now = time.time()
+        delays = []
+        for request in self._queue:
+            delay = request['not_before'] - now
+            if self.rate_limiter:
+                delay = max(delay, self.rate_limiter.delay(request['api'], request['action']))
+            delays.append(delay)
+        return max(0, min(delays))
+
+    def _retry_later(self, request, error):
+        """
+        Queues the request again if the retry policy allows it
+        :rtype: boolean
+        :return: True if the request will be sent again
+        """
+        request['attempt'] += 1
+        delay = self.retry and self.retry.next_delay(request['action'], error,
+                                                                    request['attempt'] - 1)
+        if delay is None:
+            return False
+        request['not_before'] = time.time() + delay
+        self._queue.append(request)
+        return True
+
+    def _start(self, request, fresh=False):
+        """ Sends the request on an idle connection or on a new one """
+        self._in_flight += 1
+        request['timer'].lap(request['attempt'] > 1 and 'backoff' or 'queue')
+        request['timer'].record['attempts'] += 1
+        channel = None
+        idle = self._idle.get(request['api'], [])
+        now = time.time()
+        while idle and not fresh:
+            channel = idle.pop()
+            if channel.connected and now - channel.released_at <= self.pool.idle_timeout:
+                self.pool.hits += 1
+                break
+            channel.close()
+            channel = None
+        if channel is None:
+            self.pool.misses += 1
+            try:
+                channel = _HttpChannel(self, request['api'])
+            except Exception as error:
+                self._in_flight -= 1
+                self._fail(request, error)
+                return
+        channel.send_request(request)
+
+    def _release(self, channel):
+        self._in_flight -= 1
+        if channel.connected:
+            idle = self._idle.setdefault(channel.api, [])
+            if len(idle) < max(self.pool.size, self.max_in_flight):
+                channel.released_at = time.time()
+                idle.append(channel)
+            else:
+                channel.close()
+        self._start_queued()
+
+    def _response_received(self, channel, request, status, reason, headers, body):
+        self._release(channel)
+        request['timer'].record['response_bytes'] += len(body)
+        request['timer'].lap('wait')
+        if status != 200:
+            error = HttpStatusError(status, reason, parse_retry_after(headers.get('retry-after')))
+            if not self._retry_later(request, error):
+                self._fail(request, error)
+            return
+        if self._parse_into(request, body) and request['cache_key']:
+            self.cache.set(request['cache_key'], request['action'], body)
+
+    def _parse_into(self, request, response):
+        """
+        Decodes a raw response into the result of the request call
+        :rtype: boolean
+        :return: True if the call succeeded
+        """
+        try:
+            result = self._parse_response(request['api'], response, request['as_etree'],
+                                                                            request['timer'])
+        except Exception as error:
+            self._fail(request, error)
+            return False
+        if self.observers:
+            self._notify(request['timer'].finish())
+        request['call'].set_result(result)
+        return True
+
+    def _fail(self, request, error):
+        if self.observers:
+            self._notify(request['timer'].finish(error))
+        request['call'].set_error(error)
+
+    def _channel_lost(self, channel, request, error, received):
+        idle = self._idle.get(channel.api, [])
+        if channel in idle:
+            idle.remove(channel)
+        if request is None:
+            return
+        self._in_flight -= 1
+        idempotent = request['action'] in (self.retry and self.retry.actions
+                                                                    or IDEMPOTENT_ACTIONS)
+        if channel.requests_count > 1 and not received and not request['retried'] \
+                                        and (idempotent or not channel.request_sent()):
+            # keep-alive connection closed by the server : send again on a new one, unless
+            # the server may have received a request which must not be processed twice
+            request['retried'] = True
+            self._start(request, fresh=True)
+        elif not self._retry_later(request, error):
+            self._fail(request, error)
+        self._start_queued()
+
+    def wait(self, calls=None, timeout=None):
+        """
+        Processes the network events until calls are done
+        :param list calls: AsyncCall list, all the pending calls by default
+        :param float timeout: maximum seconds to wait
+        :rtype: None
+        """
+        deadline = timeout and time.time() + timeout
+        while True:
+            if calls is None:
+                if not self._in_flight and not self._queue:
+                    return
+            elif all(call.done() for call in calls):
+                return
+            self._start_queued()
+            loop_timeout = LOOP_TIMEOUT
+            if self._queue and self._in_flight < self.max_in_flight:
+                # queued calls are throttled or waiting for a retry
+                loop_timeout = min(self._queue_delay(), LOOP_TIMEOUT)
+            if deadline:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise Exception("Timeout while waiting for eBay responses")
+                loop_timeout = min(loop_timeout, remaining)
+            if self.socket_map:
+                asyncore.loop(timeout=loop_timeout, map=self.socket_map, count=1)
+            else:
+                time.sleep(loop_timeout)
+
+    def close(self):
+        """ Closes all the connections """
+        asyncore.close_all(self.socket_map)
+        self._idle = {}
+
+
+class AsyncEbayWebService(EbayWebService):
+    """ EbayWebService whose methods return an AsyncCall, see wait() """
+
+    def __init__(self, developer_key, application_key, certificate_key, auth_token
+                                                                , site_id=None, **kwargs):
+        """
+        :param dict kwargs: AsyncCommunication options, eg max_in_flight
+        """
+        self.connection = AsyncCommunication(developer_key, application_key, certificate_key,
+                                                        auth_token, site_id, **kwargs)
+
+    def get_many(self, ebay_object_name, params_list, max_workers=None):
+        """
+        :rtype: list
+        :return: AsyncCall list, in the order of params_list
+        """
+        return [self.get(ebay_object_name, params) for params in params_list]
+
+    def pool_stats(self):
+        """
+        :rtype: dict
+        :return: keep-alive connection hit/miss counters
+        """
+        stats = self.connection.pool.stats()
+        stats['idle'] = dict((api, len(idle)) for api, idle in self.connection._idle.items())
+        return stats
+
+    def iter_report_records(self, params, record_tag=None, cast_fields=None, useless_key=None,
+                                                                as_records=False, fields=None):
+        raise Exception("Report records are only available with EbayWebService")
+
+    def export_report(self, params, format, output=None, columns=None, record_tag=None,
+                                                                            chunk_size=None):
+        raise Exception("Report export is only available with EbayWebService")
+
+    def export_many(self, params_list, directory, format, columns=None, record_tag=None,
+                                                                            max_workers=None):
+        raise Exception("Saving downloads is only available with EbayWebService")
+
+    def iter_report_members(self, params):
+        raise Exception("Report members are only available with EbayWebService")
+
+    def extract_report(self, params, directory, max_workers=None):
+        raise Exception("Saving downloads is only available with EbayWebService")
+
+    def download_many(self, params_list, directory, max_workers=None, resumable=False):
+        raise Exception("Saving downloads is only available with EbayWebService")
+
+    def iter_jobs(self, params=None, entries_per_page=None):
+        raise Exception("Job iteration is only available with EbayWebService, use get()")
+
+    def iter_recurring_jobs(self):
+        raise Exception("Job iteration is only available with EbayWebService, use get()")
+
+    def wait(self, calls=None, timeout=None):
+        """ see AsyncCommunication.wait() """
+        return self.connection.wait(calls, timeout)
+
+    def close(self):
+        self.connection.close()
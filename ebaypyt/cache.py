@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+###############################################################################
+#                                                                             #
+#   ebaypyt                                                                   #
+#                                                                             #
+#   Copyright (C) 2012 Akretion Sébastien BEAU <sebastien.beau@akretion.com>  #
+#                               David BEAL <david.beal@akretion.com>          #
+#                                                                             #
+#   This program is free software: you can redistribute it and/or modify      #
+#   it under the terms of the GNU Affero General Public License as            #
+#   published by the Free Software Foundation, either version 3 of the        #
+#   License, or (at your option) any later version.                           #
+#                                                                             #
+#   This program is distributed in the hope that it will be useful,           #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of            #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the             #
+#   GNU Affero General Public License for more details.                       #
+#                                                                             #
+#   You should have received a copy of the GNU Affero General Public License  #
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+"""
+    Cache of read-only call responses (GetItem, getJobs, getRecurringJobs).
+    Raw responses are kept in memory with a LRU eviction bounded in bytes and,
+    optionally, in a directory that several processes can share.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# seconds a response stays valid, per action : only these actions are cached
+CACHE_TTLS = {'GetItem': 60, 'getJobs': 30, 'getRecurringJobs': 60}
+# mutating calls are never cached, even if given a ttl
+UNCACHEABLE_ACTIONS = ('createRecurringJob', 'deleteRecurringJob', 'downloadFile')
+CACHE_MAX_BYTES = 32 * 1024 * 1024
+CACHE_MAX_DISK_BYTES = 256 * 1024 * 1024
+# the cache directory is pruned once every CACHE_PRUNE_WRITES responses written
+CACHE_PRUNE_WRITES = 100
+
+_BLANKS_BETWEEN_TAGS = re.compile(r'>\s+<')
+_CACHE_FILE = re.compile(r'^[0-9a-f]{40}$')
+
+
+class ResponseCache(object):
+    """ TTL/LRU cache of raw responses, thread-safe """
+
+    def __init__(self, ttls=None, max_bytes=None, directory=None, max_disk_bytes=None):
+        """
+        :param dict ttls: seconds a response stays valid per action, updates CACHE_TTLS
+        :param int max_bytes: maximum size of the responses kept in memory
+        :param str directory: directory used to share responses between processes
+        :param int max_disk_bytes: size of the directory above which the oldest
+            responses are deleted, see prune()
+        """
+        self.ttls = dict(CACHE_TTLS)
+        self.ttls.update(ttls or {})
+        for action in UNCACHEABLE_ACTIONS:
+            self.ttls.pop(action, None)
+        self.max_bytes = max_bytes or CACHE_MAX_BYTES
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes or CACHE_MAX_DISK_BYTES
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.pruned = 0
+        self._writes = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def key(self, action, api, request, auth_token=''):
+        """
+        :param str action: call name
+        :param str api: api type (key of APIS)
+        :param str request: complete request string
+        :param str auth_token: token removed from the request, only a digest of it is kept
+            so that accounts sharing a cache directory do not see each other's responses
+        :rtype: str
+        :return: cache key or None if the action is not cached
+        """
+        if action not in self.ttls:
+            return None
+        if auth_token:
+            request = request.replace(auth_token, '')
+        request = _BLANKS_BETWEEN_TAGS.sub('><', request.strip())
+        account = hashlib.sha1(auth_token).hexdigest()
+        return hashlib.sha1('\n'.join((api, action, account, request))).hexdigest()
+
+    def get(self, key, action):
+        """
+        :rtype: str
+        :return: cached response or None
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, response = entry
+                if expires_at > now:
+                    del self._entries[key]
+                    self._entries[key] = entry
+                    self.hits += 1
+                    return response
+                self._remove(key)
+        response = self._read_file(key, self.ttls[action], now)
+        with self._lock:
+            if response is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+        self._store(key, response, now + self.ttls[action])
+        return response
+
+    def set(self, key, action, response):
+        """
+        :param str response: raw response of a successful call
+        """
+        now = time.time()
+        self._store(key, response, now + self.ttls[action])
+        if self.directory:
+            self._write_file(key, response)
+            with self._lock:
+                prune = not self._writes % CACHE_PRUNE_WRITES
+                self._writes += 1
+            if prune:
+                self.prune(now)
+
+    def _store(self, key, response, expires_at):
+        if len(response) > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (expires_at, response)
+            self._size += len(response)
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+
+    def _read_file(self, key, ttl, now):
+        if not self.directory:
+            return None
+        path = os.path.join(self.directory, key)
+        try:
+            if os.path.getmtime(path) + ttl <= now:
+                # stale for this action, the next set() writes it again
+                os.remove(path)
+                return None
+            with open(path, 'rb') as cache_file:
+                return cache_file.read()
+        except (IOError, OSError):
+            return None
+
+    def _write_file(self, key, response):
+        # written aside then renamed : readers never see a partial response
+        handle, path = tempfile.mkstemp(dir=self.directory, prefix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as cache_file:
+                cache_file.write(response)
+            os.rename(path, os.path.join(self.directory, key))
+        except (IOError, OSError):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _list_files(self):
+        """
+        :rtype: list
+        :return: [(mtime, size, path)] of the cache files, temporary files included
+        """
+        files = []
+        for name in os.listdir(self.directory):
+            if not _CACHE_FILE.match(name) and not name.startswith('.tmp'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # removed by another process
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def prune(self, now=None):
+        """
+        Deletes the files of the cache directory older than the longest ttl, which
+        are stale for every action, and temporary files left by a crashed writer.
+        The oldest files are then deleted until the directory fits in max_disk_bytes.
+        Called by set() every CACHE_PRUNE_WRITES responses
+        :rtype: int
+        :return: number of files deleted
+        """
+        if not self.directory:
+            return 0
+        oldest = (now or time.time()) - max(self.ttls.values() or [0])
+        files = sorted(self._list_files())
+        size = sum(file_size for mtime, file_size, path in files)
+        deleted = 0
+        for mtime, file_size, path in files:
+            if mtime > oldest and size <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                deleted += 1
+            except OSError:
+                pass
+            size -= file_size
+        with self._lock:
+            self.pruned += deleted
+        return deleted
+
+    def clear(self):
+        """ Empties the memory cache and the cache directory """
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+        if self.directory:
+            for name in os.listdir(self.directory):
+                if not _CACHE_FILE.match(name):
+                    continue
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def stats(self):
+        """
+        :rtype: dict
+        :return: hit/miss counters, number and size of the responses kept in memory and,
+            with a directory, the hits served from it, its number of files and size
+            and the files deleted by prune()
+        """
+        with self._lock:
+            stats = {'hits': self.hits, 'misses': self.misses,
+                     'entries': len(self._entries), 'bytes': self._size}
+        if self.directory:
+            files = self._list_files()
+            stats.update({'disk_hits': self.disk_hits, 'disk_entries': len(files),
+                          'disk_bytes': sum(file_size for mtime, file_size, path in files),
+                          'pruned': self.pruned})
+        return stats
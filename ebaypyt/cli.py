@@ -0,0 +1,350 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+###############################################################################
+#                                                                             #
+#   ebaypyt                                                                   #
+#                                                                             #
+#   Copyright (C) 2012 Akretion Sébastien BEAU <sebastien.beau@akretion.com>  #
+#                               David BEAL <david.beal@akretion.com>          #
+#                                                                             #
+#   This program is free software: you can redistribute it and/or modify      #
+#   it under the terms of the GNU Affero General Public License as            #
+#   published by the Free Software Foundation, either version 3 of the        #
+#   License, or (at your option) any later version.                           #
+#                                                                             #
+#   This program is distributed in the hope that it will be useful,           #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of            #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the             #
+#   GNU Affero General Public License for more details.                       #
+#                                                                             #
+#   You should have received a copy of the GNU Affero General Public License  #
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+"""
+    Command-line tool for bulk operations, installed as 'ebaypyt'.
+    Credentials are read from the EBAY_DEVELOPER_KEY, EBAY_APPLICATION_KEY,
+    EBAY_CERTIFICATE_KEY and EBAY_AUTH_TOKEN environment variables, or given
+    as options.
+
+        ebaypyt get-items item_ids.txt --concurrency 16 -o items.ndjson --stats
+        ebaypyt jobs list --job-type SoldReport --status Completed
+        ebaypyt jobs sync --job-type SoldReport --store jobs.sqlite --format csv -o sold.csv
+        ebaypyt jobs download 5000000000 6000000000 --job-type ActiveInventoryReport
+        ebaypyt recurring create --job-type SoldReport --frequency 60
+        ebaypyt recurring list
+        ebaypyt recurring delete 5000133101
+
+    Rows are written as they come, one json object per line (ndjson) or as csv,
+    whose nested fields are flattened into 'parent.child' columns. --stats
+    prints the throughput and the latency percentiles of each call to stderr.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from ebaypyt import ALLOWABLE_JOB_STATUS, ALLOWABLE_JOB_TYPES, REPORT_RECORD_TAGS, \
+                                        EbayWebService, parse_report_records
+from metrics import LatencyAggregator
+
+# ItemIDs given to each get_many() call, per concurrent call
+GET_ITEMS_BATCH = 50
+OUTPUT_FORMATS = ('ndjson', 'csv')
+CREDENTIALS = (('developer_key', 'EBAY_DEVELOPER_KEY'),
+               ('application_key', 'EBAY_APPLICATION_KEY'),
+               ('certificate_key', 'EBAY_CERTIFICATE_KEY'),
+               ('auth_token', 'EBAY_AUTH_TOKEN'))
+
+
+def flatten(row, prefix=''):
+    """
+    :param dict row: converted response or record, with nested dicts
+    :rtype: dict
+    :return: {'parent.child': value}, lists are kept as json strings
+    """
+    flat = {}
+    for key, value in row.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, prefix + key + '.'))
+        elif isinstance(value, list):
+            flat[prefix + key] = json.dumps(value)
+        else:
+            flat[prefix + key] = value
+    return flat
+
+
+class NdjsonWriter(object):
+    """ Writes a json object per line """
+
+    def __init__(self, output, fields=None):
+        self.output = output
+        self.rows = 0
+
+    def write(self, row):
+        self.output.write(json.dumps(row, separators=(',', ':')))
+        self.output.write('\n')
+        self.rows += 1
+
+
+class CsvWriter(object):
+    """ Writes flattened rows, with the columns of the first row unless they are given """
+
+    def __init__(self, output, fields=None):
+        self.output = output
+        self.fields = fields
+        self.rows = 0
+        self._writer = None
+
+    def write(self, row):
+        row = flatten(row)
+        if self._writer is None:
+            self.fields = self.fields or sorted(row)
+            self._writer = csv.DictWriter(self.output, self.fields, extrasaction='ignore')
+            self._writer.writeheader()
+        self._writer.writerow(dict((key, isinstance(value, unicode) and value.encode('utf-8')
+                                    or value) for key, value in row.items()))
+        self.rows += 1
+
+
+def client(args):
+    """
+    :param argparse.Namespace args: parsed command line
+    :rtype: EbayWebService
+    """
+    credentials = []
+    for name, variable in CREDENTIALS:
+        value = getattr(args, name) or os.environ.get(variable)
+        if not value:
+            raise SystemExit("Missing %s : set %s or give --%s"
+                                            % (name, variable, name.replace('_', '-')))
+        credentials.append(value)
+    return EbayWebService(*credentials, site_id=args.site_id, retry=args.retry or None)
+
+
+def get_items(ews, args, writer):
+    """ Writes the items of the ItemIDs read from args.item_ids, one per line """
+    item_ids = args.item_ids == '-' and sys.stdin or open(args.item_ids)
+    batch_size = args.concurrency * GET_ITEMS_BATCH
+    errors = 0
+    try:
+        batch = []
+        for line in item_ids:
+            item_id = line.strip()
+            if item_id and not item_id.startswith('#'):
+                batch.append(item_id)
+            if len(batch) >= batch_size:
+                errors += _get_items(ews, args, writer, batch)
+                batch = []
+        if batch:
+            errors += _get_items(ews, args, writer, batch)
+    finally:
+        if item_ids is not sys.stdin:
+            item_ids.close()
+    return errors and 1 or 0
+
+
+def _get_items(ews, args, writer, item_ids):
+    """
+    :rtype: int
+    :return: number of failed items, reported on stderr
+    """
+    params_list = [{'ItemID': item_id, 'DetailLevel': args.detail_level}
+                                                                for item_id in item_ids]
+    errors = 0
+    for item_id, result in zip(item_ids, ews.get_many('Product', params_list,
+                                                            max_workers=args.concurrency)):
+        if isinstance(result, Exception):
+            errors += 1
+            sys.stderr.write(json.dumps({'ItemID': item_id, 'error': str(result)}) + '\n')
+            continue
+        for item in result or []:
+            writer.write(item)
+    return errors
+
+
+def jobs_list(ews, args, writer):
+    params = {'jobType': args.job_type, 'jobStatus': args.status,
+                                                        'creationTimeFrom': args.days}
+    for job in ews.iter_jobs(params):
+        writer.write(job)
+
+
+def jobs_sync(ews, args, writer):
+    """ Writes the records of the reports completed since the previous sync """
+    from sync import CheckpointStore, JobSync
+    record_tag = args.record_tag or REPORT_RECORD_TAGS[args.job_type]
+
+    def handler(job, report):
+        if report is None:
+            return
+        for record in parse_report_records(report, record_tag):
+            record['jobId'] = job['jobId']
+            writer.write(record)
+
+    store = CheckpointStore(args.store)
+    try:
+        return JobSync(ews, store, args.job_type).run(handler)
+    finally:
+        store.close()
+
+
+def jobs_download(ews, args, writer):
+    """ Writes the records of one report """
+    params = {'taskReferenceId': args.job_id, 'fileReferenceId': args.file_id,
+                                                                'jobType': args.job_type}
+    for record in ews.iter_report_records(params, record_tag=args.record_tag):
+        writer.write(record)
+
+
+def recurring_list(ews, args, writer):
+    for recurring_job in ews.iter_recurring_jobs():
+        writer.write(recurring_job)
+
+
+def recurring_create(ews, args, writer):
+    params = {'jobType': args.job_type, 'time': args.frequency or args.time}
+    if args.weekly:
+        params.update({'type_recurrence': 'weekly', 'day': args.weekly})
+    elif args.monthly:
+        params.update({'type_recurrence': 'monthly', 'day': args.monthly})
+    recurring_job_id = ews.create('RecurringJob', params)
+    if not recurring_job_id:
+        sys.stderr.write("No recurring job created\n")
+        return 1
+    writer.write({'recurringJobId': recurring_job_id})
+
+
+def recurring_delete(ews, args, writer):
+    for recurring_job_id in args.recurring_job_ids:
+        ews.delete('RecurringJob', recurring_job_id)
+        writer.write({'recurringJobId': recurring_job_id, 'deleted': True})
+
+
+def print_stats(latencies, rows, elapsed, result=None, output=None):
+    """
+    :param LatencyAggregator latencies: observer of the calls
+    :param int rows: rows written
+    :param float elapsed: seconds spent by the command
+    :param dict result: command result, eg the JobSync stats
+    """
+    output = output or sys.stderr
+    output.write('%-20s %7s %7s %10s %9s %9s %9s %10s\n' % ('call', 'calls', 'errors',
+                                    'calls/s', 'p50 ms', 'p95 ms', 'p99 ms', 'MB recv'))
+    for (api, action), calls in sorted(latencies.summary().items()):
+        total = calls['phases']['total']
+        output.write('%-20s %7d %7d %10.1f %9.2f %9.2f %9.2f %10.2f\n' % (action,
+                calls['calls'], calls['errors'], calls['calls'] / elapsed, total['p50'] * 1000,
+                total['p95'] * 1000, total['p99'] * 1000,
+                calls['response_bytes'] / 1024. / 1024))
+    output.write('%d rows in %.2f s, %.1f rows/s\n' % (rows, elapsed, rows / elapsed))
+    if result:
+        output.write('%s\n' % json.dumps(result))
+
+
+def parser():
+    """ :rtype: argparse.ArgumentParser """
+    # options of every command
+    common = argparse.ArgumentParser(add_help=False)
+    for name, variable in CREDENTIALS:
+        common.add_argument('--' + name.replace('_', '-'), help='default: $%s' % variable)
+    common.add_argument('--site-id', type=int, default=0, help='default: %(default)s')
+    common.add_argument('--retry', action='store_true',
+                        help='retry the calls failed by transient errors')
+    common.add_argument('--stats', action='store_true',
+                        help='print throughput and latency percentiles to stderr')
+    common.add_argument('-o', '--output', default='-', help='output file, default: stdout')
+    common.add_argument('--format', choices=OUTPUT_FORMATS, default='ndjson',
+                        help='default: %(default)s')
+    common.add_argument('--fields', help='comma separated csv columns, default: '
+                        'the fields of the first row')
+
+    main_parser = argparse.ArgumentParser(prog='ebaypyt',
+                                description='Bulk operations on the eBay web services')
+    commands = main_parser.add_subparsers(dest='command')
+
+    command = commands.add_parser('get-items', parents=[common],
+                                  help='GetItem for a file of ItemIDs')
+    command.add_argument('item_ids', help="file of ItemIDs, one per line, '-' for stdin")
+    command.add_argument('--concurrency', type=int, default=8, help='default: %(default)s')
+    command.add_argument('--detail-level', help="eg 'ItemReturnAttributes'")
+    command.set_defaults(func=get_items)
+
+    jobs = commands.add_parser('jobs', help='Bulk Data Exchange jobs').add_subparsers(
+                                                                    dest='jobs_command')
+    command = jobs.add_parser('list', parents=[common],
+                              help='jobs created during the last days')
+    command.add_argument('--job-type', choices=ALLOWABLE_JOB_TYPES)
+    command.add_argument('--status', choices=ALLOWABLE_JOB_STATUS)
+    command.add_argument('--days', type=int, help='default: the whole history kept by eBay')
+    command.set_defaults(func=jobs_list)
+    command = jobs.add_parser('sync', parents=[common],
+                              help='records of the reports completed since the previous sync')
+    command.add_argument('--job-type', required=True,
+                         choices=ALLOWABLE_JOB_TYPES)
+    command.add_argument('--store', required=True, help='sqlite file of the processed jobs')
+    command.add_argument('--record-tag', help='default: the one of the job type')
+    command.set_defaults(func=jobs_sync)
+    command = jobs.add_parser('download', parents=[common], help='records of one report')
+    command.add_argument('job_id')
+    command.add_argument('file_id')
+    command.add_argument('--job-type', choices=ALLOWABLE_JOB_TYPES)
+    command.add_argument('--record-tag', help='default: the one of the job type')
+    command.set_defaults(func=jobs_download)
+
+    recurring = commands.add_parser('recurring', help='recurring jobs').add_subparsers(
+                                                                    dest='recurring_command')
+    command = recurring.add_parser('list', parents=[common])
+    command.set_defaults(func=recurring_list)
+    command = recurring.add_parser('create', parents=[common])
+    command.add_argument('--job-type', required=True,
+                         choices=ALLOWABLE_JOB_TYPES)
+    when = command.add_mutually_exclusive_group(required=True)
+    when.add_argument('--frequency', type=int, help='every N minutes')
+    when.add_argument('--time', help='time of day, HH:MM:SS')
+    day = command.add_mutually_exclusive_group()
+    day.add_argument('--weekly', metavar='DAY', help="with --time, eg 'Monday'")
+    day.add_argument('--monthly', metavar='DAY', help="with --time, eg 'Day_1', 'Day_Last'")
+    command.set_defaults(func=recurring_create)
+    command = recurring.add_parser('delete', parents=[common])
+    command.add_argument('recurring_job_ids', nargs='+', metavar='recurring_job_id')
+    command.set_defaults(func=recurring_delete)
+    return main_parser
+
+
+def main(argv=None):
+    main_parser = parser()
+    args = main_parser.parse_args(argv)
+    if (getattr(args, 'weekly', None) or getattr(args, 'monthly', None)) and not args.time:
+        main_parser.error('--weekly and --monthly need --time')
+    ews = client(args)
+    latencies = None
+    if args.stats:
+        latencies = LatencyAggregator()
+        ews.add_observer(latencies)
+    output = args.output == '-' and sys.stdout or open(args.output, 'wb')
+    writer = (args.format == 'csv' and CsvWriter or NdjsonWriter)(output,
+                                            args.fields and args.fields.split(','))
+    start = time.time()
+    try:
+        result = args.func(ews, args, writer)
+    except Exception as error:
+        # EbayError and invalid parameters
+        sys.stderr.write('ebaypyt: error: %s\n' % error)
+        return 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        else:
+            output.flush()
+    if latencies is not None:
+        print_stats(latencies, writer.rows, max(time.time() - start, 1e-6),
+                                                isinstance(result, dict) and result or None)
+    return isinstance(result, int) and result or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
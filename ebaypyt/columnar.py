@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+###############################################################################
+#                                                                             #
+#   ebaypyt                                                                   #
+#                                                                             #
+#   Copyright (C) 2012 Akretion Sébastien BEAU <sebastien.beau@akretion.com>  #
+#                               David BEAL <david.beal@akretion.com>          #
+#                                                                             #
+#   This program is free software: you can redistribute it and/or modify      #
+#   it under the terms of the GNU Affero General Public License as            #
+#   published by the Free Software Foundation, either version 3 of the        #
+#   License, or (at your option) any later version.                           #
+#                                                                             #
+#   This program is distributed in the hope that it will be useful,           #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of            #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the             #
+#   GNU Affero General Public License for more details.                       #
+#                                                                             #
+#   You should have received a copy of the GNU Affero General Public License  #
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+"""
+    Columnar export of downloaded reports. Records are read with iterparse,
+    their fields are collected as rows of strings, without building a dict per
+    record, and every chunk of rows becomes typed column buffers :
+
+        export_report(report, 'SKUDetails', 'parquet', '/tmp/inventory.parquet')
+        arrays = export_report(report, 'SKUDetails', 'numpy')
+
+    Columns are given like cast_fields : {'Price': float, 'Quantity': int,
+    'SKU': str, 'StartTime': datetime, 'Enabled': bool}, or as a list of
+    (field, type) pairs to choose their order. Only the direct children of a
+    record are read.
+
+    numpy is needed for the 'numpy' format, pandas for 'pandas' and pyarrow
+    for 'parquet' : pip install ebaypyt[numpy], ebaypyt[pandas] or
+    ebaypyt[parquet]. 'csv' only needs the standard library.
+
+    Missing or empty values are NaN for floats, NaT for dates, 0 for ints,
+    False for booleans and '' for strings.
+"""
+
+import csv
+from datetime import datetime
+from lxml import etree
+
+from download import ReportFile
+
+# records converted to typed columns at once
+COLUMNAR_CHUNK_SIZE = 10000
+
+EXPORT_FORMATS = ('csv', 'numpy', 'pandas', 'parquet')
+
+REPORT_COLUMNS = {
+    'ActiveInventoryReport': [('SKU', str), ('ItemID', str), ('Price', float),
+                              ('Quantity', int)],
+    'SoldReport': [('OrderID', str), ('BuyerUserID', str), ('OrderCreationTime', datetime),
+                   ('PaidTime', datetime), ('ShippedTime', datetime)],
+    }
+
+# text of the missing values, parsed by numpy as the missing value of each type
+_MISSING = {float: 'nan', int: '0', datetime: 'NaT'}
+
+
+def _column_list(columns):
+    """
+    :param columns: {field: type} or [(field, type)]
+    :rtype: list
+    :return: [(field, type)], sorted by field for a dict
+    """
+    if isinstance(columns, dict):
+        return sorted(columns.items())
+    return list(columns)
+
+
+def iter_rows(report, record_tag, columns, chunk_size=None):
+    """
+    Reads the records of a report by chunks of rows
+    :param file report: xml report, eg returned by Job.download(params, stream=True)
+    :param str record_tag: xml tag of a record, eg 'SKUDetails'
+    :param columns: {field: type} or [(field, type)], see module documentation
+    :param int chunk_size: rows per chunk, COLUMNAR_CHUNK_SIZE by default
+    :rtype: generator
+    :return: lists of rows, a row is a list of utf-8 str (None for missing fields)
+        in the columns order
+    """
+    chunk_size = chunk_size or COLUMNAR_CHUNK_SIZE
+    fields = [field for field, cast in _column_list(columns)]
+    empty_row = [None] * len(fields)
+    index = None
+    rows = []
+    for event, element in etree.iterparse(report, tag='{*}' + record_tag):
+        if index is None:
+            # full tag of each field, the report namespace is the one of the records
+            tag = element.tag
+            namespace = tag[0] == '{' and tag[:tag.index('}') + 1] or ''
+            index = dict((namespace + field, position) for position, field in enumerate(fields))
+        row = empty_row[:]
+        for child in element:
+            position = index.get(child.tag)
+            if position is not None and row[position] is None:
+                text = child.text or ''
+                if text.__class__ is unicode:
+                    text = text.encode('utf-8')
+                row[position] = text
+        rows.append(row)
+        # free the parsed records
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+        if len(rows) >= chunk_size:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
+
+
+def _require(module, extra):
+    """
+    :rtype: module
+    :raise: Exception if the optional dependency is not installed
+    """
+    try:
+        return __import__(module)
+    except ImportError:
+        raise Exception("%s is needed for this export : pip install ebaypyt[%s]"
+                                                                    % (module, extra))
+
+
+def to_arrays(rows, columns):
+    """
+    Converts a chunk of rows into typed column buffers : float64, int64,
+    datetime64[ms], bool or object (str) numpy arrays
+    :param list rows: chunk of iter_rows()
+    :param columns: see iter_rows()
+    :rtype: dict
+    :return: {field: numpy array}
+    """
+    numpy = _require('numpy', 'numpy')
+    arrays = {}
+    for (field, cast), values in zip(_column_list(columns), zip(*rows)):
+        if cast is float or cast is int or cast is datetime:
+            missing = _MISSING[cast]
+            if cast is datetime:
+                # numpy dates have no time zone : eBay ones are all UTC
+                values = [value and value.rstrip('Z') or missing for value in values]
+            else:
+                values = [value or missing for value in values]
+            dtype = {float: numpy.float64, int: numpy.int64, datetime: 'datetime64[ms]'}[cast]
+            # parsed by numpy, not by a python call per value
+            arrays[field] = numpy.array(values, dtype=str).astype(dtype)
+        elif cast is bool:
+            arrays[field] = numpy.array([value == 'true' or value == '1' for value in values])
+        else:
+            arrays[field] = numpy.array([value or '' for value in values], dtype=object)
+    return arrays
+
+
+def write_csv(report, record_tag, columns, output, chunk_size=None):
+    """
+    :param output: csv file path or file opened in binary write mode
+    :rtype: int
+    :return: number of records written, see iter_rows() for the other parameters
+    """
+    fields = [field for field, cast in _column_list(columns)]
+    csv_file = isinstance(output, basestring) and open(output, 'wb') or output
+    try:
+        writer = csv.writer(csv_file)
+        writer.writerow(fields)
+        count = 0
+        for rows in iter_rows(report, record_tag, columns, chunk_size):
+            writer.writerows(rows)
+            count += len(rows)
+    finally:
+        if csv_file is not output:
+            csv_file.close()
+    return count
+
+
+def read_arrays(report, record_tag, columns, chunk_size=None):
+    """
+    :rtype: dict
+    :return: {field: numpy array} of all the records, see to_arrays()
+    """
+    numpy = _require('numpy', 'numpy')
+    chunks = [to_arrays(rows, columns)
+                                for rows in iter_rows(report, record_tag, columns, chunk_size)]
+    arrays = {}
+    for field, cast in _column_list(columns):
+        if chunks:
+            arrays[field] = numpy.concatenate([chunk[field] for chunk in chunks])
+        else:
+            arrays[field] = to_arrays([[None] * len(columns)], columns)[field][:0]
+    return arrays
+
+
+def read_dataframe(report, record_tag, columns, chunk_size=None):
+    """
+    :rtype: pandas.DataFrame
+    :return: one row per record, one column per field, see to_arrays() for the dtypes
+    """
+    pandas = _require('pandas', 'pandas')
+    arrays = read_arrays(report, record_tag, columns, chunk_size)
+    fields = [field for field, cast in _column_list(columns)]
+    return pandas.DataFrame(arrays, columns=fields)
+
+
+def write_parquet(report, record_tag, columns, path, chunk_size=None):
+    """
+    Writes one parquet row group per chunk of records
+    :param str path: parquet file path
+    :rtype: int
+    :return: number of records written, see iter_rows() for the other parameters
+    """
+    _require('pyarrow', 'parquet')
+    import pyarrow
+    import pyarrow.parquet
+    column_list = _column_list(columns)
+    types = {float: pyarrow.float64(), int: pyarrow.int64(), bool: pyarrow.bool_(),
+             datetime: pyarrow.timestamp('ms')}
+    schema = pyarrow.schema([pyarrow.field(field, types.get(cast, pyarrow.string()))
+                                                            for field, cast in column_list])
+    writer = pyarrow.parquet.ParquetWriter(path, schema)
+    count = 0
+    try:
+        for rows in iter_rows(report, record_tag, columns, chunk_size):
+            arrays = to_arrays(rows, columns)
+            writer.write_table(pyarrow.Table.from_arrays(
+                [pyarrow.array(arrays[field], type=types.get(cast, pyarrow.string()))
+                                            for field, cast in column_list], schema=schema))
+            count += len(rows)
+    finally:
+        writer.close()
+    return count
+
+
+def export_report(report, record_tag, format, output=None, columns=None, chunk_size=None):
+    """
+    :param file report: see iter_rows()
+    :param str record_tag: see iter_rows()
+    :param str format: one of EXPORT_FORMATS
+    :param output: file path ('csv' and 'parquet'), or file object ('csv')
+    :param columns: see iter_rows(), mandatory
+    :param int chunk_size: see iter_rows()
+    :rtype: int, dict or pandas.DataFrame
+    :return: number of records written for 'csv' and 'parquet', see read_arrays()
+        for 'numpy' and read_dataframe() for 'pandas'
+    """
+    if format not in EXPORT_FORMATS:
+        raise Exception("Format '%s' is not in %s" % (format, str(EXPORT_FORMATS)))
+    if not columns:
+        raise Exception("Missing 'columns' : give them, eg {'Price': float, 'SKU': str}")
+    if format in ('csv', 'parquet') and output is None:
+        raise Exception("Missing 'output' : the %s format is written to a file" % format)
+    if format == 'csv':
+        return write_csv(report, record_tag, columns, output, chunk_size)
+    if format == 'parquet':
+        return write_parquet(report, record_tag, columns, output, chunk_size)
+    if format == 'numpy':
+        return read_arrays(report, record_tag, columns, chunk_size)
+    return read_dataframe(report, record_tag, columns, chunk_size)
+
+
+def export_zip(path, record_tag, format, output=None, columns=None, chunk_size=None):
+    """
+    Exports the report of a zip file saved by Job.download_to(), can run in a
+    ParsePool worker
+    :param str path: zip file path
+    :rtype: int, dict or pandas.DataFrame
+    :return: see export_report() for the other parameters and the result
+    """
+    report = ReportFile(open(path, 'rb'))
+    try:
+        return export_report(report, record_tag, format, output, columns, chunk_size)
+    finally:
+        report.close()
@@ -0,0 +1,403 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+###############################################################################
+#                                                                             #
+#   ebaypyt                                                                   #
+#                                                                             #
+#   Copyright (C) 2012 Akretion Sébastien BEAU <sebastien.beau@akretion.com>  #
+#                               David BEAL <david.beal@akretion.com>          #
+#                                                                             #
+#   This program is free software: you can redistribute it and/or modify      #
+#   it under the terms of the GNU Affero General Public License as            #
+#   published by the Free Software Foundation, either version 3 of the        #
+#   License, or (at your option) any later version.                           #
+#                                                                             #
+#   This program is distributed in the hope that it will be useful,           #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of            #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the             #
+#   GNU Affero General Public License for more details.                       #
+#                                                                             #
+#   You should have received a copy of the GNU Affero General Public License  #
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+"""
+    Conversion of xml responses into dictionaries.
+    DictConverter compiles cast_fields and useless_key once into a plan and
+    walks plain lxml.etree elements : values are typed like lxml.objectify
+    would do (int, long, float, bool, str) without building objectify
+    elements for every node.
+    RecordConverter gives the top level elements as instances of a __slots__
+    class made for their fields, which take much less memory than dicts.
+"""
+
+from collections import Mapping
+
+from lxml import etree
+from lxml import objectify
+
+# objectify elements redefine len() and iteration (over siblings) : use the etree ones
+_iterchildren = etree._Element.iterchildren
+_itersiblings = etree._Element.itersiblings
+_len = etree._Element.__len__
+_keys = etree._Element.keys
+
+XSI_NIL = '{http://www.w3.org/2001/XMLSchema-instance}nil'
+XSI_TYPE = '{http://www.w3.org/2001/XMLSchema-instance}type'
+
+# plan actions
+LIST, STRING, CAST = 1, 2, 3
+
+# classes made by record_class(), per (name, fields)
+_RECORD_CLASSES = {}
+
+
+def _bool(text):
+    return text in ('true', '1')
+
+
+def _parse_bool(text):
+    # a BoolElement does not guess, its text may be wrong
+    if text in ('true', '1'):
+        return True
+    if text is None or text in ('false', '0'):
+        return False
+    raise ValueError("Invalid boolean value: %r" % text)
+
+
+def _string(text):
+    if text is None:
+        return u''
+    return text
+
+
+def _none(text):
+    return None
+
+
+def _tree(text):
+    # a leaf annotated as a tree node has no pyval, objectify_to_dict() gives a dict
+    return {}
+
+# conversions of the elements annotated with py:pytype or xsi:type, like the
+# objectify element class of the annotation. The 'long' type gives IntElement
+_ANNOTATED_TYPES = {'int': int, 'long': int, 'float': float, 'bool': _parse_bool,
+                    'str': _string, 'none': _none, 'NoneType': _none}
+_PYTYPES = {'TREE': _tree}
+_SCHEMA_TYPES = {}
+for _pytype in objectify.getRegisteredTypes():
+    _convert = _ANNOTATED_TYPES.get(_pytype.name)
+    if _convert:
+        _PYTYPES[_pytype.name] = _convert
+        for _schema_type in _pytype.xmlSchemaTypes:
+            _SCHEMA_TYPES[_schema_type] = _convert
+
+# same order as the objectify type guessing
+_TYPE_CHECKS = []
+for _pytype in objectify.getRegisteredTypes():
+    _convert = {'int': int, 'float': float, 'bool': _bool}.get(_pytype.name)
+    if _convert and _pytype.type_check:
+        _TYPE_CHECKS.append((_pytype.name, _pytype.type_check, _convert))
+# a text with a dot is never an int
+_DOTTED_TYPE_CHECKS = [type_check for type_check in _TYPE_CHECKS if type_check[0] != 'int']
+
+_BOOLS = {'true': True, 'false': False}
+
+# a text which does not start with one of these characters or a space can only be a string
+_TYPED_START = frozenset('0123456789+-.iInNtf')
+
+
+def _annotation(element):
+    """
+    :param etree._Element element: element with attributes
+    :rtype: function
+    :return: conversion of the text given by the xsi:nil, py:pytype or xsi:type
+        attribute, in the objectify lookup order, or None to guess the type
+    """
+    if element.get(XSI_NIL) == 'true':
+        return _none
+    convert = _PYTYPES.get(element.get(objectify.PYTYPE_ATTRIBUTE))
+    if convert is not None:
+        return convert
+    schema_type = element.get(XSI_TYPE)
+    if schema_type is None:
+        return None
+    convert = _SCHEMA_TYPES.get(schema_type)
+    if convert is None and ':' in schema_type:
+        convert = _SCHEMA_TYPES.get(schema_type.split(':', 1)[1])
+    return convert
+
+
+def pyval(element):
+    """
+    Python value of a leaf element, identical to the objectify 'pyval'
+    of the same element
+    :param etree._Element element: element without children
+    :rtype: int, long, float, bool, str, unicode or None
+    """
+    text = element.text
+    # type annotations come first : only namespaced attributes may be one, not currencyID
+    for key in _keys(element):
+        if key[0] == '{':
+            convert = _annotation(element)
+            if convert is not None:
+                return convert(text)
+            break
+    if text is None:
+        # objectify empty elements are StringElement
+        return u''
+    first = text[0]
+    if first not in _TYPED_START and not first.isspace():
+        return text
+    # shortcuts for the most common values, same results as the type checks below
+    if text.__class__ is str and text.isdigit():
+        return int(text)
+    if first in 'tf':
+        return _BOOLS.get(text, text)
+    for name, type_check, convert in ('.' in text and _DOTTED_TYPE_CHECKS or _TYPE_CHECKS):
+        try:
+            type_check(text)
+        except (ValueError, TypeError):
+            continue
+        return convert(text)
+    return text
+
+
+class DictConverter(object):
+    """ Reusable xml to dict converter, see objectify_to_dict() for the parameters """
+
+    def __init__(self, cast_fields=None, useless_key=None):
+        self.plan = {}
+        for key, cast in (cast_fields or {}).items():
+            if cast == list:
+                self.plan[key] = (LIST, None)
+            elif cast == str:
+                self.plan[key] = (STRING, str)
+            elif cast:
+                self.plan[key] = (CAST, cast)
+        self.useless_key = frozenset(useless_key or ())
+
+    def convert(self, element):
+        """
+        :param etree._Element element: lxml element (objectify ones are accepted too)
+        :rtype: dict
+        :return: same result as objectify_to_dict() for this element
+        """
+        tag = element.tag
+        # like objectify attribute lookup, only children of the parent namespace are seen
+        if tag[0] == '{':
+            start = tag.index('}') + 1
+            children_tag = tag[:start] + '*'
+        else:
+            start = 0
+            children_tag = '{}*'
+
+        # first child for each name, like objectify.__dict__
+        children = {}
+        for child in _iterchildren(element, children_tag):
+            name = child.tag[start:]
+            if name not in children:
+                children[name] = child
+
+        plan = self.plan
+        useless_key = self.useless_key
+        convert = self.convert
+        result = {}
+        # iterate in the same order as objectify_to_dict did over objectify.__dict__
+        for key, child in children.items():
+            step = plan.get(key)
+            if step is None:
+                if _len(child):
+                    result[key] = convert(child)
+                else:
+                    result[key] = pyval(child)
+            elif step[0] == LIST:
+                result[key] = [convert(child)]
+                result[key].extend([convert(sibling)
+                                    for sibling in _itersiblings(child, child.tag)])
+            elif _len(child):
+                result[key] = convert(child)
+            elif step[0] == STRING:
+                result[key] = str(child.text)
+            else:
+                result[key] = step[1](pyval(child))
+            if useless_key and len(result) == 1 and key in useless_key:
+                return result[key]
+        return result
+
+
+class Record(object):
+    """
+    Base of the classes made by record_class() : the fields are slots and are
+    read like the keys of the dict DictConverter would give. Records are registered
+    as collections.Mapping and can be pickled, eg sent to a ParsePool process, but
+    json only serializes dicts : give it to_dict()
+    """
+    __slots__ = ('_extra',)
+    # field names in the fields order, and as a set, set on each record class
+    _fields = ()
+    _slots = frozenset()
+
+    def __init__(self, values=None):
+        """
+        :param dict values: field values, the ones without slot are kept in a dict
+        """
+        self._extra = None
+        if values:
+            slots = self._slots
+            for key, value in values.iteritems():
+                if key in slots:
+                    setattr(self, key, value)
+                else:
+                    self[key] = value
+
+    def __getitem__(self, key):
+        if key in self._slots:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key)
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        if key in self._slots:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def iteritems(self):
+        for key in self._fields:
+            try:
+                yield key, getattr(self, key)
+            except AttributeError:
+                pass
+        if self._extra:
+            for item in self._extra.iteritems():
+                yield item
+
+    def items(self):
+        return list(self.iteritems())
+
+    def keys(self):
+        return [key for key, value in self.iteritems()]
+
+    def values(self):
+        return [value for key, value in self.iteritems()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def to_dict(self):
+        """
+        :rtype: dict
+        :return: the dict DictConverter would give for the same element
+        """
+        return dict(self.iteritems())
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.to_dict())
+
+    def __reduce__(self):
+        # the class is not a module attribute : it is made again when unpickling
+        return _make_record, (self.__class__.__name__, self._fields, self.to_dict())
+
+Mapping.register(Record)
+
+
+def _make_record(name, fields, values):
+    """ Unpickles a Record, see Record.__reduce__() """
+    return record_class(name, fields)(values)
+
+
+def record_class(name, fields):
+    """
+    :param str name: class name, eg the record xml tag
+    :param list fields: field names, the ones which are not python identifiers or
+        clash with a Record attribute are kept in a dict by each record
+    :rtype: type
+    :return: Record subclass with a slot per field, the same one for the same
+        name and fields
+    """
+    key = (name, tuple(fields))
+    cls = _RECORD_CLASSES.get(key)
+    if cls is not None:
+        return cls
+    slots = []
+    for field in fields:
+        if isinstance(field, unicode):
+            try:
+                field = field.encode('ascii')
+            except UnicodeError:
+                continue
+        if field.replace('_', 'a').isalnum() and not field[0].isdigit() \
+                and not field.startswith('_') and not hasattr(Record, field) \
+                and field not in slots:
+            slots.append(field)
+    cls = type(name, (Record,), {'__slots__': tuple(slots)})
+    cls._fields = tuple(slots)
+    cls._slots = frozenset(slots)
+    return _RECORD_CLASSES.setdefault(key, cls)
+
+
+class RecordConverter(DictConverter):
+    """
+    DictConverter giving Record instances for the converted elements,
+    nested elements are still dicts
+    """
+
+    def __init__(self, cast_fields=None, useless_key=None, fields=None, name='Record'):
+        """
+        :param list fields: record fields, taken from the first converted element
+            when not given
+        :param str name: name of the record class
+        """
+        super(RecordConverter, self).__init__(cast_fields, useless_key)
+        self.name = name
+        self.record_class = fields and record_class(name, fields) or None
+
+    def convert_record(self, element):
+        """
+        :param etree._Element element: lxml element
+        :rtype: Record
+        :return: record with the values of convert(), or the value itself if useless_key
+            replaced the dict
+        """
+        values = self.convert(element)
+        if values.__class__ is not dict:
+            return values
+        if self.record_class is None:
+            tag = element.tag
+            # fields in the order of the first element
+            start = tag[0] == '{' and tag.index('}') + 1 or 0
+            children_tag = start and tag[:start] + '*' or '{}*'
+            self.record_class = record_class(self.name,
+                        [child.tag[start:] for child in _iterchildren(element, children_tag)])
+        return self.record_class(values)
@@ -0,0 +1,489 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+###############################################################################
+#                                                                             #
+#   ebaypyt                                                                   #
+#                                                                             #
+#   Copyright (C) 2012 Akretion Sébastien BEAU <sebastien.beau@akretion.com>  #
+#                               David BEAL <david.beal@akretion.com>          #
+#                                                                             #
+#   This program is free software: you can redistribute it and/or modify      #
+#   it under the terms of the GNU Affero General Public License as            #
+#   published by the Free Software Foundation, either version 3 of the        #
+#   License, or (at your option) any later version.                           #
+#                                                                             #
+#   This program is distributed in the hope that it will be useful,           #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of            #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the             #
+#   GNU Affero General Public License for more details.                       #
+#                                                                             #
+#   You should have received a copy of the GNU Affero General Public License  #
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+"""
+    Streaming processing of the downloadFile multipart (MIME/XOP) response :
+    boundaries are found incrementally while reading the socket and the zip
+    attachment is spooled to disk, so the report is never fully held in memory.
+    split_multipart() locates the parts of a response already in memory.
+"""
+
+import hashlib
+import httplib
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# checksum of the files saved by Job.download_to()
+DOWNLOAD_CHECKSUM = 'sha256'
+
+# members of an archive extracted at once by extract_members()
+EXTRACT_WORKERS = 4
+
+# Job.download() gives a single report : the other members would be lost
+MULTIPLE_REPORTS_ERROR = "The downloaded zip file holds %d reports : read them with " \
+                         "Job.iter_report_members() or Job.extract_to()"
+
+_CONTENT_RANGE = re.compile(r'^\s*bytes\s+(\d+)-(\d+)/(\d+|\*)\s*$')
+
+
+class TruncatedResponse(httplib.IncompleteRead):
+    """
+    The connection dropped before the end of a streamed multipart response. httplib
+    only raises IncompleteRead when the whole body is read at once : the error is an
+    IncompleteRead so that RetryPolicy sends the call again
+    """
+    def __init__(self, message, partial=''):
+        httplib.IncompleteRead.__init__(self, partial)
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+
+def _parse_headers(block):
+    """
+    :param str block: header lines of a part
+    :rtype: dict
+    :return: {lower case header name: value}
+    """
+    headers = {}
+    for line in block.splitlines():
+        if ':' in line:
+            key, value = line.split(':', 1)
+            headers[key.strip().lower()] = value.strip()
+    return headers
+
+
+def split_multipart(data):
+    """
+    Locates the parts of a multipart response in a single pass : the parts
+    are not copied, use the offsets to slice or wrap the ones needed
+    :param str data: multipart response
+    :rtype: list
+    :return: [(headers, body start offset, body end offset)] of each part
+    """
+    # the first non empty line is the boundary string
+    boundary, start = '', 0
+    while not boundary:
+        end = data.find('\r\n', start)
+        if end < 0:
+            raise Exception("Truncated MIME response : boundary not found")
+        boundary = data[start:end].strip()
+        start = end + 2
+    delimiter = '\r\n' + boundary
+    parts = []
+    while True:
+        if data.startswith('\r\n', start):
+            headers, body_start = {}, start + 2
+        else:
+            end = data.find('\r\n\r\n', start)
+            if end < 0:
+                raise Exception("Truncated MIME response : part headers not found")
+            headers, body_start = _parse_headers(data[start:end]), end + 4
+        body_end = data.find(delimiter, body_start)
+        if body_end < 0:
+            raise Exception("Truncated MIME response : closing boundary not found")
+        parts.append((headers, body_start, body_end))
+        start = body_end + len(delimiter)
+        if data.startswith('--', start):
+            return parts
+        start = data.find('\r\n', start)
+        if start < 0:
+            raise Exception("Truncated MIME response : closing boundary not found")
+        start += 2
+
+
+def parse_content_range(value):
+    """
+    :param str value: Content-Range header of a 206 response, eg 'bytes 500-999/1000'
+    :rtype: tuple
+    :return: (first byte, last byte, total size or None if unknown) or None if value is not valid
+    """
+    match = _CONTENT_RANGE.match(value or '')
+    if match is None:
+        return None
+    first, last, total = match.groups()
+    return int(first), int(last), total != '*' and int(total) or None
+
+
+def verify_zip(path):
+    """
+    Checks the CRC of every member of a zip file, which reads and decompresses them all
+    :param str path: zip file path
+    :rtype: None
+    :raise: Exception if the file is not a complete zip file or a member is corrupted
+    """
+    try:
+        archive = zipfile.ZipFile(path, 'r')
+    except zipfile.BadZipfile as error:
+        raise Exception("Corrupted zip file %s : %s" % (path, error))
+    try:
+        bad_member = archive.testzip()
+    finally:
+        archive.close()
+    if bad_member is not None:
+        raise Exception("Corrupted zip file %s : bad CRC for %s" % (path, bad_member))
+
+
+def iter_zip_members(zip_file):
+    """
+    Streams every member of a zip archive : members are decompressed while being read
+    and none of them is loaded in memory by this function
+    :param zip_file: zip file path or file-like object opened in binary read mode
+    :rtype: generator
+    :return: (member name, file-like object over the member), the file-like object
+        is closed when the next member is yielded
+    """
+    archive = zipfile.ZipFile(zip_file, 'r')
+    try:
+        for info in archive.infolist():
+            if info.filename.endswith('/'):
+                continue
+            member = archive.open(info)
+            try:
+                yield info.filename, member
+            finally:
+                member.close()
+    finally:
+        archive.close()
+
+
+def read_member(member, chunk_size=None):
+    """
+    Reads a whole archive member without its leading and trailing blanks : they are
+    dropped from the first and last chunks instead of stripping a copy of the content
+    :param file member: file-like object returned by iter_zip_members()
+    :param int chunk_size: number of bytes decompressed at once
+    :rtype: str
+    """
+    chunk_size = chunk_size or DOWNLOAD_CHUNK_SIZE
+    chunks = []
+    chunk = member.read(chunk_size)
+    while chunk and not chunks:
+        chunk = chunk.lstrip()
+        if chunk:
+            chunks.append(chunk)
+        chunk = member.read(chunk_size)
+    while chunk:
+        chunks.append(chunk)
+        chunk = member.read(chunk_size)
+    # trailing blanks may span several chunks
+    while chunks and chunks[-1][-1:].isspace():
+        chunks[-1] = chunks[-1].rstrip()
+        if not chunks[-1]:
+            chunks.pop()
+    return ''.join(chunks)
+
+
+def _member_path(directory, name):
+    """
+    :rtype: str
+    :return: path of the member name in directory
+    :raise: Exception if name would be written outside of directory
+    """
+    path = os.path.normpath(os.path.join(directory, name))
+    if os.path.isabs(name) or not path.startswith(os.path.normpath(directory) + os.sep):
+        raise Exception("Unsafe zip member name %s" % name)
+    return path
+
+
+def _extract_member(path, name, target, chunk_size):
+    """ Extracts one member, with its own handle on the archive so that threads do not share it """
+    archive = zipfile.ZipFile(path, 'r')
+    try:
+        parent = os.path.dirname(target)
+        if not os.path.isdir(parent):
+            try:
+                os.makedirs(parent)
+            except OSError:
+                # created by another thread in the meantime
+                if not os.path.isdir(parent):
+                    raise
+        member = archive.open(name)
+        try:
+            with open(target, 'wb') as output:
+                shutil.copyfileobj(member, output, chunk_size)
+        finally:
+            member.close()
+    finally:
+        archive.close()
+    return {'name': name, 'path': target, 'size': os.path.getsize(target)}
+
+
+def extract_members(path, directory, max_workers=None, chunk_size=None):
+    """
+    Extracts every member of a zip file into directory, several members at once :
+    zlib releases the GIL, so members are decompressed in parallel
+    :param str path: zip file path
+    :param str directory: target directory, created if needed
+    :param int max_workers: number of members extracted at once, EXTRACT_WORKERS by default
+    :param int chunk_size: number of bytes decompressed at once
+    :rtype: list
+    :return: [{'name': member name, 'path': extracted file path, 'size': bytes}]
+        in the archive order
+    """
+    chunk_size = chunk_size or DOWNLOAD_CHUNK_SIZE
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    archive = zipfile.ZipFile(path, 'r')
+    try:
+        names = [name for name in archive.namelist() if not name.endswith('/')]
+    finally:
+        archive.close()
+    # checked before writing anything
+    targets = [_member_path(directory, name) for name in names]
+    if len(names) < 2:
+        return [_extract_member(path, name, target, chunk_size)
+                                                    for name, target in zip(names, targets)]
+    # multiprocessing is only loaded for the archives of several members
+    from multiprocessing.pool import ThreadPool
+    workers = ThreadPool(min(max_workers or EXTRACT_WORKERS, len(names)))
+    try:
+        return workers.map(lambda item: _extract_member(path, item[0], item[1], chunk_size),
+                                                    zip(names, targets), chunksize=1)
+    finally:
+        workers.close()
+        workers.join()
+
+
+class MimeStreamReader(object):
+    """ Incremental reader of a multipart response, one part after the other """
+
+    def __init__(self, fp, chunk_size=None):
+        """
+        :param file fp: file-like object with a read(size) method, eg httplib response
+        :param int chunk_size: number of bytes read from fp at once
+        """
+        self.fp = fp
+        self.chunk_size = chunk_size or DOWNLOAD_CHUNK_SIZE
+        self.boundary = None
+        self._buffer = ''
+
+    def _fill(self):
+        """
+        Reads the next chunk from fp into the buffer
+        :rtype: boolean
+        :return: False when fp is exhausted
+        """
+        data = self.fp.read(self.chunk_size)
+        self._buffer += data
+        return bool(data)
+
+    def _read_until(self, marker):
+        """
+        Consumes the buffer up to marker : only used for small blocks (boundary, headers)
+        :param str marker: string to look for
+        :rtype: str
+        :return: data found before marker
+        """
+        start = 0
+        while True:
+            index = self._buffer.find(marker, start)
+            if index >= 0:
+                data = self._buffer[:index]
+                self._buffer = self._buffer[index + len(marker):]
+                return data
+            start = max(0, len(self._buffer) - len(marker) + 1)
+            if not self._fill():
+                raise TruncatedResponse("Truncated MIME response : '%s' not found"
+                                                                            % marker.strip())
+
+    def next_part(self):
+        """
+        Moves to the next part of the response
+        :rtype: dict
+        :return: headers of the part or None when the closing boundary is reached
+        """
+        if self.boundary is None:
+            # the first non empty line is the boundary string
+            while not self.boundary:
+                self.boundary = self._read_until('\r\n').strip()
+        else:
+            while len(self._buffer) < 2 and self._fill():
+                pass
+            if self._buffer.startswith('--'):
+                return None
+        return _parse_headers(self._read_until('\r\n\r\n'))
+
+    def iter_body(self):
+        """
+        Yields the content of the current part by chunks, up to the next boundary
+        :rtype: generator
+        :return: str chunks
+        """
+        delimiter = '\r\n' + self.boundary
+        keep = len(delimiter) - 1
+        while True:
+            index = self._buffer.find(delimiter)
+            if index >= 0:
+                chunk = self._buffer[:index]
+                self._buffer = self._buffer[index + len(delimiter):]
+                if chunk:
+                    yield chunk
+                return
+            if len(self._buffer) > keep:
+                chunk = self._buffer[:-keep]
+                self._buffer = self._buffer[-keep:]
+                yield chunk
+            if not self._fill():
+                raise TruncatedResponse("Truncated MIME response : closing boundary not found")
+
+    def read_body(self):
+        """
+        :rtype: str
+        :return: the whole content of the current part : only for small parts
+        """
+        return ''.join(self.iter_body())
+
+    def spool_body(self, sink):
+        """
+        Writes the content of the current part into sink
+        :param file sink: file opened in binary write mode
+        :rtype: int
+        :return: number of bytes written
+        """
+        size = 0
+        for chunk in self.iter_body():
+            sink.write(chunk)
+            size += len(chunk)
+        return size
+
+    def drain(self):
+        """ Reads fp up to its end so that the connection can be reused """
+        self._buffer = ''
+        while self.fp.read(self.chunk_size):
+            pass
+
+
+class ReportFile(object):
+    """
+    File-like object over the decompressed report spooled in a temporary zip file.
+    Iterating over it yields the report lines.
+    """
+
+    def __init__(self, zip_file):
+        """
+        :param file zip_file: temporary file containing the zip archive, closed
+            with the ReportFile or if the archive does not hold a single report
+        :raise: Exception if the archive has no member or several ones
+        """
+        self._zip_file = zip_file
+        try:
+            self._archive = zipfile.ZipFile(zip_file, 'r')
+            names = self._archive.namelist()
+            if len(names) != 1:
+                self._archive.close()
+                raise Exception(names and MULTIPLE_REPORTS_ERROR % len(names)
+                                                or "No report in the downloaded zip file")
+            self.name = names[0]
+            self._member = self._archive.open(self.name)
+        except Exception:
+            zip_file.close()
+            raise
+
+    def read(self, size=-1):
+        return self._member.read(size)
+
+    def readline(self, size=-1):
+        return self._member.readline(size)
+
+    def __iter__(self):
+        return iter(self._member)
+
+    def close(self):
+        self._member.close()
+        self._archive.close()
+        self._zip_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class HashingWriter(object):
+    """ Writable file wrapper computing the size and checksum of the data written """
+
+    def __init__(self, fp, algorithm=None):
+        """
+        :param file fp: file opened in binary write mode
+        :param str algorithm: hashlib algorithm, DOWNLOAD_CHECKSUM by default
+        """
+        self.fp = fp
+        self.algorithm = algorithm or DOWNLOAD_CHECKSUM
+        self.seek(0)
+
+    def write(self, data):
+        self.fp.write(data)
+        self._hash.update(data)
+        self.size += len(data)
+
+    def seek(self, offset):
+        """ Only rewinding to the start is supported, eg before writing again after an error """
+        if offset:
+            raise ValueError("HashingWriter can only seek to 0")
+        self.fp.seek(0)
+        self._hash = hashlib.new(self.algorithm)
+        self.size = 0
+
+    def truncate(self):
+        self.fp.truncate()
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+def spool_download(fp, chunk_size=None, sink=None):
+    """
+    Reads a downloadFile multipart response and spools its zip attachment to disk
+    :param file fp: file-like object with a read(size) method, eg httplib response
+    :param int chunk_size: number of bytes read from fp at once
+    :param file sink: file receiving the zip, a temporary file by default
+    :rtype: tuple
+    :return: (xml response string, zip file or None if no attachment),
+        a temporary zip file is rewound
+    """
+    reader = MimeStreamReader(fp, chunk_size)
+    xml_response, zip_file = '', None
+    headers = reader.next_part()
+    if headers is not None:
+        xml_response = reader.read_body().strip()
+        headers = reader.next_part()
+    if headers is not None and sink is not None:
+        reader.spool_body(sink)
+        zip_file = sink
+    elif headers is not None:
+        zip_file = tempfile.TemporaryFile('w+b', -1, '.zip')
+        try:
+            reader.spool_body(zip_file)
+        except Exception:
+            zip_file.close()
+            raise
+        zip_file.seek(0)
+    reader.drain()
+    return xml_response, zip_file
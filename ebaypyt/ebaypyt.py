@@ -34,13 +34,28 @@ __author__ = "Sébastien BEAU / David BEAL"
 __version__ = "0.2.0"
 __date__ = "2012-07-24"
 
+import copy
 import httplib
-import uuid
-import zipfile
-import tempfile
+import os
+import socket
+import time
+from cStringIO import StringIO
 from datetime import date, datetime, timedelta
-from lxml import etree
-from lxml import objectify
+
+from lazy import LazyModule
+from pool import ConnectionPool
+from ratelimit import RateLimiter, RateLimitError
+from retry import IDEMPOTENT_ACTIONS, HttpStatusError, RetryPolicy, parse_retry_after
+from metrics import CallTimer, CountingReader
+from serializer import NAMESPACES, escape, get_template, xml_tag
+
+# imported on first use, like the download, columnar, convert, cache and parsing modules :
+# a process which only gets jobs never loads zipfile, tempfile, uuid or multiprocessing
+etree = LazyModule('lxml.etree')
+objectify = LazyModule('lxml.objectify')
+tempfile = LazyModule('tempfile')
+uuid = LazyModule('uuid')
+zipfile = LazyModule('zipfile')
 
 ALLOWABLE_JOB_TYPES = ('ActiveInventoryReport', 'SoldReport')
 # Documentation define another report but api alerts "JobType 'FeeSettlementReport' is unsupported"
@@ -57,56 +72,152 @@ SUCCESS_TAG = {'api':'Ack', 'web': 'ack', 'file': 'ack'}
 APIS_COMPATIBILITY_LEVEL = 781
 
 ZULU_STRING = 'T00:00:00Z'
+ZULU_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S.000Z'
 
 HISTORIC_DAYS_MAX = 27
 
+# default number of concurrent calls of EbayWebService.get_many()
+GET_MANY_WORKERS = 8
+
+CONVERTERS_CACHE_SIZE = 64
+_CONVERTERS = {}
+
+# jobs requested at once by Job.iter_jobs()
+JOBS_PAGE_SIZE = 100
+
+# xml tag of one record in each report type
+REPORT_RECORD_TAGS = {'ActiveInventoryReport': 'SKUDetails', 'SoldReport': 'OrderDetails'}
+
 def objectify_to_dict(xml_objectify, cast_fields=None, useless_key=None):
     '''
         :params xml_objectify objectity: an objectify object that represente an xml
+            (a plain lxml.etree element is faster to convert and gives the same result)
         :params cast_fields dict: dictionnary that can force the type of each value return
         :params useless_key list: if a parent key is in this list and if this parent key have
             for value a dictionnary with only one key.
             The parent key will be drop and only the child key will be visible in the response
     '''
-    result = {}
-    if not cast_fields: cast_fields = {}
-
-    for key in xml_objectify.__dict__.keys():
-
-        if cast_fields.get(key) == list:
-            result[key] = []
-            for element in xml_objectify.__dict__[key]:
-                result[key].append(objectify_to_dict(element, cast_fields=cast_fields, useless_key=useless_key))
-        elif hasattr(xml_objectify.__dict__[key], 'pyval'):
-            if cast_fields.get(key):
-                if cast_fields[key] == str :
-                    result[key] = cast_fields.get(key)(xml_objectify.__dict__[key].text)
-                else:
-                    result[key] = cast_fields.get(key)(xml_objectify.__dict__[key].pyval)
-            else:
-                result[key] = xml_objectify.__dict__[key].pyval
-        else:
-            result[key] = objectify_to_dict(xml_objectify.__dict__[key], cast_fields=cast_fields, useless_key=useless_key)
-        if useless_key and len(result) == 1 and result.keys()[0] in useless_key:
-            return result[result.keys()[0]]
-    return result
+    return get_converter(cast_fields, useless_key).convert(xml_objectify)
+
+
+def get_converter(cast_fields=None, useless_key=None):
+    """
+    Gives the DictConverter compiled for these parameters, kept in cache
+    :rtype: DictConverter
+    """
+    try:
+        key = (frozenset((cast_fields or {}).items()), frozenset(useless_key or ()))
+        converter = _CONVERTERS.get(key)
+    except TypeError:
+        # unhashable cast function
+        from convert import DictConverter
+        return DictConverter(cast_fields, useless_key)
+    if converter is None:
+        from convert import DictConverter
+        if len(_CONVERTERS) >= CONVERTERS_CACHE_SIZE:
+            _CONVERTERS.clear()
+        converter = _CONVERTERS[key] = DictConverter(cast_fields, useless_key)
+    return converter
+
+
+def tree_namespace(tree):
+    """
+    :param tree: lxml etree or objectify element
+    :rtype: str
+    :return: '{namespace}' of the element or '' if it has none
+    """
+    tag = tree.tag
+    return tag[0] == '{' and tag[:tag.index('}') + 1] or ''
+
+
+def response_ack(tree, api):
+    """
+    :param tree: lxml etree or objectify response, with or without its namespace
+    :param str api: api type used by this api call service
+    :rtype: str
+    :return: 'Success', 'Failure', 'Warning' ...
+    """
+    return tree.findtext(tree_namespace(tree) + SUCCESS_TAG[api])
+
+
+def response_to_dict(api, response, xml_tag=None, cast_fields=None, useless_key=None):
+    """
+    Converts a raw response into a dict, in the calling process or in a ParsePool worker
+    :param str api: api type used by this api call service
+    :param str response: raw response
+    :param str xml_tag: only return the value of this tag
+    :param dict cast_fields: see objectify_to_dict()
+    :param list useless_key: see objectify_to_dict()
+    :rtype: tuple
+    :return: (True, dict or xml_tag value, False if missing) or (False, None) if the call
+        failed : EbayError can not be pickled, the caller raises it
+    """
+    tree = etree.fromstring(response)
+    if response_ack(tree, api) == "Failure":
+        return False, None
+    result = get_converter(cast_fields, useless_key).convert(tree)
+    if xml_tag is not None:
+        result = result.get(xml_tag, False)
+    return True, result
+
+
+def parse_report_records(report, record_tag, cast_fields=None, useless_key=None,
+                                                                as_records=False, fields=None):
+    """
+    Parses an xml report incrementally, see Job.iter_report_records()
+    :param file report: file-like object over the xml report, eg a ReportFile
+    :param str record_tag: xml tag of a record, eg 'SKUDetails', see REPORT_RECORD_TAGS
+    :rtype: generator
+    :return: one dict or Record per record
+    """
+    if as_records or fields:
+        from convert import RecordConverter
+        # the fields of each report are learnt : no shared converter
+        convert = RecordConverter(cast_fields, useless_key, fields, record_tag).convert_record
+    else:
+        convert = get_converter(cast_fields, useless_key).convert
+    for event, element in etree.iterparse(report, tag='{*}' + record_tag):
+        yield convert(element)
+        # free the parsed records
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
 
 
 class EbayError(Exception):
+     """
+     Failure answered by eBay. The Trading and Shopping apis send Errors elements
+     (ErrorCode, ShortMessage, LongMessage), the Large Merchant Services and file apis
+     an errorMessage.error element (errorId, message)
+     """
      def __init__(self, objectify_value):
-         self.error_id = objectify_value.errorMessage.error.errorId
-         self.error_message = objectify_value.errorMessage.error.message
+         self.error_id = None
+         self.error_message = 'Unknown error'
+         if hasattr(objectify_value, 'errorMessage'):
+             self.error_id = objectify_value.errorMessage.error.errorId
+             self.error_message = objectify_value.errorMessage.error.message
+         elif hasattr(objectify_value, 'Errors'):
+             # warnings may come along with the error
+             errors = list(objectify_value.Errors)
+             error = [error for error in errors
+                        if getattr(error, 'SeverityCode', None) != 'Warning'] or errors
+             error = error[0]
+             self.error_id = getattr(error, 'ErrorCode', None)
+             self.error_message = getattr(error, 'LongMessage', None) or \
+                                                getattr(error, 'ShortMessage', self.error_message)
 
      def __str__(self):
          return repr(self.error_message) + ', Error number:' + repr(self.error_id)
 
 
 class EbayObject(object):
-    """ Generic object for ebay access """
+    """
+    Generic object for ebay access.
+    Calls keep their state in local variables : an instance may be used by several threads
+    """
     def __init__(self, connection, params):
         self.connection = connection
-        self.unique_execution_ID = uuid.uuid4()
-        # self.params = params
+        self.params = params
 
     def _update_params_value(self, key, new_value):
         """
@@ -120,17 +231,20 @@ class EbayObject(object):
         if value:
             self.params[key] = new_value
 
-    def build_xml_tag(self, tag, mandatory=False, allowables=None, default=None):
+    def build_xml_tag(self, tag, mandatory=False, allowables=None, default=None, params=None):
         """
         Build a complete xml tag : <my_tag>my_value</my_tag>
         :param str tag: xml tag
         :param boolean mandatory: indicate if tag must be generate
         :param list allowables: list of allowed values
-        :param str default: default value if not exist in self.params
+        :param str default: default value if not exist in params
+        :param dict params: parameters of the request, self.params by default
         :rtype: str
-        :return: xml completed tag
+        :return: xml completed tag, value is escaped
         """
-        value = self.params.get(tag, None)
+        if params is None:
+            params = self.params
+        value = params.get(tag, None)
         if mandatory == True and not value:
             if default:
                 value = default
@@ -140,7 +254,7 @@ class EbayObject(object):
             if allowables and value not in allowables:
                 raise Exception("'%s' is not correct : use one of these values %s" % \
                                                                         (value, str(allowables)))
-            return '\n\t<%s>%s</%s>' % (tag, value, tag)
+            return xml_tag(tag, value)
         else:
             return ''
 
@@ -155,19 +269,25 @@ class EbayObject(object):
         """
         return ''
 
-    def call(self, action, api, params=None):
+    def call(self, action, api, params=None, stream=False, as_etree=False, sink=None,
+                                                                                to_dict=None):
         """
         Generics processing for all chidren object
         USE IT in each child class
         :param str action: processing type to execute
         :param dict params: parameters used to build xml request
+        :param boolean stream: only for 'file' api, see Communication.web_service_processing()
+        :param boolean as_etree: see Communication.web_service_processing()
+        :param file sink: only for 'file' api, see Communication.web_service_processing()
+        :param tuple to_dict: see Communication.web_service_processing()
         :rtype: str
         :return: specfic xml string used to build request
         """
         core_request = self.build_request(action, params=params)
-        return self.connection.web_service_processing(action, core_request, api=api)
+        return self.connection.web_service_processing(action, core_request, api=api,
+                            stream=stream, as_etree=as_etree, sink=sink, to_dict=to_dict)
 
-    def download(self, params):
+    def download(self, params, stream=False):
         print "'download' method should be only used with 'Job' object "
 
     def create(self, params):
@@ -182,13 +302,16 @@ class EbayObject(object):
         :rtype: dict
         :return: web service response in a dictionary
         """
-        tree = self.call(web_service_request, api, params=params)
-
-        if xml_tag in [e.tag for e in tree.getchildren()]:
+        def extract(tree):
             xml_dict = objectify_to_dict(tree, {xml_tag: list})
-            return xml_dict[xml_tag]
-        else:
-            return False
+            return xml_dict.get(xml_tag, False)
+
+        if self.connection.parse_pool:
+            # converted by a worker process
+            return self.call(web_service_request, api, params=params,
+                                                    to_dict=(xml_tag, {xml_tag: list}, None))
+        tree = self.call(web_service_request, api, params=params, as_etree=True)
+        return self.connection.then(tree, extract)
 
 
 class RecurringJob(EbayObject):
@@ -200,51 +323,68 @@ class RecurringJob(EbayObject):
     def build_request(self, action, params):
         ''' see EbayObject.build_request() docstring '''
 
-        request  = ""
-        self.params = params
+        request = []
 
         if action == 'deleteRecurringJob' :
-            request += """
-    <recurringJobId>%s</recurringJobId>""" %params
+            request.append("""
+    <recurringJobId>%s</recurringJobId>""" % escape(params))
 
         elif action == 'createRecurringJob' :
-            request += """
-    <UUID>%s</UUID>""" % self.unique_execution_ID
-            request += self.build_xml_tag('jobType', allowables=ALLOWABLE_JOB_TYPES)
+            request.append("""
+    <UUID>%s</UUID>""" % uuid.uuid4())
+            request.append(self.build_xml_tag('jobType', allowables=ALLOWABLE_JOB_TYPES,
+                                                                            params=params))
 
-            recurrency_type = params['recurrency'].get('type')
+            recurrency = params['recurrency']
+            recurrency_type = recurrency.get('type')
 
             if recurrency_type == 'frequency':
-                request += '''
-    <frequencyInMinutes>%s</frequencyInMinutes>''' % params['recurrency']['time']
+                request.append('''
+    <frequencyInMinutes>%s</frequencyInMinutes>''' % escape(recurrency['time']))
 
             elif recurrency_type == 'daily':
-                request += """
+                request.append("""
     <dailyRecurrence>
         <timeOfDay>%s</timeOfDay>
-    </dailyRecurrence>"""% params['recurrency']['time']
+    </dailyRecurrence>""" % escape(recurrency['time']))
 
             elif recurrency_type == 'weekly':
-                request += """
+                request.append("""
     <weeklyRecurrence>
         <dayOfWeek>%s</dayOfWeek>
         <timeOfDay>%s</timeOfDay>
-    </weeklyRecurrence>"""%(params['recurrency']['day'], params['recurrency']['time'])
+    </weeklyRecurrence>""" % (escape(recurrency['day']), escape(recurrency['time'])))
 
             elif recurrency_type == 'monthly':
-                request += """
+                request.append("""
     <monthlyRecurrence>
         <dayOfMonth>%s</dayOfMonth>
         <timeOfDay>%s</timeOfDay>
-    </monthlyRecurrence>"""%(params['recurrency']['day'], params['recurrency']['time'])
+    </monthlyRecurrence>""" % (escape(recurrency['day']), escape(recurrency['time'])))
 
-        return request
+        return ''.join(request)
 
     def get(self, filter=None):
+        def first(response):
+            if response != False:
+                response = response[0]
+            return response
+
         response = super(RecurringJob, self).get('getRecurringJobs', 'web', 'recurringJobDetail')
-        if response != False:
-            response = response[0]
-        return response
+        return self.connection.then(response, first)
+
+    def iter_recurring_jobs(self):
+        """
+        All the recurring jobs, where get() only gives the first one.
+        getRecurringJobs has no pagination : the jobs come in one response
+        but are only converted when they are yielded
+        :rtype: generator
+        :return: one dict per recurring job
+        """
+        converter = get_converter()
+        tree = self.call('getRecurringJobs', 'web', as_etree=True)
+        for element in tree.iterchildren(tree_namespace(tree) + 'recurringJobDetail'):
+            yield converter.convert(element)
 
     def delete(self, ebay_id):
         return self.call('deleteRecurringJob', 'web', ebay_id)
@@ -345,14 +485,17 @@ class RecurringJob(EbayObject):
         if params.get('day'):
             day = params.get('day')
 
+        params = dict(params)
         params['recurrency'] = self._get_recurrence_params(params.get('time'), type_recurrence, day)
 
-        tree = self.call('createRecurringJob', 'web', params)
+        def job_id(tree):
+            if hasattr(tree, 'recurringJobId'):
+                return tree.recurringJobId.text
+            else:
+                return False
 
-        if 'recurringJobId' in [e.tag for e in tree.getchildren()]:
-            return tree.recurringJobId.text
-        else:
-            return False
+        tree = self.call('createRecurringJob', 'web', params)
+        return self.connection.then(tree, job_id)
 
 class Job(EbayObject):
     """ Accessing 'jobs' defined in RecurringJob class """
@@ -361,52 +504,305 @@ class Job(EbayObject):
 
     def build_request(self, action, params):
         """ see EbayObject.build_request() docstring """
-        request  = ""
-        self.params = params
+        request = []
 
         if action == 'downloadFile':
-            request += self.build_xml_tag('taskReferenceId', mandatory=True)
-            request += self.build_xml_tag('fileReferenceId', mandatory=True)
+            request.append(self.build_xml_tag('taskReferenceId', mandatory=True, params=params))
+            request.append(self.build_xml_tag('fileReferenceId', mandatory=True, params=params))
 
         elif action == 'getJobs':
-            request += self.build_xml_tag('jobType', allowables=ALLOWABLE_JOB_TYPES)
-            request += self.build_xml_tag('jobStatus', allowables=ALLOWABLE_JOB_STATUS)
+            # the given dict is left untouched, it may be reused for the next calls
+            params = dict(params or {})
+            request.append(self.build_xml_tag('jobType', allowables=ALLOWABLE_JOB_TYPES,
+                                                                            params=params))
+            request.append(self.build_xml_tag('jobStatus', allowables=ALLOWABLE_JOB_STATUS,
+                                                                            params=params))
 
             param_key = 'creationTimeFrom'
 
             # check params[param_key]
-            new_value = self.params.get(param_key)
-            if not new_value:
-                new_value, self.params[param_key] = str(HISTORIC_DAYS_MAX), str(HISTORIC_DAYS_MAX)
+            new_value = params.get(param_key)
+            if isinstance(new_value, datetime):
+                # exact UTC time, eg the watermark of an incremental sync
+                params[param_key] = new_value.strftime(ZULU_DATETIME_FORMAT)
             else:
-                new_value = str(new_value)
-            if new_value.isdigit() and int(new_value) > 0 and int(new_value) <= HISTORIC_DAYS_MAX:
-                new_value = int(new_value)
-            else:
-                raise Exception("parameter '%s' = %s is not valid a number of days (between 1 and %s). Please modify it" % \
-                                                    (param_key, new_value, HISTORIC_DAYS_MAX))
+                if not new_value:
+                    new_value, params[param_key] = str(HISTORIC_DAYS_MAX), str(HISTORIC_DAYS_MAX)
+                else:
+                    new_value = str(new_value)
+                if new_value.isdigit() and int(new_value) > 0 and int(new_value) <= HISTORIC_DAYS_MAX:
+                    new_value = int(new_value)
+                else:
+                    raise Exception("parameter '%s' = %s is not valid a number of days (between 1 and %s). Please modify it" % \
+                                                        (param_key, new_value, HISTORIC_DAYS_MAX))
 
-            # transform number of days in datetime UTC
-            new_value = (date.today() + \
-                timedelta(-int(self.params[param_key]))).isoformat() + ZULU_STRING
-            self.params[param_key] = new_value
+                # transform number of days in datetime UTC
+                new_value = (date.today() + \
+                    timedelta(-int(params[param_key]))).isoformat() + ZULU_STRING
+                params[param_key] = new_value
 
-            request += self.build_xml_tag(param_key)
+            request.append(self.build_xml_tag(param_key, params=params))
 
-        return request
+            if params.get('pageNumber') or params.get('entriesPerPage'):
+                request.append('\n\t<paginationInput>')
+                request.append(self.build_xml_tag('entriesPerPage', params=params))
+                request.append(self.build_xml_tag('pageNumber', params=params))
+                request.append('\n\t</paginationInput>')
+
+        return ''.join(request)
 
-    def download(self, params):
+    def download(self, params, stream=False):
         """
         Download file report
         :param dict params: {'taskReferenceId': '5...', 'fileReferenceId': '5...'}
-        :rtype: str
-        :return: xml string
+        :param boolean stream: spool the report to disk and return a file-like object
+            instead of a string, memory use then stays low whatever the report size
+        :rtype: str or ReportFile
+        :return: xml string or file-like object over the xml report (close it after use)
+        :raise: Exception if the zip file holds several reports, see iter_report_members()
         """
-        return self.call('downloadFile', 'file', params)
+        return self.call('downloadFile', 'file', params, stream=stream)
+
+    def download_to(self, params, path, resumable=False):
+        """
+        Download file report and save its zip file as it is received,
+        without holding it in memory
+        :param dict params: {'taskReferenceId': '5...', 'fileReferenceId': '5...'}
+        :param str path: zip file path, written through a temporary '.part' file
+        :param boolean resumable: keep the received bytes in a '.download' file, so that
+            a dropped connection or a later call for the same path resumes from them,
+            see Communication.fetch_resumable(). The zip file CRC are checked
+        :rtype: dict
+        :return: {'path': path or None if the job has no file, 'size': bytes,
+            'sha256': checksum of the zip file}, see download.DOWNLOAD_CHECKSUM.
+            A resumable download also gives the fetch_resumable() counters
+        """
+        from download import HashingWriter
+        if resumable:
+            return self._download_resumable(params, path)
+        part_path = path + '.part'
+        part = open(part_path, 'wb')
+        try:
+            sink = HashingWriter(part)
+            saved = self.call('downloadFile', 'file', params, sink=sink)
+        except Exception:
+            part.close()
+            os.remove(part_path)
+            raise
+        part.close()
+        if saved is None:
+            os.remove(part_path)
+            return {'path': None, 'size': 0, sink.algorithm: None}
+        os.rename(part_path, path)
+        return {'path': path, 'size': sink.size, sink.algorithm: sink.hexdigest()}
+
+    def _download_resumable(self, params, path):
+        """ see download_to() """
+        from download import HashingWriter, spool_download, verify_zip
+        raw_path = path + '.download'
+        part_path = path + '.part'
+        with open(raw_path, 'a+b') as raw:
+            # on network errors the raw file is kept for the next call
+            result = self.connection.fetch_resumable('downloadFile',
+                                    self.build_request('downloadFile', params), 'file', raw)
+            raw.seek(0)
+            part = open(part_path, 'wb')
+            try:
+                sink = HashingWriter(part)
+                xml_response, saved = spool_download(raw, sink=sink)
+                part.close()
+                xml_objectify = objectify.fromstring(xml_response)
+                if response_ack(xml_objectify, 'file') == "Failure":
+                    raise EbayError(xml_objectify)
+                if saved is not None:
+                    verify_zip(part_path)
+            except Exception:
+                # a complete but unusable response is not resumed
+                part.close()
+                os.remove(part_path)
+                os.remove(raw_path)
+                raise
+        os.remove(raw_path)
+        if saved is None:
+            os.remove(part_path)
+            result.update({'path': None, 'size': 0, sink.algorithm: None})
+            return result
+        os.rename(part_path, path)
+        result.update({'path': path, 'size': sink.size, sink.algorithm: sink.hexdigest()})
+        return result
+
+    def iter_report_members(self, params):
+        """
+        Download file report and stream every member of its zip file, the zip file
+        is spooled to a temporary file
+        :param dict params: {'taskReferenceId': '5...', 'fileReferenceId': '5...'}
+        :rtype: generator
+        :return: (member name, file-like object over the member), see download.iter_zip_members()
+        """
+        from download import iter_zip_members
+        zip_file = tempfile.TemporaryFile('w+b', -1, '.zip')
+        try:
+            if self.call('downloadFile', 'file', params, sink=zip_file) is None:
+                return
+            zip_file.seek(0)
+            for name, member in iter_zip_members(zip_file):
+                yield name, member
+        finally:
+            zip_file.close()
+
+    def extract_to(self, params, directory, max_workers=None):
+        """
+        Download file report and extract every member of its zip file into directory,
+        several members at once
+        :param dict params: {'taskReferenceId': '5...', 'fileReferenceId': '5...'}
+        :param str directory: target directory, created if needed
+        :param int max_workers: see download.extract_members()
+        :rtype: list
+        :return: [{'name': member name, 'path': extracted file path, 'size': bytes}],
+            empty if the job has no file
+        """
+        from download import extract_members
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        # the zip file is removed once extracted
+        zip_file = tempfile.NamedTemporaryFile(suffix='.zip', dir=directory)
+        try:
+            if self.call('downloadFile', 'file', params, sink=zip_file) is None:
+                return []
+            zip_file.flush()
+            return extract_members(zip_file.name, directory, max_workers)
+        finally:
+            zip_file.close()
+
+    def iter_report_records(self, params, record_tag=None, cast_fields=None, useless_key=None,
+                                                                as_records=False, fields=None):
+        """
+        Download file report and parse it incrementally : records are yielded one by one
+        and freed afterwards, so memory use does not depend on the report size
+        :param dict params: {'taskReferenceId': '5...', 'fileReferenceId': '5...',
+            'jobType': 'SoldReport'}, 'jobType' is only used to guess record_tag
+        :param str record_tag: xml tag of a record, eg 'SKUDetails', see REPORT_RECORD_TAGS
+        :param dict cast_fields: see objectify_to_dict()
+        :param list useless_key: see objectify_to_dict()
+        :param boolean as_records: yield convert.Record instances, read like the dicts
+            but several times smaller, for the records kept in memory
+        :param list fields: fields of the records, taken from the first record when not
+            given. Other fields are kept in a dict by each record
+        :rtype: generator
+        :return: one dict or Record per record, as returned by objectify_to_dict()
+        """
+        record_tag = record_tag or REPORT_RECORD_TAGS.get(params.get('jobType'))
+        if not record_tag:
+            raise Exception("Missing 'record_tag' : give it or a 'jobType' parameter among %s" \
+                                                                    % str(ALLOWABLE_JOB_TYPES))
+        report = self.download(params, stream=True)
+        if report is None:
+            return
+        try:
+            for record in parse_report_records(report, record_tag, cast_fields, useless_key,
+                                                                        as_records, fields):
+                yield record
+        finally:
+            report.close()
+
+    def export_report(self, params, format, output=None, columns=None, record_tag=None,
+                                                                            chunk_size=None):
+        """
+        Download file report and convert its records into typed columns, chunk by chunk,
+        see columnar module
+        :param dict params: {'taskReferenceId': '5...', 'fileReferenceId': '5...',
+            'jobType': 'SoldReport'}, 'jobType' is used to guess record_tag and columns
+        :param str format: 'csv', 'parquet', 'numpy' or 'pandas'
+        :param output: file path for 'csv' and 'parquet', or file object for 'csv'
+        :param columns: {field: type} or [(field, type)], see columnar.REPORT_COLUMNS
+        :param str record_tag: xml tag of a record, see REPORT_RECORD_TAGS
+        :param int chunk_size: records converted at once, see columnar.COLUMNAR_CHUNK_SIZE
+        :rtype: int, dict or pandas.DataFrame
+        :return: see columnar.export_report(), None if the job has no file
+        """
+        from columnar import export_report
+        record_tag, columns = self._report_layout(params, record_tag, columns)
+        report = self.download(params, stream=True)
+        if report is None:
+            return None
+        try:
+            return export_report(report, record_tag, format, output, columns, chunk_size)
+        finally:
+            report.close()
+
+    def export_to(self, params, path, format, columns=None, record_tag=None, chunk_size=None):
+        """
+        Download file report into a zip file, then export it into a file of the same name
+        with the format extension. The export is done by a worker process if the connection
+        has a parse_pool, see parsing module
+        :param dict params: see export_report()
+        :param str path: zip file path, see download_to()
+        :param str format: 'csv' or 'parquet'
+        :rtype: dict
+        :return: download_to() result with 'output': exported file path and 'records':
+            number of records exported, None if the job has no file
+        """
+        from columnar import export_zip
+        if format not in ('csv', 'parquet'):
+            raise Exception("Format '%s' is not a file format : 'csv' or 'parquet'" % format)
+        record_tag, columns = self._report_layout(params, record_tag, columns)
+        result = self.download_to(params, path)
+        result.update({'output': None, 'records': None})
+        if result['path'] is None:
+            return result
+        output = os.path.splitext(path)[0] + '.' + format
+        args = (path, record_tag, format, output, columns, chunk_size)
+        parse_pool = self.connection.parse_pool
+        if parse_pool:
+            records = parse_pool.apply(export_zip, args, size=result['size'])
+        else:
+            records = export_zip(*args)
+        result.update({'output': output, 'records': records})
+        return result
+
+    def _report_layout(self, params, record_tag=None, columns=None):
+        """
+        :rtype: tuple
+        :return: (record_tag, columns), guessed from the 'jobType' param when not given
+        """
+        from columnar import REPORT_COLUMNS
+        record_tag = record_tag or REPORT_RECORD_TAGS.get(params.get('jobType'))
+        columns = columns or REPORT_COLUMNS.get(params.get('jobType'))
+        if not record_tag or not columns:
+            raise Exception("Missing 'record_tag' or 'columns' : give them or a 'jobType' "
+                                        "parameter among %s" % str(ALLOWABLE_JOB_TYPES))
+        return record_tag, columns
 
     def get(self, params=None):
         return super(Job, self).get('getJobs', 'web', 'jobProfile', params)
 
+    def iter_jobs(self, params=None, entries_per_page=None):
+        """
+        Lazy, paginated version of get() : a page of jobs is requested only when the
+        previous one is consumed and each job is converted when it is yielded
+        :param dict params: get() params, eg {'jobType': 'SoldReport', 'jobStatus': 'Completed'},
+            'creationTimeFrom' is a number of days or an UTC datetime
+        :param int entries_per_page: jobs per page, JOBS_PAGE_SIZE by default
+        :rtype: generator
+        :return: one dict per job, as in the list returned by get()
+        """
+        converter = get_converter()
+        page_params = dict(params or {})
+        page_params['entriesPerPage'] = entries_per_page or JOBS_PAGE_SIZE
+        page = 1
+        while True:
+            page_params['pageNumber'] = page
+            tree = self.call('getJobs', 'web', page_params, as_etree=True)
+            namespace = tree_namespace(tree)
+            for element in tree.iterchildren(namespace + 'jobProfile'):
+                yield converter.convert(element)
+            total_pages = tree.findtext('%spaginationOutput/%stotalPages'
+                                                                    % (namespace, namespace))
+            # without pagination output, the whole list was in the response
+            if not total_pages or page >= int(total_pages):
+                return
+            page += 1
+
 
 class Product(EbayObject):
     """
@@ -420,17 +816,15 @@ class Product(EbayObject):
         """ see EbayObject.build_request() docstring """
 
         request = ""
-        self.params = params
 
         if action == 'GetItem':
-            request += self.build_xml_tag('ItemID', True)
-            request += self.build_xml_tag('DetailLevel')
-
-            request += '''
+            request = '''%s%s
     <RequesterCredentials>
         <eBayAuthToken>%s</eBayAuthToken>
     </RequesterCredentials>
-    <WarningLevel>High</WarningLevel>''' % self.connection.auth_token
+    <WarningLevel>High</WarningLevel>''' % (self.build_xml_tag('ItemID', True, params=params),
+                                        self.build_xml_tag('DetailLevel', params=params),
+                                        escape(self.connection.auth_token))
 
         return request
 
@@ -451,7 +845,27 @@ class Communication():
         - decoding web service response
     """
     def __init__(self, developer_key, application_key, certificate_key, auth_token,
-                                                        site_id=None, compatibility=None):
+                                                        site_id=None, compatibility=None,
+                                                        pool_size=None, pool_idle_timeout=None,
+                                                        rate_limits=None, rate_limit_blocking=True,
+                                                        rate_limit_timeout=None, cache=None,
+                                                        retry=None, observers=None,
+                                                        strip_namespaces=True, parse_pool=None):
+        """
+        :param int pool_size: maximum number of idle keep-alive connections kept per api
+        :param int pool_idle_timeout: seconds after which an idle connection is closed
+        :param dict rate_limits: call budget, see ratelimit module, or a shared RateLimiter
+        :param boolean rate_limit_blocking: wait for the budget instead of raising RateLimitError
+        :param float rate_limit_timeout: maximum seconds to wait for the budget
+        :param ResponseCache cache: cache of read-only calls, True for the default settings
+        :param RetryPolicy retry: retry of transient failures, True for the default settings
+        :param list observers: functions called with the timing record of each call
+        :param boolean strip_namespaces: remove the namespace of objectify responses, which
+            costs a copy of the response. Else their elements are in the eBay namespace
+        :param ParsePool parse_pool: worker processes converting the responses of get() calls
+            and the exported reports, or their number, True for one per cpu : those
+            processes are stopped by close()
+        """
         if not site_id:
             site_id = 0
         if not compatibility:
@@ -463,17 +877,78 @@ class Communication():
         self.auth_token = auth_token
         self.site_id = site_id
         self.compatibility = compatibility
+        self.pool = ConnectionPool(dict((api, APIS[api]['host']) for api in APIS),
+                                                size=pool_size, idle_timeout=pool_idle_timeout)
+        self.rate_limiter = rate_limits
+        if isinstance(rate_limits, dict):
+            self.rate_limiter = RateLimiter(rate_limits)
+        self.rate_limit_blocking = rate_limit_blocking
+        self.rate_limit_timeout = rate_limit_timeout
+        self.cache = cache
+        if cache is True:
+            from cache import ResponseCache
+            self.cache = ResponseCache()
+        self.retry = retry
+        if retry is True:
+            self.retry = RetryPolicy()
+        self.observers = list(observers or [])
+        self.strip_namespaces = strip_namespaces
+        self.parse_pool = parse_pool
+        # closed by close(), a ParsePool given by the caller is left to it
+        self._own_parse_pool = False
+        if parse_pool is True or isinstance(parse_pool, int) and parse_pool > 0:
+            from parsing import ParsePool
+            self.parse_pool = ParsePool(parse_pool is not True and parse_pool or None)
+            self._own_parse_pool = True
+        # headers of each (action, api, auth_token), see _generate_headers()
+        self._headers = {}
+
+
+    def then(self, result, func):
+        """
+        Applies func on a web_service_processing() result. Objects use it to post-process
+        responses, so that AsyncCommunication can defer it until the response is there
+        :param result: web_service_processing() result
+        :param function func: function taking result as only argument
+        :return: func(result)
+        """
+        return func(result)
+
+
+    def close(self):
+        """
+        Closes the idle connections and stops the parse_pool processes it created. Its
+        clones share them : close it once they are all done
+        """
+        self.pool.clear()
+        if self._own_parse_pool:
+            self.parse_pool.close()
+            self.parse_pool = None
+            self._own_parse_pool = False
+
+
+    def clone(self):
+        """
+        Gives a Communication with the same credentials and sharing the same connection pool.
+        Calls keep their state in local variables, so a Communication can also be shared
+        :rtype: Communication
+        """
+        return copy.copy(self)
 
 
     def _generate_headers(self, action, service_location, api):
         """
-        Creates headers to each request
+        Creates headers to each request, they are built once per action and api
         :param str action: processing type to execute
         :param str service_location: web service location
         :param str api: api type used by this api call service
         :rtype: dict
-        :return: dictionnay with all the header keys
+        :return: dictionnay with all the header keys, shared by the calls : do not modify it
         """
+        key = (action, api, self.auth_token)
+        headers = self._headers.get(key)
+        if headers is not None:
+            return headers
 
         headers={}
         headers['Content-Type'] = 'text/xml'
@@ -490,6 +965,7 @@ class Communication():
             headers['X-EBAY-SOA-SERVICE-NAME'] = service_location
             headers['X-EBAY-SOA-OPERATION-NAME'] = action
 
+        self._headers[key] = headers
         return headers
 
 
@@ -502,106 +978,475 @@ class Communication():
         :rtype: str
         :return: xml well formed request string
         """
-        # LMS APIS
-        self.xlmns = 'http://www.ebay.com/marketplace/services'
-
-        # Trading APIS case
-        if api == 'api':
-            self.xlmns = 'urn:ebay:apis:eBLBaseComponents'
+        return get_template(action, api).render(core_request)
 
-        prefix  = '<?xml version="1.0" encoding="utf-8"?>\n<%sRequest xmlns="%s">' % (action, self.xlmns)
-        suffix  = '\n</%sRequest>' % action
 
-        return prefix + core_request + suffix
-
-
-    def _parse_download(self):
+    def _strip_namespace(self, response, api, timer):
         """
-        Parses the response string returned by the eBay server and extract xml response the information
-        into two parts: the xml response part and zipfile part
+        Removes the namespace declaration which produces a poor display in the xml tree
+        during subsequent processing
+        :param str response: xml response
+        :param str api: api type used by this api call service
+        :param CallTimer timer: timing record of the call, counts the bytes copied
         :rtype: str
-        :return: xml string
         """
+        stripped = response.replace(' xmlns="'+ NAMESPACES[api] +'"','')
+        if stripped is not response:
+            timer.record['bytes_copied'] += len(stripped)
+        return stripped
 
-        start_xml = self.web_service_response.find( '<?xml')
-        end_xml = self.web_service_response.find( '--MIME', start_xml)
-
-        self.xml_response_download = self.web_service_response[start_xml:end_xml]
-
-        #Find boundary string
-        boundary = self.web_service_response.splitlines()[0]
 
-        #Find the ending boundary index
-        find = self.web_service_response.find( "Content-ID:" )
-
-        find = self.web_service_response.find( '\r\n', find )
+    def _parse_download(self, response, timer):
+        """
+        Parses the response string returned by the eBay server and extract xml response the information
+        into two parts: the xml response part and zipfile part.
+        Only the xml part is copied, the zip part is read where it is
+        :param str response: multipart downloadFile response
+        :param CallTimer timer: timing record of the call
+        :rtype: tuple
+        :return: (xml response string, xml report string)
+        :raise: Exception if the zip file holds several reports
+        """
+        from download import MULTIPLE_REPORTS_ERROR, read_member, split_multipart
+        parts = split_multipart(response)
 
-        #Find start of middle boundary
-        middle_boundary = self.web_service_response.find( boundary, find )
+        headers, start, end = parts[0]
+        xml_response = response[start:end].strip()
+        timer.record['bytes_copied'] += end - start
+        if self.strip_namespaces:
+            xml_response = self._strip_namespace(xml_response, 'file', timer)
 
-        #XML response from downloadFile
-        response = self.web_service_response[find:middle_boundary].strip()
-        #Find next boundary
-        find = self.web_service_response.find( "Content-ID:", middle_boundary )
-        find = self.web_service_response.find( '\r\n', find )
-        find_end = self.web_service_response.find( boundary, find )
+        datas = ''
+        if len(parts) > 1:
+            headers, start, end = parts[1]
+            my_file = zipfile.ZipFile(StringIO(buffer(response, start, end - start)))
+            names = my_file.namelist()
+            if len(names) > 1:
+                raise Exception(MULTIPLE_REPORTS_ERROR % len(names))
+            if names:
+                member = my_file.open(names[0])
+                try:
+                    datas = read_member(member)
+                finally:
+                    member.close()
+
+        return xml_response, datas
+
+
+    def _send_request(self, action, api, request, headers, timer):
+        """
+        POSTs the request on a pooled keep-alive connection.
+        A reused connection may have been closed by the server in the meantime :
+        in this case the request is sent again once on a new connection, unless the
+        server may have received it and the action is not idempotent, see RetryPolicy
+        :param str action: processing type to execute
+        :param str api: api type used by this api call service
+        :param str request: xml well formed request string
+        :param dict headers: request headers
+        :param CallTimer timer: timing record of the call
+        :rtype: tuple
+        :return: (connection, httplib response)
+        """
+        connection, reused = self.pool.acquire(api)
+        sent = False
+        try:
+            if connection.sock is None:
+                connection.connect()
+            timer.lap('connect')
+            connection.request( "POST", '/'+APIS[api]['location'], request, headers )
+            sent = True
+            timer.lap('send')
+            response = connection.getresponse()
+        except (httplib.HTTPException, socket.error):
+            connection.close()
+            # eg createRecurringJob sent twice would create two recurring jobs
+            if not reused or sent and action not in (self.retry and self.retry.actions
+                                                                    or IDEMPOTENT_ACTIONS):
+                raise
+            connection = self.pool.connect(api)
+            connection.connect()
+            timer.lap('connect')
+            connection.request( "POST", '/'+APIS[api]['location'], request, headers )
+            timer.lap('send')
+            response = connection.getresponse()
+        timer.lap('wait')
+        return connection, response
+
+
+    def _release_connection(self, api, connection, response):
+        """
+        Gives back the connection to the pool once its response is fully read
+        :param str api: api type used by this api call service
+        :rtype: None
+        """
+        if response.will_close:
+            connection.close()
+        else:
+            self.pool.release(api, connection)
 
-        #Extract the compressed data
-        binary_datas = self.web_service_response[find:find_end]
 
-        temp=tempfile.TemporaryFile('w+b', -1, '.zip')
-        temp.write(binary_datas)
-        temp.seek(0)
-        my_file = zipfile.ZipFile(temp, 'r')
+    def _parse_download_stream(self, response, timer, sink=None):
+        """
+        Streaming alternative to _parse_download() : the multipart response is read
+        from the socket chunk by chunk and the zip attachment is spooled to disk
+        :param httplib.HTTPResponse response: downloadFile response not read yet
+        :param CallTimer timer: timing record of the call
+        :param file sink: file receiving the zip attachment, see web_service_processing()
+        :rtype: tuple
+        :return: (xml response string, file-like object over the xml report
+            or None if there is no attachment), sink instead of the report if given
+        """
+        from download import ReportFile, spool_download
+        if sink is not None:
+            # forget what a failed attempt wrote
+            sink.seek(0)
+            sink.truncate()
+        xml_response, zip_file = spool_download(response, sink=sink)
+        if self.strip_namespaces:
+            xml_response = self._strip_namespace(xml_response, 'file', timer)
+        if zip_file is None or sink is not None:
+            return xml_response, zip_file
+        try:
+            return xml_response, ReportFile(zip_file)
+        except Exception:
+            zip_file.close()
+            raise
+
+
+    def add_observer(self, observer):
+        """
+        :param function observer: called with the timing record of each call,
+            see metrics module, eg a LatencyAggregator
+        :rtype: None
+        """
+        self.observers.append(observer)
 
-        datas = ''
-        for name in my_file.namelist():
-            datas = my_file.read(name).strip()
 
-        return datas
+    def _notify(self, record):
+        for observer in self.observers:
+            observer(record)
 
 
-    def web_service_processing(self, action, core_request, api):
+    def web_service_processing(self, action, core_request, api, stream=False, as_etree=False,
+                                                                        sink=None, to_dict=None):
         """
         Connects to eBay server, and HTTPS POSTs the request with the given headers
         :param str action: processing type to execute
         :param str core_request: body of the request
+        :param boolean stream: for 'file' api, parse the response while reading it
+            and return a ReportFile instead of a string
+        :param boolean as_etree: return a plain lxml.etree tree instead of an objectify one,
+            faster to build and to convert with objectify_to_dict(). Its elements keep
+            the eBay namespace, so no copy of the response is made before parsing
+        :param file sink: for 'file' api, writable file receiving the zip attachment as it is
+            read (implies stream), it is rewound and truncated before each attempt
+        :param tuple to_dict: (xml_tag, cast_fields, useless_key) : return the dict given by
+            response_to_dict(), computed by the parse_pool if there is one
         :rtype: objectify or xml
-        :return: xml string if 'downloadFile' action or lxml.objectify xml response
+        :return: xml string (or ReportFile) if 'downloadFile' action or lxml.objectify xml response,
+            sink (or None if there is no attachment) when sink is given
         """
+        timer = CallTimer(action, api)
+        stream = stream or sink is not None
+        try:
+            result = self._processing(action, core_request, api, stream, as_etree, timer, sink,
+                                                                                    to_dict)
+        except Exception as error:
+            if self.observers:
+                self._notify(timer.finish(error))
+            raise
+        if self.observers:
+            self._notify(timer.finish())
+        return result
+
+
+    def _processing(self, action, core_request, api, stream, as_etree, timer, sink=None,
+                                                                                to_dict=None):
+        """ see web_service_processing() """
 
         request = self._complete_request(action, core_request, api)
 
         headers = self._generate_headers(action, APIS[api]['location'], api)
 
-        connection = httplib.HTTPSConnection(APIS[api]['host'])
+        timer.record['request_bytes'] = len(request)
+        timer.lap('build')
+
+        cache_key = None
+        if self.cache and not stream:
+            cache_key = self.cache.key(action, api, request, self.auth_token)
+            if cache_key:
+                response = self.cache.get(cache_key, action)
+                timer.lap('cache')
+                if response is not None:
+                    timer.record['cache_hit'] = True
+                    timer.record['response_bytes'] = len(response)
+                    return self._parse_response(api, response, as_etree, timer, to_dict)
+
+        attempt = 1
+        while True:
+            try:
+                result = self._exchange(action, api, request, headers, stream, timer, sink)
+                break
+            except (HttpStatusError, httplib.HTTPException, socket.error) as error:
+                delay = self.retry and self.retry.next_delay(action, error, attempt)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            timer.lap('backoff')
+            attempt += 1
+
+        if stream and api == 'file':
+            xml_response, report = result
+            xml_objectify = objectify.fromstring(xml_response)
+            timer.lap('parse')
+            if response_ack(xml_objectify, api) == "Failure":
+                if report is not None and sink is None:
+                    report.close()
+                raise EbayError(xml_objectify)
+            return report
+
+        response = result
+        result = self._parse_response(api, response, as_etree, timer, to_dict)
+        # only successful responses are cached
+        if cache_key:
+            self.cache.set(cache_key, action, response)
+            timer.lap('cache')
+        return result
 
-        connection.request( "POST", '/'+APIS[api]['location'], request, headers )
-        response = connection.getresponse()
+
+    def _exchange(self, action, api, request, headers, stream, timer, sink=None):
+        """
+        One attempt of sending the request and reading the response
+        :param str action: processing type to execute
+        :param str api: api type used by this api call service
+        :param str request: xml well formed request string
+        :param dict headers: request headers
+        :param boolean stream: see web_service_processing()
+        :param CallTimer timer: timing record of the call
+        :param file sink: see web_service_processing()
+        :rtype: str or tuple
+        :return: raw response or, when streaming, see _parse_download_stream()
+        """
+        timer.record['attempts'] += 1
+        if self.rate_limiter and not self.rate_limiter.acquire(api, action,
+                            blocking=self.rate_limit_blocking, timeout=self.rate_limit_timeout):
+            raise RateLimitError(api, action)
+        timer.lap('throttle')
+
+        connection, response = self._send_request(action, api, request, headers, timer)
 
         if response.status != 200:
-            raise Exception( "Error %s sending request: %s" % (response.status, response.reason ) )
+            connection.close()
+            raise HttpStatusError(response.status, response.reason,
+                                        parse_retry_after(response.getheader('retry-after')))
+
+        try:
+            if stream and api == 'file':
+                reader = CountingReader(response)
+                result = self._parse_download_stream(reader, timer, sink)
+                timer.record['response_bytes'] += reader.bytes_read
+                timer.lap('download')
+            else:
+                result = response.read()
+                timer.record['response_bytes'] += len(result)
+                timer.lap('read')
+        except Exception:
+            connection.close()
+            raise
+        self._release_connection(api, connection, response)
+        return result
 
-        self.web_service_response = response.read()
-        connection.close()
 
-        # remove the chain that produces a poor display in the xml tree during subsequent processing
-        self.web_service_response = self.web_service_response.replace(' xmlns="'+ self.xlmns +'"','')
+    def fetch_resumable(self, action, core_request, api, raw_file):
+        """
+        Writes the raw response body into raw_file as it is received. When the connection
+        drops, the request is sent again with a Range header asking for the missing bytes :
+        a 206 response is appended to raw_file, a 200 one (the server does not support
+        ranges) is written from the start again. Attempts are counted like retries, see
+        RetryPolicy, but an attempt which got further than the previous ones resets the count
+        :param str action: processing type to execute
+        :param str core_request: body of the request
+        :param str api: api type used by this api call service
+        :param file raw_file: file opened in 'a+b' mode, its content is the start
+            of the response body received by a previous call, if any
+        :rtype: dict
+        :return: {'resumed_from': bytes already in raw_file, 'bytes_received': bytes read
+            from the network, 'resumes': resumed attempts, 'restarts': downloads restarted
+            from the start, 'seconds': duration, 'throughput': bytes received per second}
+        """
+        timer = CallTimer(action, api)
+        try:
+            result = self._fetch_resumable(action, core_request, api, raw_file, timer)
+        except Exception as error:
+            if self.observers:
+                self._notify(timer.finish(error))
+            raise
+        if self.observers:
+            self._notify(timer.finish())
+        return result
+
 
-        if api != 'file':
+    def _fetch_resumable(self, action, core_request, api, raw_file, timer):
+        """ see fetch_resumable() """
+        started = time.time()
+        request = self._complete_request(action, core_request, api)
+        headers = self._generate_headers(action, APIS[api]['location'], api)
+        timer.record['request_bytes'] = len(request)
+        timer.lap('build')
+
+        retry = self.retry or RetryPolicy()
+        raw_file.seek(0, os.SEEK_END)
+        stats = {'resumed_from': raw_file.tell(), 'bytes_received': 0, 'resumes': 0,
+                                                                            'restarts': 0}
+        attempt = 1
+        # largest body start received so far
+        reached = stats['resumed_from']
+        while True:
+            try:
+                if self._exchange_range(action, api, request, headers, raw_file, stats, timer):
+                    break
+                # the partial content can not be resumed : restart right away
+                continue
+            except (HttpStatusError, httplib.HTTPException, socket.error) as error:
+                if raw_file.tell() > reached:
+                    reached = raw_file.tell()
+                    attempt = 1
+                delay = retry.next_delay(action, error, attempt)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            timer.lap('backoff')
+            attempt += 1
+
+        stats['seconds'] = time.time() - started
+        stats['throughput'] = stats['bytes_received'] / max(stats['seconds'], 1e-6)
+        return stats
+
+
+    def _exchange_range(self, action, api, request, headers, raw_file, stats, timer):
+        """
+        One attempt of fetch_resumable(), asking for the bytes following the raw_file content
+        :rtype: boolean
+        :return: True once raw_file holds the whole body, False if raw_file was emptied
+            because the server can not send the rest of it
+        :raise: httplib.IncompleteRead if the connection dropped before the end of the body
+        """
+        from download import DOWNLOAD_CHUNK_SIZE, parse_content_range
+        timer.record['attempts'] += 1
+        if self.rate_limiter and not self.rate_limiter.acquire(api, action,
+                            blocking=self.rate_limit_blocking, timeout=self.rate_limit_timeout):
+            raise RateLimitError(api, action)
+        timer.lap('throttle')
+
+        offset = raw_file.tell()
+        if offset:
+            # the shared headers are not modified
+            headers = dict(headers, Range='bytes=%d-' % offset)
+        connection, response = self._send_request(action, api, request, headers, timer)
+
+        content_range = None
+        if response.status == 206:
+            content_range = parse_content_range(response.getheader('content-range'))
+        if offset and (response.status == 416 or response.status == 206 and
+                                    (content_range is None or content_range[0] != offset)):
+            # range not satisfiable or not the one asked for
+            connection.close()
+            raw_file.seek(0)
+            raw_file.truncate()
+            stats['restarts'] += 1
+            return False
+        if response.status not in (200, 206):
+            connection.close()
+            raise HttpStatusError(response.status, response.reason,
+                                        parse_retry_after(response.getheader('retry-after')))
+
+        if response.status == 206:
+            stats['resumes'] += 1
+            expected = content_range[2]
+        else:
+            if offset:
+                raw_file.seek(0)
+                raw_file.truncate()
+                stats['restarts'] += 1
+            # None if the body is chunked
+            expected = response.length
+
+        received = 0
+        try:
+            while True:
+                chunk = response.read(DOWNLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                raw_file.write(chunk)
+                received += len(chunk)
+        except Exception:
+            connection.close()
+            raise
+        finally:
+            # what was received is kept, even on error
+            raw_file.flush()
+            stats['bytes_received'] += received
+            timer.record['response_bytes'] += received
+            timer.lap('download')
+
+        size = raw_file.tell()
+        if expected is not None and size < expected:
+            connection.close()
+            raise httplib.IncompleteRead('', expected - size)
+        self._release_connection(api, connection, response)
+        return True
+
+
+    def _parse_response(self, api, response, as_etree=False, timer=None, to_dict=None):
+        """
+        Decodes the raw response of a successful http call
+        :param str api: api type used by this api call service
+        :param str response: raw response
+        :param boolean as_etree: see web_service_processing(), the etree keeps the namespace
+        :param CallTimer timer: timing record of the call
+        :param tuple to_dict: see web_service_processing()
+        :rtype: objectify or xml
+        :return: see web_service_processing()
+        """
+        timer = timer or CallTimer(None, api)
+
+        if api != 'file' and to_dict is not None:
+            if self.parse_pool:
+                succeeded, result = self.parse_pool.apply(response_to_dict,
+                                        (api, response) + tuple(to_dict), size=len(response))
+            else:
+                succeeded, result = response_to_dict(api, response, *to_dict)
+            timer.lap('parse')
+
+            if not succeeded:
+                raise EbayError(objectify.fromstring(response))
+        elif api != 'file' and as_etree:
+            # the namespace is kept : no copy of the response
+            result = etree.fromstring(response)
+            timer.lap('parse')
+
+            if response_ack(result, api) == "Failure":
+                raise EbayError(objectify.fromstring(response))
+        elif api != 'file':
+            if self.strip_namespaces:
+                response = self._strip_namespace(response, api, timer)
+                timer.lap('namespace')
             #transform xml response in objectify xml object
-            result = objectify.fromstring(self.web_service_response)
+            result = objectify.fromstring(response)
+            timer.lap('parse')
 
             # Reads the response. If call is a failure raise an error
             # If call is a success return lxml objectify tree
-            if (result.__dict__[SUCCESS_TAG[api]] == "Failure"):
+            if response_ack(result, api) == "Failure":
                 raise EbayError(result)
         else:
-            # if self.web_service_response contains download datas file
-            result = self._parse_download()
-            xml_objectify = objectify.fromstring(self.xml_response_download)
+            # if the response contains download datas file
+            xml_response, result = self._parse_download(response, timer)
+            timer.lap('download')
+            xml_objectify = objectify.fromstring(xml_response)
+            timer.lap('parse')
 
-            if xml_objectify.__dict__[SUCCESS_TAG[api]] == "Failure":
+            if response_ack(xml_objectify, api) == "Failure":
                 raise EbayError(xml_objectify)
 
         return result
@@ -610,16 +1455,189 @@ class Communication():
 class EbayWebService():
 
     def __init__(self, developer_key, application_key, certificate_key, auth_token
-                                                                            , site_id=None):
-
+                                                                , site_id=None, **kwargs):
+        """
+        :param dict kwargs: Communication options, eg pool_size, pool_idle_timeout
+        """
         self.connection = Communication(developer_key, application_key, certificate_key,
-                                                        auth_token, site_id)
+                                                        auth_token, site_id, **kwargs)
+
+    def pool_stats(self):
+        """
+        :rtype: dict
+        :return: keep-alive connection pool hit/miss counters
+        """
+        return self.connection.pool.stats()
+
+    def close(self):
+        """ see Communication.close() """
+        self.connection.close()
+
+    def add_observer(self, observer):
+        """ see Communication.add_observer() """
+        self.connection.add_observer(observer)
+
+    def cache_stats(self):
+        """
+        :rtype: dict
+        :return: response cache counters or None if responses are not cached
+        """
+        if self.connection.cache:
+            return self.connection.cache.stats()
+
+    def retry_stats(self):
+        """
+        :rtype: dict
+        :return: retries counters or None if calls are not retried
+        """
+        if self.connection.retry:
+            return self.connection.retry.stats()
+
+    def rate_limit_stats(self):
+        """
+        :rtype: dict
+        :return: rate limiter counters or None if calls are not limited
+        """
+        if self.connection.rate_limiter:
+            return self.connection.rate_limiter.stats()
 
     def get(self, ebay_object_name, params=None):
         return eval(ebay_object_name)(self.connection).get(params)
 
-    def download(self, ebay_object_name, params=None):
-        return eval(ebay_object_name)(self.connection).download(params)
+    def get_many(self, ebay_object_name, params_list, max_workers=None):
+        """
+        Concurrent version of get() : calls are spread on a bounded thread pool,
+        each worker using its own keep-alive connection
+        :param str ebay_object_name: eg 'Product'
+        :param list params_list: list of get() params, eg [{'ItemID': '1...'}, {'ItemID': '2...'}]
+        :param int max_workers: number of concurrent calls, GET_MANY_WORKERS by default
+        :rtype: list
+        :return: get() results in the order of params_list, the exception raised
+            by a call, eg EbayError, takes the place of its result
+        """
+        ebay_object = eval(ebay_object_name)(self.connection)
+
+        def get(params):
+            try:
+                return ebay_object.get(params)
+            except Exception as error:
+                # a failed item must not lose the results of the others
+                return error
+
+        return self._map(get, params_list, max_workers)
+
+    def download_many(self, params_list, directory, max_workers=None, resumable=False):
+        """
+        Concurrent version of Job.download_to() : the zip files are saved in directory
+        while being received, so memory use depends neither on their number nor size
+        :param list params_list: list of {'taskReferenceId': '5...', 'fileReferenceId': '5...'}
+        :param str directory: target directory, created if needed. Files are named
+            <taskReferenceId>_<fileReferenceId>.zip
+        :param int max_workers: number of concurrent downloads, GET_MANY_WORKERS by default
+        :param boolean resumable: see Job.download_to()
+        :rtype: list
+        :return: Job.download_to() results completed with the params, in the order of
+            params_list, the exception raised by a download takes the place of its result
+        """
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        job = Job(self.connection)
+
+        def download(params):
+            path = os.path.join(directory, '%s_%s.zip' % (params['taskReferenceId'],
+                                                                params['fileReferenceId']))
+            try:
+                result = job.download_to(params, path, resumable=resumable)
+            except Exception as error:
+                return error
+            result.update(params)
+            return result
+
+        return self._map(download, params_list, max_workers)
+
+    def export_many(self, params_list, directory, format, columns=None, record_tag=None,
+                                                                            max_workers=None):
+        """
+        Concurrent version of Job.export_to() : threads download the reports while the
+        parse_pool processes, if any, export the ones already downloaded
+        :param list params_list: list of Job.export_report() params
+        :param str directory: target directory, created if needed, see download_many()
+        :param str format: 'csv' or 'parquet'
+        :param int max_workers: number of concurrent downloads, GET_MANY_WORKERS by default
+        :rtype: list
+        :return: Job.export_to() results completed with the params, in the order of
+            params_list, the exception raised by a download takes the place of its result
+        """
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        job = Job(self.connection)
+
+        def export(params):
+            path = os.path.join(directory, '%s_%s.zip' % (params['taskReferenceId'],
+                                                                params['fileReferenceId']))
+            try:
+                result = job.export_to(params, path, format, columns, record_tag)
+            except Exception as error:
+                return error
+            result.update(params)
+            return result
+
+        return self._map(export, params_list, max_workers)
+
+    def parse_stats(self):
+        """
+        :rtype: dict
+        :return: parse pool counters or None if responses are parsed by the calling threads
+        """
+        if self.connection.parse_pool:
+            return self.connection.parse_pool.stats()
+
+    def _map(self, func, items, max_workers=None):
+        """
+        Applies func on items with a bounded thread pool
+        :rtype: list
+        :return: results in the order of items
+        """
+        from multiprocessing.pool import ThreadPool
+        max_workers = max_workers or GET_MANY_WORKERS
+        # keep one idle connection per worker between two calls, while they run
+        pool = self.connection.pool
+        pool.reserve(max_workers)
+        try:
+            workers = ThreadPool(max_workers)
+            try:
+                return workers.map(func, items, chunksize=1)
+            finally:
+                workers.close()
+                workers.join()
+        finally:
+            pool.unreserve(max_workers)
+
+    def download(self, ebay_object_name, params=None, stream=False):
+        return eval(ebay_object_name)(self.connection).download(params, stream=stream)
+
+    def iter_report_records(self, params, record_tag=None, cast_fields=None, useless_key=None,
+                                                                as_records=False, fields=None):
+        return Job(self.connection).iter_report_records(params, record_tag=record_tag,
+                                            cast_fields=cast_fields, useless_key=useless_key,
+                                            as_records=as_records, fields=fields)
+
+    def iter_report_members(self, params):
+        return Job(self.connection).iter_report_members(params)
+
+    def extract_report(self, params, directory, max_workers=None):
+        return Job(self.connection).extract_to(params, directory, max_workers=max_workers)
+
+    def export_report(self, params, format, output=None, columns=None, record_tag=None,
+                                                                            chunk_size=None):
+        return Job(self.connection).export_report(params, format, output, columns=columns,
+                                            record_tag=record_tag, chunk_size=chunk_size)
+
+    def iter_jobs(self, params=None, entries_per_page=None):
+        return Job(self.connection).iter_jobs(params, entries_per_page=entries_per_page)
+
+    def iter_recurring_jobs(self):
+        return RecurringJob(self.connection).iter_recurring_jobs()
 
     def create(self, ebay_object_name, params):
         return eval(ebay_object_name)(self.connection).create(params)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+###############################################################################
+#                                                                             #
+#   ebaypyt                                                                   #
+#                                                                             #
+#   Copyright (C) 2012 Akretion Sébastien BEAU <sebastien.beau@akretion.com>  #
+#                               David BEAL <david.beal@akretion.com>          #
+#                                                                             #
+#   This program is free software: you can redistribute it and/or modify      #
+#   it under the terms of the GNU Affero General Public License as            #
+#   published by the Free Software Foundation, either version 3 of the        #
+#   License, or (at your option) any later version.                           #
+#                                                                             #
+#   This program is distributed in the hope that it will be useful,           #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of            #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the             #
+#   GNU Affero General Public License for more details.                       #
+#                                                                             #
+#   You should have received a copy of the GNU Affero General Public License  #
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+"""
+    Modules and package attributes imported on first use : importing ebaypyt
+    stays cheap for short-lived processes, eg zipfile and tempfile are only
+    loaded by the first download and lxml by the first response.
+"""
+
+import importlib
+import sys
+import types
+
+
+class LazyModule(object):
+    """ Stands for a module, which is imported when one of its attributes is first read """
+
+    def __init__(self, name):
+        """
+        :param str name: absolute module name, eg 'lxml.objectify'
+        """
+        self.__name = name
+
+    def __getattr__(self, attr):
+        value = getattr(importlib.import_module(self.__name), attr)
+        # the next reads do not go through __getattr__
+        setattr(self, attr, value)
+        return value
+
+    def __repr__(self):
+        return "<lazy module '%s'>" % self.__name
+
+
+class LazyPackage(types.ModuleType):
+    """ Package whose attributes listed in _lazy are imported from their module when read """
+
+    def __getattr__(self, attr):
+        module = self._lazy.get(attr)
+        if module is None:
+            raise AttributeError("'module' object has no attribute '%s'" % attr)
+        value = getattr(importlib.import_module(module), attr)
+        setattr(self, attr, value)
+        return value
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(self._lazy))
+
+
+def lazy_package(name, attributes):
+    """
+    Replaces a package, from its __init__, by a LazyPackage
+    :param str name: package name, __name__ of its __init__
+    :param dict attributes: {attribute: absolute name of the module defining it}
+    :rtype: LazyPackage
+    """
+    package = sys.modules[name]
+    lazy = LazyPackage(name, package.__doc__)
+    lazy.__dict__.update(package.__dict__)
+    lazy._lazy = attributes
+    lazy.__all__ = sorted(attributes)
+    # the replaced module must live on : python 2 clears the globals of a freed module
+    lazy._package = package
+    sys.modules[name] = lazy
+    return lazy
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+###############################################################################
+#                                                                             #
+#   ebaypyt                                                                   #
+#                                                                             #
+#   Copyright (C) 2012 Akretion Sébastien BEAU <sebastien.beau@akretion.com>  #
+#                               David BEAL <david.beal@akretion.com>          #
+#                                                                             #
+#   This program is free software: you can redistribute it and/or modify      #
+#   it under the terms of the GNU Affero General Public License as            #
+#   published by the Free Software Foundation, either version 3 of the        #
+#   License, or (at your option) any later version.                           #
+#                                                                             #
+#   This program is distributed in the hope that it will be useful,           #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of            #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the             #
+#   GNU Affero General Public License for more details.                       #
+#                                                                             #
+#   You should have received a copy of the GNU Affero General Public License  #
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+"""
+    Per-call instrumentation : Communication fills a timing record for each
+    web service call and gives it to its observers (any callable).
+
+    A record is a dict :
+        {'action': 'GetItem', 'api': 'api', 'total': 0.31, 'error': None,
+         'phases': {'build': 0.0001, 'connect': 0.05, 'send': 0.0002, 'wait': 0.2, ...},
+         'request_bytes': 412, 'response_bytes': 18250, 'bytes_copied': 0, 'attempts': 1,
+         'cache_hit': False}
+
+    'bytes_copied' counts the bytes of the response copied before parsing,
+    eg to remove its namespace.
+
+    LatencyAggregator is a ready-made observer keeping latency histograms.
+"""
+
+import math
+import threading
+import time
+
+# relative precision of the histogram buckets
+HISTOGRAM_GROWTH = 1.05
+# lowest measured duration, in seconds
+HISTOGRAM_MIN = 1e-6
+
+
+class CallTimer(object):
+    """ Measures the phases of one call, each lap() closes the current phase """
+
+    def __init__(self, action, api):
+        self.record = {
+            'action': action,
+            'api': api,
+            'phases': {},
+            'request_bytes': 0,
+            'response_bytes': 0,
+            'bytes_copied': 0,
+            'attempts': 0,
+            'cache_hit': False,
+            'error': None,
+            }
+        self._start = self._last = time.time()
+
+    def lap(self, phase):
+        """
+        :param str phase: name of the phase ended now, durations of a repeated phase are summed
+        """
+        now = time.time()
+        phases = self.record['phases']
+        phases[phase] = phases.get(phase, 0) + now - self._last
+        self._last = now
+
+    def finish(self, error=None):
+        """
+        :param Exception error: error raised by the call
+        :rtype: dict
+        :return: the timing record
+        """
+        self.record['total'] = time.time() - self._start
+        if error is not None:
+            self.record['error'] = error.__class__.__name__
+        return self.record
+
+
+class CountingReader(object):
+    """ File-like wrapper counting the bytes read """
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.fp.read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+class Histogram(object):
+    """ Log-scale histogram of durations, percentiles are given with HISTOGRAM_GROWTH precision """
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.sum = 0.
+
+    def add(self, value):
+        index = 0
+        if value > HISTOGRAM_MIN:
+            index = int(math.log(value / HISTOGRAM_MIN, HISTOGRAM_GROWTH))
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, percent):
+        """
+        :param float percent: eg 95
+        :rtype: float
+        :return: upper bound of the bucket holding the percentile, None if empty
+        """
+        if not self.count:
+            return None
+        rank = percent / 100. * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                break
+        return HISTOGRAM_MIN * HISTOGRAM_GROWTH ** (index + 1)
+
+
+class LatencyAggregator(object):
+    """ Observer keeping p50/p95/p99 histograms per (api, action) and per phase """
+
+    def __init__(self, percents=(50, 95, 99)):
+        self.percents = percents
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        key = (record['api'], record['action'])
+        with self._lock:
+            calls = self._calls.get(key)
+            if calls is None:
+                calls = self._calls[key] = {'calls': 0, 'errors': 0, 'cache_hits': 0,
+                        'request_bytes': 0, 'response_bytes': 0, 'bytes_copied': 0,
+                        'histograms': {}}
+            calls['calls'] += 1
+            calls['errors'] += record['error'] is not None
+            calls['cache_hits'] += record['cache_hit']
+            calls['request_bytes'] += record['request_bytes']
+            calls['response_bytes'] += record['response_bytes']
+            calls['bytes_copied'] += record['bytes_copied']
+            histograms = calls['histograms']
+            phases = [('total', record['total'])] + record['phases'].items()
+            for phase, duration in phases:
+                if phase not in histograms:
+                    histograms[phase] = Histogram()
+                histograms[phase].add(duration)
+
+    def summary(self):
+        """
+        :rtype: dict
+        :return: {(api, action): {'calls': .., 'errors': .., 'request_bytes': ..,
+            'response_bytes': .., 'bytes_copied': .., 'cache_hits': .., 'phases': {phase: {'count': ..,
+            'mean': .., 'p50': .., 'p95': .., 'p99': ..}}}}, durations in seconds
+        """
+        result = {}
+        with self._lock:
+            for key, calls in self._calls.items():
+                summary = dict((name, value) for name, value in calls.items()
+                                                                if name != 'histograms')
+                summary['phases'] = {}
+                for phase, histogram in calls['histograms'].items():
+                    values = {'count': histogram.count, 'mean': histogram.sum / histogram.count}
+                    for percent in self.percents:
+                        values['p%s' % percent] = histogram.percentile(percent)
+                    summary['phases'][phase] = values
+                result[key] = summary
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._calls = {}
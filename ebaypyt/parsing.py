@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+###############################################################################
+#                                                                             #
+#   ebaypyt                                                                   #
+#                                                                             #
+#   Copyright (C) 2012 Akretion Sébastien BEAU <sebastien.beau@akretion.com>  #
+#                               David BEAL <david.beal@akretion.com>          #
+#                                                                             #
+#   This program is free software: you can redistribute it and/or modify      #
+#   it under the terms of the GNU Affero General Public License as            #
+#   published by the Free Software Foundation, either version 3 of the        #
+#   License, or (at your option) any later version.                           #
+#                                                                             #
+#   This program is distributed in the hope that it will be useful,           #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of            #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the             #
+#   GNU Affero General Public License for more details.                       #
+#                                                                             #
+#   You should have received a copy of the GNU Affero General Public License  #
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+"""
+    Process pool for the CPU heavy conversions. Raw responses are sent to
+    worker processes which give back plain dicts, or convert saved reports
+    into columnar files, so that conversions use several cores while the
+    threads of the concurrent calls keep fetching :
+
+        ews = EbayWebService(..., parse_pool=4)
+        items = ews.get_many('Product', params_list)
+        exports = ews.export_many(params_list, '/tmp/reports', 'parquet')
+
+    The pool forks its processes when created : create it before starting
+    threads.
+"""
+
+import multiprocessing
+import threading
+
+
+class ParsePool(object):
+    """ Pool of worker processes shared by the threads of a Communication, thread-safe """
+
+    def __init__(self, processes=None):
+        """
+        :param int processes: number of worker processes, the number of cpus by default
+        """
+        self.processes = processes or multiprocessing.cpu_count()
+        self.tasks = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._pool = multiprocessing.Pool(self.processes)
+
+    def apply(self, func, args, size=0):
+        """
+        Runs func(*args) in a worker process. Only the calling thread waits for the result
+        :param function func: module level function, its arguments and result are pickled
+        :param tuple args: arguments of func
+        :param int size: bytes of data sent, for stats()
+        :return: func(*args)
+        """
+        with self._lock:
+            self.tasks += 1
+            self.bytes_sent += size
+        return self._pool.apply(func, args)
+
+    def close(self):
+        """ Stops the worker processes once their tasks are done """
+        self._pool.close()
+        self._pool.join()
+
+    def stats(self):
+        """
+        :rtype: dict
+        :return: number of worker processes, tasks run and bytes sent to them
+        """
+        with self._lock:
+            return {'processes': self.processes, 'tasks': self.tasks,
+                    'bytes_sent': self.bytes_sent}
@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+###############################################################################
+#                                                                             #
+#   ebaypyt                                                                   #
+#                                                                             #
+#   Copyright (C) 2012 Akretion Sébastien BEAU <sebastien.beau@akretion.com>  #
+#                               David BEAL <david.beal@akretion.com>          #
+#                                                                             #
+#   This program is free software: you can redistribute it and/or modify      #
+#   it under the terms of the GNU Affero General Public License as            #
+#   published by the Free Software Foundation, either version 3 of the        #
+#   License, or (at your option) any later version.                           #
+#                                                                             #
+#   This program is distributed in the hope that it will be useful,           #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of            #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the             #
+#   GNU Affero General Public License for more details.                       #
+#                                                                             #
+#   You should have received a copy of the GNU Affero General Public License  #
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+"""
+    Bulk Data Exchange pipeline : for one job type, a job is created (or awaited),
+    its status is polled until it is completed, then its report is downloaded and
+    its records are given to a callback as they are parsed.
+
+        pipeline = JobPipeline(ews, 'SoldReport', callback,
+                               create={'time': '02:00:00'})
+        stats = pipeline.run()
+
+    callback(job, record) is called for each record, with the job dict and the
+    record dict. Polls get closer as the job progresses : their interval grows
+    while no job has started, then follows the time left estimated from the
+    percentComplete of the job. run_pipelines() runs the pipelines of several job
+    types at once, each in its own thread.
+"""
+
+import threading
+import time
+from datetime import datetime
+from multiprocessing.pool import ThreadPool
+
+from ebaypyt import ALLOWABLE_JOB_TYPES, Job, RecurringJob
+from sync import PENDING_JOB_STATUS, parse_time
+
+# seconds between two polls : the shortest one and the longest one, reached
+# while the job is waiting to start
+POLL_MIN_INTERVAL = 2
+POLL_MAX_INTERVAL = 60
+# statuses of the jobs which will never complete
+FAILED_JOB_STATUS = ('Aborted', 'Failed')
+
+
+class JobPipeline(object):
+    """ Waits for the next job of one type to complete and streams its records """
+
+    def __init__(self, ews, job_type, callback, create=None, since=None, store=None,
+                    min_interval=None, max_interval=None, record_tag=None, cast_fields=None,
+                    useless_key=None, as_records=False):
+        """
+        :param EbayWebService ews: client
+        :param str job_type: eg 'SoldReport', see ALLOWABLE_JOB_TYPES
+        :param function callback: called with (job dict, record dict) for each record
+        :param dict create: RecurringJob.create() params, without 'jobType' : a recurring
+            job is created when the pipeline runs and deleted once it is done. Without it,
+            the pipeline waits for a job of an existing schedule
+        :param datetime since: UTC creation time from which jobs are waited for,
+            the start of run() by default
+        :param CheckpointStore store: jobs already processed are skipped and the
+            processed ones recorded, see sync module
+        :param float min_interval: seconds, POLL_MIN_INTERVAL by default
+        :param float max_interval: seconds, POLL_MAX_INTERVAL by default
+        :param str record_tag: see Job.iter_report_records()
+        :param dict cast_fields: see Job.iter_report_records()
+        :param list useless_key: see Job.iter_report_records()
+        :param boolean as_records: see Job.iter_report_records()
+        """
+        if job_type not in ALLOWABLE_JOB_TYPES:
+            raise Exception("'%s' is not correct : use one of these values %s"
+                                                    % (job_type, str(ALLOWABLE_JOB_TYPES)))
+        self.ews = ews
+        self.job_type = job_type
+        self.callback = callback
+        self.create = create
+        self.since = since
+        self.store = store
+        self.min_interval = min_interval or POLL_MIN_INTERVAL
+        self.max_interval = max(max_interval or POLL_MAX_INTERVAL, self.min_interval)
+        self.record_tag = record_tag
+        self.cast_fields = cast_fields
+        self.useless_key = useless_key
+        self.as_records = as_records
+        # polls must reach eBay : getJobs responses are not taken from the cache
+        self.connection = ews.connection.clone()
+        self.connection.cache = None
+        self._stop = threading.Event()
+
+    def stop(self):
+        """ Makes run() return after the current poll or report """
+        self._stop.set()
+
+    def next_delay(self, job, progress=None, delay=None):
+        """
+        :param dict job: pending job polled, None if no job was found
+        :param tuple progress: (percentComplete, time) of the previous poll of the job
+        :param float delay: previous delay
+        :rtype: float
+        :return: seconds before the next poll
+        """
+        if job is None or job.get('jobStatus') != 'InProcess':
+            # waiting for the job to start : exponential backoff
+            return min(self.max_interval, delay and delay * 2 or self.min_interval)
+        percent = float(job.get('percentComplete') or 0)
+        if progress and percent > progress[0]:
+            # time left at the pace observed since the previous poll
+            left = (100 - percent) * (time.time() - progress[1]) / (percent - progress[0])
+        else:
+            left = self.max_interval * (100 - percent) / 100
+        # half of it : the polls close in on the completion
+        return min(self.max_interval, max(self.min_interval, left / 2))
+
+    def poll(self, since, skipped, watched=(), created_from=None):
+        """
+        :param datetime since: UTC creation time from which jobs are asked
+        :param set skipped: ids, as str, of the jobs already processed, completed with
+            the ones the store has recorded and the failed jobs skipped
+        :param watched: ids of the pending jobs seen by the previous polls, a set or a dict
+        :param datetime created_from: UTC time the recurring job of the pipeline was
+            created, the jobs of this type created since then are its own
+        :rtype: tuple
+        :return: (oldest completed job not processed or None,
+            most advanced pending job or None, ids of the failed jobs skipped)
+        :raise: Exception if a watched job or one of its own jobs failed
+        """
+        completed, pending, failed = [], None, []
+        params = {'jobType': self.job_type, 'creationTimeFrom': since}
+        for job in Job(self.connection).iter_jobs(params):
+            status = job.get('jobStatus')
+            if str(job['jobId']) in skipped:
+                continue
+            if status in FAILED_JOB_STATUS:
+                if job['jobId'] in watched or created_from and job.get('creationTime') \
+                                and parse_time(job['creationTime']) >= created_from:
+                    raise Exception("Job %s of type %s ended with status %s"
+                                                    % (job['jobId'], self.job_type, status))
+                # an older job, eg of another schedule, does not stop the pipeline
+                skipped.add(str(job['jobId']))
+                failed.append(job['jobId'])
+                continue
+            if status == 'Completed':
+                completed.append(job)
+            elif status in PENDING_JOB_STATUS:
+                if pending is None or float(job.get('percentComplete') or 0) \
+                                            > float(pending.get('percentComplete') or 0):
+                    pending = job
+        if completed and self.store:
+            skipped.update(self.store.processed([job['jobId'] for job in completed]))
+            completed = [job for job in completed if str(job['jobId']) not in skipped]
+        if not completed:
+            return None, pending, failed
+        return min(completed, key=lambda job: job.get('creationTime')), pending, failed
+
+    def iter_records(self, job):
+        """
+        Downloads the report of a completed job and parses it incrementally
+        :param dict job: completed job
+        :rtype: generator
+        :return: one dict or Record per record, see Job.iter_report_records()
+        """
+        if not job.get('fileReferenceId'):
+            return iter(())
+        params = {'taskReferenceId': job['jobId'], 'fileReferenceId': job['fileReferenceId'],
+                                                                'jobType': self.job_type}
+        return Job(self.connection).iter_report_records(params, self.record_tag,
+                                self.cast_fields, self.useless_key, as_records=self.as_records)
+
+    def run(self, jobs=1, timeout=None):
+        """
+        :param int jobs: number of completed jobs to process before returning
+        :param float timeout: maximum seconds to wait for them, forever by default
+        :rtype: dict
+        :return: {'job_type': .., 'jobs': ids of the jobs processed, 'records': ..,
+            'polls': getJobs calls, 'recurring_job_id': id of the created recurring job,
+            'waited': seconds between polls, 'to_data': seconds between the polls seeing
+            the jobs completed and their first record, 'stopped': True if stop() was called,
+            'failed': ids of the failed jobs skipped, see poll()}
+        """
+        started = time.time()
+        since = self.since or datetime.utcnow().replace(microsecond=0)
+        stats = {'job_type': self.job_type, 'jobs': [], 'records': 0, 'polls': 0,
+                 'recurring_job_id': None, 'waited': 0., 'to_data': 0., 'stopped': False,
+                 'failed': []}
+        created_from = None
+        if self.create:
+            params = dict(self.create, jobType=self.job_type)
+            created_from = datetime.utcnow().replace(microsecond=0)
+            stats['recurring_job_id'] = RecurringJob(self.connection).create(params)
+        try:
+            skipped, progress, delay = set(), {}, None
+            while len(stats['jobs']) < jobs:
+                if self._stop.is_set():
+                    stats['stopped'] = True
+                    break
+                completed, pending, failed = self.poll(since, skipped, progress, created_from)
+                stats['polls'] += 1
+                stats['failed'].extend(failed)
+                if completed is not None:
+                    self._process(completed, stats)
+                    skipped.add(str(completed['jobId']))
+                    delay = None
+                    continue
+                delay = self.next_delay(pending, pending and progress.get(pending['jobId']),
+                                                                                    delay)
+                if pending is not None:
+                    progress[pending['jobId']] = (float(pending.get('percentComplete') or 0),
+                                                                                time.time())
+                if timeout is not None and time.time() + delay - started > timeout:
+                    raise Exception("No %s job completed within %s seconds"
+                                                                    % (self.job_type, timeout))
+                stats['waited'] += delay
+                self._stop.wait(delay)
+        finally:
+            if stats['recurring_job_id']:
+                RecurringJob(self.connection).delete(stats['recurring_job_id'])
+        return stats
+
+    def _process(self, job, stats):
+        """ see run() """
+        seen = time.time()
+        first = None
+        for record in self.iter_records(job):
+            if first is None:
+                first = time.time()
+            self.callback(job, record)
+            stats['records'] += 1
+        stats['to_data'] += (first or time.time()) - seen
+        stats['jobs'].append(job['jobId'])
+        if self.store:
+            self.store.mark_processed(job)
+
+
+def run_pipelines(pipelines, jobs=1, timeout=None):
+    """
+    Runs several pipelines at once, each in its own thread : their callbacks are
+    called from these threads
+    :param list pipelines: JobPipeline, eg one per job type
+    :param int jobs: see JobPipeline.run()
+    :param float timeout: see JobPipeline.run()
+    :rtype: list
+    :return: JobPipeline.run() stats in the order of pipelines, the exception raised
+        by a pipeline takes the place of its stats
+    """
+    def run(pipeline):
+        try:
+            return pipeline.run(jobs, timeout)
+        except Exception as error:
+            return error
+
+    workers = ThreadPool(len(pipelines) or 1)
+    try:
+        return workers.map(run, pipelines, chunksize=1)
+    finally:
+        workers.close()
+        workers.join()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+###############################################################################
+#                                                                             #
+#   ebaypyt                                                                   #
+#                                                                             #
+#   Copyright (C) 2012 Akretion Sébastien BEAU <sebastien.beau@akretion.com>  #
+#                               David BEAL <david.beal@akretion.com>          #
+#                                                                             #
+#   This program is free software: you can redistribute it and/or modify      #
+#   it under the terms of the GNU Affero General Public License as            #
+#   published by the Free Software Foundation, either version 3 of the        #
+#   License, or (at your option) any later version.                           #
+#                                                                             #
+#   This program is distributed in the hope that it will be useful,           #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of            #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the             #
+#   GNU Affero General Public License for more details.                       #
+#                                                                             #
+#   You should have received a copy of the GNU Affero General Public License  #
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+"""
+    Keep-alive connection pool used by Communication : each web service call
+    borrows an open connection to the APIS host instead of paying a new
+    TCP and TLS handshake.
+"""
+
+import httplib
+import threading
+import time
+
+POOL_SIZE = 4
+# seconds an idle connection is kept before being considered as stale
+POOL_IDLE_TIMEOUT = 60
+
+
+class ConnectionPool(object):
+    """ Idle keep-alive connections, one stack per APIS entry (api/web/file) """
+
+    def __init__(self, hosts, size=None, idle_timeout=None, connection_class=None):
+        """
+        :param dict hosts: host name for each api key, eg {'api': 'api.ebay.com'}
+        :param int size: maximum number of idle connections kept per api
+        :param int idle_timeout: seconds after which an idle connection is closed
+        :param class connection_class: httplib connection class, HTTPSConnection by default
+        """
+        self.hosts = hosts
+        self.size = size or POOL_SIZE
+        self.idle_timeout = idle_timeout or POOL_IDLE_TIMEOUT
+        self.connection_class = connection_class or httplib.HTTPSConnection
+        self.hits = 0
+        self.misses = 0
+        self._idle = {}
+        # sizes asked by reserve(), the largest one replaces size while they run
+        self._reserved = []
+        self._lock = threading.Lock()
+
+    def connect(self, api):
+        """
+        Opens a new connection to the api host, without looking at idle ones
+        :param str api: api type (key of APIS)
+        :rtype: httplib.HTTPConnection
+        """
+        return self.connection_class(self.hosts[api])
+
+    def acquire(self, api):
+        """
+        Gives an idle connection to the api host or a new one if none is available
+        :param str api: api type (key of APIS)
+        :rtype: tuple
+        :return: (connection, True if the connection was reused)
+        """
+        now = time.time()
+        with self._lock:
+            idle = self._idle.get(api, [])
+            while idle:
+                connection, released_at = idle.pop()
+                if now - released_at <= self.idle_timeout:
+                    self.hits += 1
+                    return connection, True
+                connection.close()
+            self.misses += 1
+        return self.connect(api), False
+
+    def release(self, api, connection):
+        """
+        Gives back a connection whose response has been fully read
+        :param str api: api type (key of APIS)
+        :param httplib.HTTPConnection connection: connection to keep alive
+        :rtype: None
+        """
+        with self._lock:
+            idle = self._idle.setdefault(api, [])
+            if len(idle) < max([self.size] + self._reserved):
+                idle.append((connection, time.time()))
+                return
+        connection.close()
+
+    def reserve(self, size):
+        """
+        Keeps up to size idle connections per api until unreserve(size), eg one per
+        thread of a pool making calls. Concurrent reservations do not add up
+        :param int size: number of idle connections
+        :rtype: None
+        """
+        with self._lock:
+            self._reserved.append(size)
+
+    def unreserve(self, size):
+        """
+        Ends a reserve(size) : the idle connections above the remaining limit are closed
+        :param int size: number of idle connections given to reserve()
+        :rtype: None
+        """
+        closed = []
+        with self._lock:
+            self._reserved.remove(size)
+            limit = max([self.size] + self._reserved)
+            for idle in self._idle.values():
+                # the oldest connections are at the bottom of the stacks
+                closed.extend(idle[:-limit])
+                del idle[:-limit]
+        for connection, released_at in closed:
+            connection.close()
+
+    def clear(self):
+        """ Closes all idle connections """
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection, released_at in connections:
+                connection.close()
+
+    def stats(self):
+        """
+        :rtype: dict
+        :return: pool hit/miss counters and idle connections count per api
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'idle': dict((api, len(idle)) for api, idle in self._idle.items()),
+                }
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+###############################################################################
+#                                                                             #
+#   ebaypyt                                                                   #
+#                                                                             #
+#   Copyright (C) 2012 Akretion Sébastien BEAU <sebastien.beau@akretion.com>  #
+#                               David BEAL <david.beal@akretion.com>          #
+#                                                                             #
+#   This program is free software: you can redistribute it and/or modify      #
+#   it under the terms of the GNU Affero General Public License as            #
+#   published by the Free Software Foundation, either version 3 of the        #
+#   License, or (at your option) any later version.                           #
+#                                                                             #
+#   This program is distributed in the hope that it will be useful,           #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of            #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the             #
+#   GNU Affero General Public License for more details.                       #
+#                                                                             #
+#   You should have received a copy of the GNU Affero General Public License  #
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+"""
+    Client-side call budget : token buckets per api ('api', 'web', 'file') and
+    per (api, call name), shared by all the threads using the same Communication.
+
+        limits = {
+            'api': (5000, 86400),                   # 5000 Trading calls a day
+            ('web', 'getJobs'): (1, 10),            # 1 getJobs call every 10 seconds
+            ('api', 'GetItem'): (10, 1, 20),        # 10 GetItem a second, bursts of 20
+            }
+"""
+
+import threading
+import time
+
+
+class RateLimitError(Exception):
+    """ Raised when a call is refused by the rate limiter """
+    def __init__(self, api, action):
+        self.api = api
+        self.action = action
+
+    def __str__(self):
+        return "Rate limit reached for '%s' call on '%s' api" % (self.action, self.api)
+
+
+class TokenBucket(object):
+    """ Token bucket : 'calls' calls per 'period' seconds, with bursts up to 'burst' calls """
+
+    def __init__(self, calls, period=1, burst=None):
+        """
+        :param int calls: number of calls allowed per period
+        :param float period: period in seconds
+        :param int burst: maximum number of calls made at once, 'calls' by default
+        """
+        self.rate = float(calls) / period
+        self.capacity = float(burst or calls)
+        self.tokens = self.capacity
+        self.updated_at = time.time()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self, now):
+        """
+        :rtype: float
+        :return: seconds to wait before a token is available, 0 if one is available now
+        """
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class RateLimiter(object):
+    """ Thread-safe set of token buckets, see module docstring for the limits format """
+
+    def __init__(self, limits=None):
+        """
+        :param dict limits: {api or (api, action): (calls, period in seconds[, burst])}
+        """
+        self.buckets = {}
+        for key, limit in (limits or {}).items():
+            self.buckets[key] = TokenBucket(*limit)
+        self.accepted = 0
+        self.refused = 0
+        self.waited = 0.
+        self._lock = threading.Lock()
+
+    def acquire(self, api, action, blocking=True, timeout=None):
+        """
+        Takes a token in the api bucket and in the (api, action) bucket
+        :param str api: api type (key of APIS)
+        :param str action: call name, eg 'GetItem'
+        :param boolean blocking: wait until tokens are available
+        :param float timeout: maximum seconds to wait when blocking
+        :rtype: boolean
+        :return: True if the call can be made
+        """
+        buckets = [self.buckets[key] for key in (api, (api, action)) if key in self.buckets]
+        if not buckets:
+            return True
+        deadline = timeout is not None and time.time() + timeout
+        while True:
+            with self._lock:
+                now = time.time()
+                delay = max(bucket.delay(now) for bucket in buckets)
+                if delay <= 0:
+                    for bucket in buckets:
+                        bucket.take()
+                    self.accepted += 1
+                    return True
+                if not blocking or (deadline and now + delay > deadline):
+                    self.refused += 1
+                    return False
+                self.waited += delay
+            time.sleep(delay)
+
+    def delay(self, api, action):
+        """
+        :rtype: float
+        :return: seconds before acquire() would accept this call
+        """
+        buckets = [self.buckets[key] for key in (api, (api, action)) if key in self.buckets]
+        with self._lock:
+            now = time.time()
+            return max([bucket.delay(now) for bucket in buckets] or [0])
+
+    def stats(self):
+        """
+        :rtype: dict
+        :return: accepted/refused calls counters and seconds spent waiting for tokens
+        """
+        with self._lock:
+            return {'accepted': self.accepted, 'refused': self.refused, 'waited': self.waited}
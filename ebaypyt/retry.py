@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+###############################################################################
+#                                                                             #
+#   ebaypyt                                                                   #
+#                                                                             #
+#   Copyright (C) 2012 Akretion Sébastien BEAU <sebastien.beau@akretion.com>  #
+#                               David BEAL <david.beal@akretion.com>          #
+#                                                                             #
+#   This program is free software: you can redistribute it and/or modify      #
+#   it under the terms of the GNU Affero General Public License as            #
+#   published by the Free Software Foundation, either version 3 of the        #
+#   License, or (at your option) any later version.                           #
+#                                                                             #
+#   This program is distributed in the hope that it will be useful,           #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of            #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the             #
+#   GNU Affero General Public License for more details.                       #
+#                                                                             #
+#   You should have received a copy of the GNU Affero General Public License  #
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+"""
+    Retry policy for transient failures : 5xx http status, connection resets,
+    timeouts. Only idempotent actions are retried, with an exponential backoff
+    and jitter, or after the delay given by the server Retry-After header.
+"""
+
+import httplib
+import random
+import socket
+import threading
+import time
+
+IDEMPOTENT_ACTIONS = ('GetItem', 'getJobs', 'getRecurringJobs', 'downloadFile')
+RETRY_STATUS = (429, 500, 502, 503, 504)
+RETRY_MAX_ATTEMPTS = 4
+# seconds before the first retry, doubled at each attempt
+RETRY_BACKOFF = 0.5
+RETRY_MAX_BACKOFF = 30
+
+
+class HttpStatusError(Exception):
+    """ Raised when the server does not answer with a 200 http status """
+    def __init__(self, status, reason, retry_after=None):
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def __str__(self):
+        return "Error %s sending request: %s" % (self.status, self.reason)
+
+
+def parse_retry_after(value, now=None):
+    """
+    :param str value: Retry-After header, a number of seconds or an http date
+    :rtype: float
+    :return: seconds to wait or None if value is not valid
+    """
+    if not value:
+        return None
+    # only read on failed calls
+    from email.utils import mktime_tz, parsedate_tz
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    date = parsedate_tz(value)
+    if date is None:
+        return None
+    return max(0., mktime_tz(date) - (now or time.time()))
+
+
+class RetryPolicy(object):
+    """ Decides if and when a failed call is sent again, counts the retries """
+
+    def __init__(self, max_attempts=None, backoff=None, max_backoff=None, jitter=True,
+                                                            actions=None, statuses=None):
+        """
+        :param int max_attempts: maximum number of attempts for a call, first one included
+        :param float backoff: seconds before the first retry, doubled for each next one
+        :param float max_backoff: maximum seconds between two attempts, the call fails
+                                  when the server asks to wait longer with Retry-After
+        :param boolean jitter: wait a random time between 0 and the backoff
+        :param list actions: retried actions, IDEMPOTENT_ACTIONS by default
+        :param list statuses: retried http status, RETRY_STATUS by default
+        """
+        self.max_attempts = max_attempts or RETRY_MAX_ATTEMPTS
+        self.backoff = backoff or RETRY_BACKOFF
+        self.max_backoff = max_backoff or RETRY_MAX_BACKOFF
+        self.jitter = jitter
+        self.actions = actions or IDEMPOTENT_ACTIONS
+        self.statuses = statuses or RETRY_STATUS
+        self.retries = {}
+        self.gave_up = 0
+        self._lock = threading.Lock()
+
+    def is_transient(self, error):
+        """
+        :param Exception error: error raised by a call
+        :rtype: boolean
+        """
+        if isinstance(error, HttpStatusError):
+            return error.status in self.statuses
+        return isinstance(error, (httplib.HTTPException, socket.error))
+
+    def next_delay(self, action, error, attempt):
+        """
+        :param str action: call name
+        :param Exception error: error raised by the attempt
+        :param int attempt: number of the failed attempt, starting at 1
+        :rtype: float
+        :return: seconds to wait before the next attempt or None if the call must fail
+        """
+        if action not in self.actions or not self.is_transient(error):
+            return None
+        retry_after = getattr(error, 'retry_after', None)
+        # sending it sooner than asked would only be refused again
+        if attempt >= self.max_attempts or retry_after is not None \
+                                                    and retry_after > self.max_backoff:
+            with self._lock:
+                self.gave_up += 1
+            return None
+        with self._lock:
+            self.retries[action] = self.retries.get(action, 0) + 1
+        if retry_after is not None:
+            return retry_after
+        delay = min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    def stats(self):
+        """
+        :rtype: dict
+        :return: number of retries per action and of calls failed after the last attempt
+        """
+        with self._lock:
+            return {'retries': dict(self.retries), 'gave_up': self.gave_up}
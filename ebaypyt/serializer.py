@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+###############################################################################
+#                                                                             #
+#   ebaypyt                                                                   #
+#                                                                             #
+#   Copyright (C) 2012 Akretion Sébastien BEAU <sebastien.beau@akretion.com>  #
+#                               David BEAL <david.beal@akretion.com>          #
+#                                                                             #
+#   This program is free software: you can redistribute it and/or modify      #
+#   it under the terms of the GNU Affero General Public License as            #
+#   published by the Free Software Foundation, either version 3 of the        #
+#   License, or (at your option) any later version.                           #
+#                                                                             #
+#   This program is distributed in the hope that it will be useful,           #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of            #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the             #
+#   GNU Affero General Public License for more details.                       #
+#                                                                             #
+#   You should have received a copy of the GNU Affero General Public License  #
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+"""
+    Request serialization : the envelope of each (action, api) request is built
+    once and reused, parameter values are xml escaped.
+
+        template = get_template('GetItem', 'api')
+        request = template.render([xml_tag('ItemID', '260874940015')])
+"""
+
+TRADING_NAMESPACE = 'urn:ebay:apis:eBLBaseComponents'
+SERVICES_NAMESPACE = 'http://www.ebay.com/marketplace/services'
+# namespace of the requests and responses of each api
+NAMESPACES = {'api': TRADING_NAMESPACE, 'web': SERVICES_NAMESPACE, 'file': SERVICES_NAMESPACE}
+
+_TAGS = {}
+_TEMPLATES = {}
+
+
+def escape(value):
+    """
+    :param value: str, unicode or any value formatted with str()
+    :rtype: str
+    :return: utf-8 encoded value, escaped for an xml text node
+    """
+    if value.__class__ is not str:
+        if isinstance(value, unicode):
+            value = value.encode('utf-8')
+        elif not isinstance(value, str):
+            value = str(value)
+    if '&' in value or '<' in value or '>' in value:
+        value = value.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    return value
+
+
+def xml_tag(tag, value):
+    """
+    :param str tag: xml tag
+    :param value: tag value, escaped
+    :rtype: str
+    :return: '\\n\\t<tag>value</tag>'
+    """
+    pieces = _TAGS.get(tag)
+    if pieces is None:
+        pieces = _TAGS[tag] = ('\n\t<%s>' % tag, '</%s>' % tag)
+    if value.__class__ is not str or '&' in value or '<' in value or '>' in value:
+        value = escape(value)
+    return pieces[0] + value + pieces[1]
+
+
+class RequestTemplate(object):
+    """ Envelope of the requests of one action """
+
+    def __init__(self, action, api):
+        """
+        :param str action: eg 'GetItem'
+        :param str api: api type used by this api call service
+        """
+        self.namespace = NAMESPACES[api]
+        self.prefix = '<?xml version="1.0" encoding="utf-8"?>\n<%sRequest xmlns="%s">' \
+                                                                    % (action, self.namespace)
+        self.suffix = '\n</%sRequest>' % action
+
+    def render(self, body):
+        """
+        :param body: str or list of str, body of the request
+        :rtype: str
+        :return: xml well formed request string
+        """
+        if isinstance(body, list):
+            return ''.join([self.prefix] + body + [self.suffix])
+        return self.prefix + body + self.suffix
+
+
+def get_template(action, api):
+    """
+    :rtype: RequestTemplate
+    :return: the template of this action, built on first use
+    """
+    key = (action, api)
+    template = _TEMPLATES.get(key)
+    if template is None:
+        template = _TEMPLATES[key] = RequestTemplate(action, api)
+    return template
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+###############################################################################
+#                                                                             #
+#   ebaypyt                                                                   #
+#                                                                             #
+#   Copyright (C) 2012 Akretion Sébastien BEAU <sebastien.beau@akretion.com>  #
+#                               David BEAL <david.beal@akretion.com>          #
+#                                                                             #
+#   This program is free software: you can redistribute it and/or modify      #
+#   it under the terms of the GNU Affero General Public License as            #
+#   published by the Free Software Foundation, either version 3 of the        #
+#   License, or (at your option) any later version.                           #
+#                                                                             #
+#   This program is distributed in the hope that it will be useful,           #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of            #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the             #
+#   GNU Affero General Public License for more details.                       #
+#                                                                             #
+#   You should have received a copy of the GNU Affero General Public License  #
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+"""
+    Incremental synchronisation of completed jobs. A checkpoint store keeps the
+    jobs already processed and, per job type, the creation time from which the
+    jobs have to be asked again (the watermark) : a run only asks for the recent
+    jobs and only downloads the reports not processed yet.
+
+        store = CheckpointStore('/var/lib/myapp/ebay_jobs.sqlite')
+        stats = JobSync(ews, store, 'SoldReport').run(handler)
+
+    handler(job, report) is called for each new report, with the job dict and
+    a file-like object over the xml report (None if the job has no file).
+"""
+
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from ebaypyt import HISTORIC_DAYS_MAX, ZULU_DATETIME_FORMAT
+
+# statuses of the jobs which may still complete
+PENDING_JOB_STATUS = ('Created', 'InProcess', 'Scheduled')
+
+
+class CheckpointStore(object):
+    """ SQLite store of the processed jobs and of the watermark of each job type """
+
+    def __init__(self, path):
+        """
+        :param str path: database file, created if needed. ':memory:' gives a store
+            lasting as long as this object
+        """
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            with self._db:
+                self._db.execute('CREATE TABLE IF NOT EXISTS processed_job ('
+                                 'job_id TEXT PRIMARY KEY, job_type TEXT, '
+                                 'file_reference_id TEXT, creation_time TEXT, '
+                                 'processed_at TEXT)')
+                self._db.execute('CREATE TABLE IF NOT EXISTS watermark ('
+                                 'job_type TEXT PRIMARY KEY, creation_time TEXT)')
+
+    def processed(self, job_ids):
+        """
+        :param list job_ids: job ids
+        :rtype: set
+        :return: the ids, as str, of the jobs already processed among job_ids
+        """
+        job_ids = [str(job_id) for job_id in job_ids]
+        found = set()
+        with self._lock:
+            # stay below the sqlite limit of 999 parameters per query
+            for start in range(0, len(job_ids), 500):
+                chunk = job_ids[start:start + 500]
+                rows = self._db.execute('SELECT job_id FROM processed_job WHERE job_id IN (%s)'
+                                        % ','.join('?' * len(chunk)), chunk)
+                found.update(row[0] for row in rows)
+        return found
+
+    def mark_processed(self, job):
+        """
+        :param dict job: job as returned by Job.get()
+        :rtype: None
+        """
+        with self._lock:
+            with self._db:
+                self._db.execute('INSERT OR REPLACE INTO processed_job VALUES (?, ?, ?, ?, ?)',
+                                 (str(job['jobId']), job.get('jobType'),
+                                  str(job.get('fileReferenceId', '')), job.get('creationTime'),
+                                  datetime.utcnow().strftime(ZULU_DATETIME_FORMAT)))
+
+    def watermark(self, job_type):
+        """
+        :param str job_type: eg 'SoldReport'
+        :rtype: str
+        :return: creation time from which jobs have to be asked, None before the first run
+        """
+        with self._lock:
+            row = self._db.execute('SELECT creation_time FROM watermark WHERE job_type = ?',
+                                   (job_type,)).fetchone()
+        return row and row[0]
+
+    def set_watermark(self, job_type, creation_time):
+        """
+        :param str job_type: eg 'SoldReport'
+        :param str creation_time: eBay time, eg '2012-07-20T10:00:00.000Z'
+        :rtype: None
+        """
+        with self._lock:
+            with self._db:
+                self._db.execute('INSERT OR REPLACE INTO watermark VALUES (?, ?)',
+                                 (job_type, creation_time))
+
+    def prune(self, before):
+        """
+        Forgets the jobs created before a time : eBay does not return them anymore
+        :param str before: eBay time
+        :rtype: int
+        :return: number of jobs forgotten
+        """
+        with self._lock:
+            with self._db:
+                return self._db.execute('DELETE FROM processed_job WHERE creation_time < ?',
+                                        (before,)).rowcount
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def parse_time(value):
+    """
+    :param str value: eBay time, eg '2012-07-20T10:00:00.000Z'
+    :rtype: datetime
+    """
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+class JobSync(object):
+    """ Downloads the reports of the completed jobs of one type not processed yet """
+
+    def __init__(self, ews, store, job_type):
+        """
+        :param EbayWebService ews: client
+        :param CheckpointStore store: processed jobs and watermarks
+        :param str job_type: eg 'SoldReport'
+        """
+        self.ews = ews
+        self.store = store
+        self.job_type = job_type
+
+    def _creation_time_from(self):
+        """
+        :rtype: datetime or int
+        :return: getJobs 'creationTimeFrom' param : the watermark or, on the first
+            run, the whole history kept by eBay
+        """
+        oldest = datetime.utcnow() - timedelta(days=HISTORIC_DAYS_MAX)
+        watermark = self.store.watermark(self.job_type)
+        if not watermark or parse_time(watermark) < oldest:
+            return HISTORIC_DAYS_MAX
+        return parse_time(watermark)
+
+    def new_jobs(self):
+        """
+        :rtype: tuple
+        :return: (completed jobs not processed yet, oldest first,
+            creation time of the oldest pending job or None,
+            creation time of the newest job seen or None)
+        """
+        completed, pending_from, latest = [], None, None
+        params = {'jobType': self.job_type, 'creationTimeFrom': self._creation_time_from()}
+        for job in self.ews.iter_jobs(params):
+            created = job.get('creationTime')
+            if created and (latest is None or created > latest):
+                latest = created
+            status = job.get('jobStatus')
+            if status in PENDING_JOB_STATUS:
+                if created and (pending_from is None or created < pending_from):
+                    pending_from = created
+            elif status == 'Completed':
+                completed.append(job)
+        processed = self.store.processed([job['jobId'] for job in completed])
+        new = [job for job in completed if str(job['jobId']) not in processed]
+        new.sort(key=lambda job: job.get('creationTime'))
+        return new, pending_from, latest
+
+    def run(self, handler):
+        """
+        :param function handler: called with (job dict, report file-like object or None)
+            for each new completed job. A job is recorded as processed once its handler
+            returns : if it raises, the job is downloaded again by the next run
+        :rtype: dict
+        :return: {'downloaded': .., 'pending': creation time of the oldest pending job,
+            'watermark': ..}
+        """
+        new, pending_from, latest = self.new_jobs()
+        stats = {'downloaded': 0, 'pending': pending_from, 'watermark': None}
+        for job in new:
+            try:
+                report = None
+                if job.get('fileReferenceId'):
+                    report = self.ews.download('Job', {'taskReferenceId': job['jobId'],
+                                        'fileReferenceId': job['fileReferenceId']}, stream=True)
+                try:
+                    handler(job, report)
+                finally:
+                    if report is not None:
+                        report.close()
+            except Exception:
+                # the next run starts again from this job
+                restart = [time for time in (pending_from, job.get('creationTime')) if time]
+                if restart:
+                    self.store.set_watermark(self.job_type, min(restart))
+                raise
+            self.store.mark_processed(job)
+            stats['downloaded'] += 1
+
+        # a pending job may complete later : ask again from its creation time
+        watermark = pending_from or latest or self.store.watermark(self.job_type)
+        if watermark:
+            self.store.set_watermark(self.job_type, watermark)
+            stats['watermark'] = watermark
+        self.store.prune((datetime.utcnow() - timedelta(days=HISTORIC_DAYS_MAX + 1))
+                                                            .strftime(ZULU_DATETIME_FORMAT))
+        return stats
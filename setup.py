@@ -19,6 +19,12 @@ setup(
 
     # Package dependencies.
     install_requires = ['uuid', 'lxml'],
+    # columnar export of the reports, see ebaypyt/columnar.py
+    extras_require = {
+        'numpy': ['numpy'],
+        'pandas': ['numpy', 'pandas'],
+        'parquet': ['numpy', 'pyarrow'],
+    },
 
     # Metadata for PyPI.
     author = 'David Beal, Sebastien Beau',
@@ -26,6 +32,10 @@ setup(
     license = 'GNU AGPL-3',
     url = 'https://github.com/Akretion/ebaypyt.git',
     packages=['ebaypyt'],
+    # command-line tool, see ebaypyt/cli.py
+    entry_points = {
+        'console_scripts': ['ebaypyt = ebaypyt.cli:main'],
+    },
     keywords = 'ebay api client',
     description = 'A library to access Ebay Web Service from Python.',
     long_description = read('README.md'),
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    ResponseCache directory pruning
+
+        python -m unittest discover tests
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ebaypyt.cache import ResponseCache
+
+RESPONSE = '<GetItemResponse>%s</GetItemResponse>' % ('x' * 1000)
+
+
+class CacheDirectoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def age(self, key, seconds):
+        path = os.path.join(self.directory, key)
+        mtime = os.path.getmtime(path) - seconds
+        os.utime(path, (mtime, mtime))
+
+    def test_stale_file_deleted_on_read(self):
+        ResponseCache(directory=self.directory).set('a' * 40, 'GetItem', RESPONSE)
+        self.age('a' * 40, 61)
+        cache = ResponseCache(directory=self.directory)
+        self.assertEqual(cache.get('a' * 40, 'GetItem'), None)
+        self.assertEqual(os.listdir(self.directory), [])
+        stats = cache.stats()
+        self.assertEqual((stats['misses'], stats['disk_hits'], stats['disk_entries']), (1, 0, 0))
+
+    def test_disk_hit(self):
+        ResponseCache(directory=self.directory).set('a' * 40, 'GetItem', RESPONSE)
+        cache = ResponseCache(directory=self.directory)
+        self.assertEqual(cache.get('a' * 40, 'GetItem'), RESPONSE)
+        self.assertEqual(cache.get('a' * 40, 'GetItem'), RESPONSE)
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['disk_hits'], stats['disk_entries']), (2, 1, 1))
+
+    def test_prune(self):
+        cache = ResponseCache(directory=self.directory, max_disk_bytes=len(RESPONSE) * 3)
+        for key in 'abcde':
+            cache.set(key * 40, 'GetItem', RESPONSE)
+        # stale for every action
+        self.age('a' * 40, 3600)
+        for index, key in enumerate('bcde'):
+            self.age(key * 40, 10 - index)
+        self.assertEqual(cache.prune(), 2)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['c' * 40, 'd' * 40, 'e' * 40])
+        stats = cache.stats()
+        self.assertEqual((stats['disk_entries'], stats['disk_bytes'], stats['pruned']),
+                                                                (3, len(RESPONSE) * 3, 2))
+
+    def test_prune_on_write(self):
+        cache = ResponseCache(directory=self.directory, max_disk_bytes=len(RESPONSE))
+        cache.set('a' * 40, 'GetItem', RESPONSE)
+        self.age('a' * 40, 1)
+        # the first write of a process prunes the directory
+        ResponseCache(directory=self.directory, max_disk_bytes=len(RESPONSE)).set(
+                                                                'b' * 40, 'GetItem', RESPONSE)
+        self.assertEqual(os.listdir(self.directory), ['b' * 40])
+
+
+if __name__ == '__main__':
+    unittest.main()
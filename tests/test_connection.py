@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    Keep-alive connections closed by the server while they were idle
+
+        python -m unittest discover tests
+"""
+
+import httplib
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from fake_server import FakeEbayServer
+
+
+class CountingServer(FakeEbayServer):
+
+    def __init__(self, **kwargs):
+        FakeEbayServer.__init__(self, **kwargs)
+        self.calls = []
+
+    def response(self, action, request=''):
+        self.calls.append(action)
+        return FakeEbayServer.response(self, action, request)
+
+
+class StaleConnection(object):
+    """ The request is sent, the server had closed the connection before answering """
+    sock = True
+
+    def request(self, method, url, body, headers):
+        pass
+
+    def getresponse(self):
+        raise httplib.BadStatusLine('')
+
+    def close(self):
+        pass
+
+
+class StaleConnectionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = CountingServer().start()
+        self.ews = self.server.client()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_idempotent_sent_again(self):
+        self.ews.connection.pool.release('web', StaleConnection())
+        self.assertTrue(self.ews.get('RecurringJob'))
+        self.assertEqual(self.server.calls, ['getRecurringJobs'])
+
+    def test_create_not_sent_again(self):
+        # the server may have created the recurring job before closing the connection
+        self.ews.connection.pool.release('web', StaleConnection())
+        self.assertRaises(httplib.BadStatusLine, self.ews.create, 'RecurringJob',
+                                    {'jobType': 'ActiveInventoryReport', 'time': '02:00:00'})
+        self.assertEqual(self.server.calls, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
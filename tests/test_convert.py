@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    DictConverter gives the same dicts as the objectify based conversion it replaced
+
+        python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from lxml import etree
+from lxml import objectify
+
+from fake_server import get_item_response, get_jobs_response, get_recurring_jobs_response, \
+                                                                                report
+from ebaypyt.convert import DictConverter, pyval
+
+TYPED_VALUES = '''<GetItemResponse xmlns="urn:ebay:apis:eBLBaseComponents"
+        xmlns:py="http://codespeak.net/lxml/objectify/pytype"
+        xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
+        xmlns:xsd="http://www.w3.org/2001/XMLSchema">
+    <Ack>Success</Ack>
+    <Item>
+        <ItemID py:pytype="str">260874940015</ItemID>
+        <SKU xsi:type="xsd:string">0042</SKU>
+        <Quantity xsi:type="xsd:int"> 12 </Quantity>
+        <Price py:pytype="float">19</Price>
+        <Weight xsi:type="double">1e3</Weight>
+        <Private xsi:type="xsd:boolean">1</Private>
+        <Unknown py:pytype="unknown">7</Unknown>
+        <Large>99999999999999999999</Large>
+        <Negative>-12</Negative>
+        <Float>19.90</Float>
+        <Exponent>1E-3</Exponent>
+        <Infinite>inf</Infinite>
+        <Flag>false</Flag>
+        <Text>true story</Text>
+        <Empty/>
+        <EmptyString py:pytype="str"/>
+        <Nil xsi:nil="true"/>
+        <NilText xsi:nil="true">12</NilText>
+        <NoneType py:pytype="NoneType"/>
+        <Tree py:pytype="TREE"/>
+        <Blank>   </Blank>
+        <Price currencyID="EUR">12.50</Price>
+        <Title>Caf\xc3\xa9 &amp; co</Title>
+    </Item>
+</GetItemResponse>'''
+
+
+def reference_to_dict(xml_objectify, cast_fields=None, useless_key=None):
+    """ objectify_to_dict() before DictConverter, walking objectify elements """
+    result = {}
+    if not cast_fields: cast_fields = {}
+
+    for key in xml_objectify.__dict__.keys():
+
+        if cast_fields.get(key) == list:
+            result[key] = []
+            for element in xml_objectify.__dict__[key]:
+                result[key].append(reference_to_dict(element, cast_fields=cast_fields, useless_key=useless_key))
+        elif hasattr(xml_objectify.__dict__[key], 'pyval'):
+            if cast_fields.get(key):
+                if cast_fields[key] == str :
+                    result[key] = cast_fields.get(key)(xml_objectify.__dict__[key].text)
+                else:
+                    result[key] = cast_fields.get(key)(xml_objectify.__dict__[key].pyval)
+            else:
+                result[key] = xml_objectify.__dict__[key].pyval
+        else:
+            result[key] = reference_to_dict(xml_objectify.__dict__[key], cast_fields=cast_fields, useless_key=useless_key)
+        if useless_key and len(result) == 1 and result.keys()[0] in useless_key:
+            return result[result.keys()[0]]
+    return result
+
+
+class DictConverterTest(unittest.TestCase):
+
+    def check(self, response, cast_fields=None, useless_key=None):
+        expected = reference_to_dict(objectify.fromstring(response), cast_fields, useless_key)
+        converter = DictConverter(cast_fields, useless_key)
+        result = converter.convert(etree.fromstring(response))
+        self.assertEqual(result, expected)
+        # same python types, eg 1 and 1.0 or True are equal
+        self.assertEqual(types(result), types(expected))
+        # objectify elements are accepted too
+        self.assertEqual(converter.convert(objectify.fromstring(response)), expected)
+
+    def test_get_item(self):
+        self.check(get_item_response(10))
+        self.check(get_item_response(10), {'Item': list, 'NameValueList': list}, ['Item'])
+        self.check(get_item_response(3), {'ItemID': str, 'Quantity': float, 'SKU': str})
+
+    def test_jobs(self):
+        self.check(get_jobs_response(10), {'jobProfile': list})
+        self.check(get_recurring_jobs_response(10), {'recurringJobDetail': list})
+
+    def test_report(self):
+        self.check(report(100), {'SKUDetails': list})
+
+    def test_typed_values(self):
+        self.check(TYPED_VALUES)
+        self.check(TYPED_VALUES, {'Price': list, 'Quantity': str, 'Large': float})
+
+    def test_annotated_responses(self):
+        # the responses as dumped by objectify.annotate() and xsiannotate()
+        for response in (get_item_response(5), TYPED_VALUES):
+            for annotate in (objectify.annotate, objectify.xsiannotate):
+                tree = objectify.fromstring(response)
+                annotate(tree)
+                self.check(etree.tostring(tree))
+
+    def test_pyval(self):
+        tree = objectify.fromstring(TYPED_VALUES)
+        for element in tree.Item.iterchildren():
+            if hasattr(element, 'pyval'):
+                self.assertEqual(pyval(element), element.pyval)
+
+
+def types(value):
+    if isinstance(value, dict):
+        return dict((key, types(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return [types(item) for item in value]
+    return type(value)
+
+
+if __name__ == '__main__':
+    unittest.main()
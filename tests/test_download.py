@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    Streamed downloadFile calls against the fake server, the connection dropping
+    in the middle of the body
+
+        python -m unittest discover tests
+"""
+
+import httplib
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import zipfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from fake_server import FakeEbayServer
+from ebaypyt.retry import RetryPolicy
+
+DOWNLOAD_PARAMS = {'taskReferenceId': '5000000000', 'fileReferenceId': '6000000000'}
+REPORT_RECORDS = 200
+
+
+class FlakyServer(FakeEbayServer):
+    """ Cuts the first downloadFile bodies only """
+
+    def __init__(self, drops, **kwargs):
+        self.drops = drops
+        FakeEbayServer.__init__(self, report_records=REPORT_RECORDS, **kwargs)
+
+    def _get_drop_after(self):
+        if self.drops:
+            self.drops -= 1
+            return self._drop_after
+
+    def _set_drop_after(self, drop_after):
+        self._drop_after = drop_after
+
+    drop_after = property(_get_drop_after, _set_drop_after)
+
+
+class DroppedDownloadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.server = None
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        if self.server:
+            self.server.stop()
+
+    def client(self, drops, retry=None):
+        self.server = FlakyServer(drops, drop_after=2000).start()
+        return self.server.client(retry=retry)
+
+    def test_truncated_stream(self):
+        ews = self.client(drops=1)
+        self.assertRaises(httplib.IncompleteRead, ews.download, 'Job', DOWNLOAD_PARAMS,
+                                                                            stream=True)
+
+    def test_stream_retried(self):
+        ews = self.client(drops=2, retry=RetryPolicy(backoff=0.01))
+        report = ews.download('Job', DOWNLOAD_PARAMS, stream=True)
+        try:
+            self.assertEqual(report.read().count('<SKUDetails>'), REPORT_RECORDS)
+        finally:
+            report.close()
+        self.assertEqual(ews.retry_stats()['retries'], {'downloadFile': 2})
+
+    def test_download_to_retried(self):
+        ews = self.client(drops=1, retry=RetryPolicy(backoff=0.01))
+        result = ews.download_many([DOWNLOAD_PARAMS], self.directory)[0]
+        path = result['path']
+        self.assertEqual(os.path.getsize(path), result['size'])
+        archive = zipfile.ZipFile(path)
+        self.assertEqual(archive.testzip(), None)
+        archive.close()
+
+
+class EmptyArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeEbayServer(report_members=0).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_stream(self):
+        ews = self.server.client()
+        try:
+            ews.download('Job', DOWNLOAD_PARAMS, stream=True)
+        except Exception as error:
+            self.assertEqual(str(error), "No report in the downloaded zip file")
+        else:
+            self.fail("no error raised")
+
+
+class SeveralReportsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeEbayServer(report_records=10, report_members=3).start()
+        self.ews = self.server.client()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_download(self):
+        for stream in (False, True):
+            self.assertRaisesRegexp(Exception, 'holds 3 reports .*iter_report_members',
+                                    self.ews.download, 'Job', DOWNLOAD_PARAMS, stream=stream)
+
+    def test_report_members(self):
+        members = [(name, member.read()) for name, member
+                                            in self.ews.iter_report_members(DOWNLOAD_PARAMS)]
+        self.assertEqual([name for name, content in members],
+                         ['5047690844_report_%d.xml' % i for i in (1, 2, 3)])
+        for name, content in members:
+            self.assertEqual(content.count('<SKUDetails>'), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    get_many() against the fake server, one item of the batch failing
+
+        python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from lxml import objectify
+
+from fake_server import FakeEbayServer, TRADING_NS, LMS_NS
+from ebaypyt.asynchronous import AsyncEbayWebService
+from ebaypyt.ebaypyt import EbayError
+from ebaypyt.parsing import ParsePool
+
+FAILED_ITEM_ID = '110000000000'
+FAILURE = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<GetItemResponse xmlns="%s"><Ack>Failure</Ack>'
+           '<Errors><ShortMessage>Deprecated.</ShortMessage><ErrorCode>21917</ErrorCode>'
+           '<SeverityCode>Warning</SeverityCode></Errors>'
+           '<Errors><ShortMessage>Item not found.</ShortMessage>'
+           '<LongMessage>The item ID 110000000000 is invalid.</LongMessage>'
+           '<ErrorCode>17</ErrorCode><SeverityCode>Error</SeverityCode></Errors>'
+           '</GetItemResponse>' % TRADING_NS)
+
+
+class FailingServer(FakeEbayServer):
+
+    def response(self, action, request=''):
+        if action == 'GetItem' and FAILED_ITEM_ID in request:
+            return FAILURE
+        return FakeEbayServer.response(self, action, request)
+
+
+class EbayErrorTest(unittest.TestCase):
+
+    def test_trading_errors(self):
+        error = EbayError(objectify.fromstring(FAILURE))
+        self.assertEqual(error.error_id, 17)
+        self.assertEqual(error.error_message, 'The item ID 110000000000 is invalid.')
+
+    def test_lms_error_message(self):
+        error = EbayError(objectify.fromstring(
+            '<downloadFileResponse xmlns="%s"><ack>Failure</ack><errorMessage><error>'
+            '<errorId>1</errorId><message>Invalid file reference</message></error>'
+            '</errorMessage></downloadFileResponse>' % LMS_NS))
+        self.assertEqual(error.error_id, 1)
+        self.assertEqual(error.error_message, 'Invalid file reference')
+
+
+class GetManyTest(unittest.TestCase):
+
+    item_ids = ['260874940015', FAILED_ITEM_ID, '260874940016']
+
+    def setUp(self):
+        self.server = FailingServer(item_details=2).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def check(self, ews):
+        results = ews.get_many('Product', [{'ItemID': item_id} for item_id in self.item_ids],
+                                                                                max_workers=2)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0][0]['ItemID'], 260874940015)
+        self.assertTrue(isinstance(results[1], EbayError))
+        self.assertEqual(results[1].error_id, 17)
+        self.assertEqual(results[2][0]['ItemID'], 260874940016)
+
+    def test_failed_item(self):
+        self.check(self.server.client())
+
+    def test_failed_item_parse_pool(self):
+        parse_pool = ParsePool(1)
+        try:
+            ews = self.server.client(parse_pool=parse_pool)
+            self.check(ews)
+            ews.close()
+            # left to the caller
+            self.assertTrue(ews.connection.parse_pool is parse_pool)
+            self.assertEqual(parse_pool.apply(len, ('abc',)), 3)
+        finally:
+            parse_pool.close()
+
+    def test_own_parse_pool_closed(self):
+        ews = self.server.client(parse_pool=1)
+        self.check(ews)
+        workers = ews.connection.parse_pool._pool._pool
+        ews.close()
+        self.assertEqual(ews.connection.parse_pool, None)
+        self.assertFalse(any(worker.is_alive() for worker in workers))
+        self.assertEqual(ews.pool_stats()['idle'], {})
+
+    def test_async_parse_pool(self):
+        self.assertRaisesRegexp(Exception, 'not available with AsyncCommunication',
+                            AsyncEbayWebService, 'dev', 'app', 'cert', 'TOKEN', parse_pool=1)
+
+    def test_pool_size_restored(self):
+        ews = self.server.client()
+        pool = ews.connection.pool
+        size = pool.size
+        ews.get_many('Product', [{'ItemID': '2608749400%02d' % i} for i in range(32)],
+                                                                            max_workers=8)
+        self.assertEqual(pool.size, size)
+        self.assertTrue(0 < pool.stats()['idle']['api'] <= size)
+
+    def test_network_error(self):
+        ews = self.server.client()
+        self.server.stop()
+        results = ews.get_many('Product', [{'ItemID': item_id} for item_id in self.item_ids])
+        self.assertTrue(all(isinstance(result, Exception) for result in results))
+        self.server = FailingServer(item_details=2).start()
+
+
+if __name__ == '__main__':
+    unittest.main()
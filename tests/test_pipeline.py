@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    JobPipeline against the fake server, failed jobs among the polled ones
+
+        python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from fake_server import FakeEbayServer, LMS_NS
+from ebaypyt.pipeline import JobPipeline
+
+OLD = '2012-07-20T10:00:00.000Z'
+# created after the pipeline started
+RECENT = (datetime.utcnow() + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+def job_profile(job_id, status, creation_time=OLD, percent=0):
+    return ('<jobProfile><jobId>%s</jobId><jobType>ActiveInventoryReport</jobType>'
+            '<jobStatus>%s</jobStatus><creationTime>%s</creationTime>'
+            '<percentComplete>%s</percentComplete><fileReferenceId>6%s</fileReferenceId>'
+            '</jobProfile>' % (job_id, status, creation_time, percent, job_id))
+
+
+class JobsServer(FakeEbayServer):
+    """ Answers the getJobs calls with the next list of polls, the last one then """
+
+    def __init__(self, polls):
+        FakeEbayServer.__init__(self, report_records=5)
+        self.polls = polls
+
+    def response(self, action, request=''):
+        if action == 'getJobs':
+            profiles = len(self.polls) > 1 and self.polls.pop(0) or self.polls[0]
+            return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                    '<getJobsResponse xmlns="%s"><ack>Success</ack>%s</getJobsResponse>'
+                    % (LMS_NS, ''.join(profiles)))
+        return FakeEbayServer.response(self, action, request)
+
+
+class PipelineTest(unittest.TestCase):
+
+    def run_pipeline(self, polls, **kwargs):
+        self.server = JobsServer(polls).start()
+        try:
+            records = []
+            pipeline = JobPipeline(self.server.client(), 'ActiveInventoryReport',
+                                   lambda job, record: records.append(record),
+                                   since=datetime(2012, 7, 1), min_interval=0.01,
+                                   max_interval=0.1, **kwargs)
+            stats = pipeline.run(timeout=10)
+            self.assertEqual(len(records), 5)
+            return stats
+        finally:
+            self.server.stop()
+
+    def test_old_failed_job_skipped(self):
+        stats = self.run_pipeline([[job_profile(5001, 'Failed'), job_profile(5002, 'Aborted'),
+                                    job_profile(5003, 'InProcess', percent=50)],
+                                   [job_profile(5001, 'Failed'), job_profile(5002, 'Aborted'),
+                                    job_profile(5003, 'Completed', percent=100)]])
+        self.assertEqual(stats['jobs'], [5003])
+        self.assertEqual(stats['failed'], [5001, 5002])
+
+    def test_watched_job_failed(self):
+        self.assertRaisesRegexp(Exception, 'Job 500[34] .* ended with status Failed',
+                                    self.run_pipeline,
+                                    [[job_profile(5003, 'InProcess', percent=50)],
+                                     [job_profile(5003, 'Failed', percent=50)]])
+
+    def test_own_job_failed(self):
+        self.assertRaisesRegexp(Exception, 'Job 500[34] .* ended with status Failed',
+                                    self.run_pipeline,
+                                    [[job_profile(5001, 'Failed'),
+                                      job_profile(5004, 'Failed', RECENT)]],
+                                    create={'time': '02:00:00'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    Record serialization : pickle, copy and json
+
+        python -m unittest discover tests
+"""
+
+import cPickle
+import copy
+import json
+import os
+import pickle
+import sys
+import unittest
+from collections import Mapping
+from cStringIO import StringIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from fake_server import report
+from ebaypyt.ebaypyt import parse_report_records
+
+
+class RecordTest(unittest.TestCase):
+
+    def setUp(self):
+        self.records = list(parse_report_records(StringIO(report(3)), 'SKUDetails',
+                                                                        as_records=True))
+        # a field missing from the first record is kept aside
+        self.records[1]['Extra-Field'] = {'Nested': 1}
+
+    def test_pickle(self):
+        for dumps, loads in ((pickle.dumps, pickle.loads), (cPickle.dumps, cPickle.loads)):
+            for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+                records = loads(dumps(self.records, protocol))
+                self.assertEqual(records, self.records)
+                self.assertEqual(records[1].to_dict(), self.records[1].to_dict())
+                self.assertEqual(records[0].__class__.__name__, 'SKUDetails')
+                # unpickled records share their class
+                self.assertTrue(records[0].__class__ is records[2].__class__)
+
+    def test_copy(self):
+        record = copy.deepcopy(self.records[1])
+        self.assertEqual(record, self.records[1])
+        record['Extra-Field']['Nested'] = 2
+        self.assertEqual(self.records[1]['Extra-Field'], {'Nested': 1})
+
+    def test_json(self):
+        self.assertTrue(isinstance(self.records[0], Mapping))
+        self.assertEqual(json.loads(json.dumps(self.records[1].to_dict())),
+                                                                self.records[1].to_dict())
+        self.assertEqual(json.loads(json.dumps([dict(record) for record in self.records])),
+                                        [record.to_dict() for record in self.records])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    RetryPolicy delays, Retry-After sent by the server
+
+        python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ebaypyt.retry import HttpStatusError, RetryPolicy
+
+
+class RetryAfterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.retry = RetryPolicy(max_backoff=30)
+
+    def test_too_many_requests(self):
+        error = HttpStatusError(429, 'Too Many Requests', retry_after=12.)
+        self.assertEqual(self.retry.next_delay('GetItem', error, 1), 12.)
+        self.assertEqual(self.retry.stats(), {'retries': {'GetItem': 1}, 'gave_up': 0})
+
+    def test_retry_after_kept(self):
+        # not cut down to the backoff of the attempt
+        error = HttpStatusError(503, 'Service Unavailable', retry_after=29.)
+        self.assertEqual(self.retry.next_delay('getJobs', error, 1), 29.)
+
+    def test_retry_after_too_long(self):
+        error = HttpStatusError(503, 'Service Unavailable', retry_after=120.)
+        self.assertEqual(self.retry.next_delay('getJobs', error, 1), None)
+        self.assertEqual(self.retry.stats(), {'retries': {}, 'gave_up': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()